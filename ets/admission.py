@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import Counter
+
+"""
+* class AdmissionControl membatasi koneksi yang di-accept server thread pool
+(mtpool) sebelum masuk antrian ThreadPoolExecutor, supaya saat lonjakan
+client tidak menunggu tanpa batas di antrian lalu timeout
+
+* max_pending: jumlah koneksi yang sudah di-accept namun belum dipegang
+worker thread. Bila penuh, policy 'reject' langsung membalas BUSY lalu
+menutup koneksi, policy 'delay' berhenti accept sampai ada yang diambil
+worker (koneksi baru tertahan di backlog listen kernel / TCP backpressure)
+
+* max_per_client: jumlah koneksi (antri + berjalan) dari satu IP client;
+kelebihannya selalu ditolak agar satu client tidak menghabiskan pool
+
+* 0 berarti tidak dibatasi. Lama koneksi menunggu di antrian dicatat ke
+timer 'queue_wait' di ServerStats
+"""
+POLICIES = ('reject', 'delay')
+BUSY = 'busy'
+CLIENT_LIMIT = 'client_limit'
+RETRY_AFTER_S = 1
+
+class AdmissionControl:
+    def __init__(self, max_pending=0, max_per_client=0, policy='reject', stats=None):
+        self.max_pending = max_pending
+        self.max_per_client = max_per_client
+        self.policy = policy
+        self.stats = stats
+        self.pending = 0
+        self._per_client = Counter()
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)
+
+    def has_capacity(self):
+        return self.policy != 'delay' or not self.max_pending or self.pending < self.max_pending
+
+    def wait_for_capacity(self, timeout):
+        """Policy 'delay': dipanggil sebelum accept; False bila antrian masih penuh setelah timeout."""
+        with self._capacity:
+            return self._capacity.wait_for(self.has_capacity, timeout)
+
+    def admit(self, client_ip):
+        """Mengembalikan None bila koneksi diterima (masuk antrian), selain itu alasan penolakan."""
+        with self._lock:
+            if self.max_per_client and self._per_client[client_ip] >= self.max_per_client:
+                reason = CLIENT_LIMIT
+            elif self.max_pending and self.pending >= self.max_pending:
+                reason = BUSY
+            else:
+                self.pending += 1
+                self._per_client[client_ip] += 1
+                return None
+        if self.stats is not None:
+            self.stats.incr(f"connections_rejected_{reason}")
+        return reason
+
+    def started(self, accepted_at):
+        """Dipanggil worker thread saat mulai memegang koneksi yang di-accept pada accepted_at (perf_counter)."""
+        waited = time.perf_counter() - accepted_at
+        with self._capacity:
+            self.pending -= 1
+            self._capacity.notify()
+        if self.stats is not None:
+            self.stats.observe_timer('queue_wait', waited)
+        return waited
+
+    def finished(self, client_ip):
+        with self._lock:
+            self._per_client[client_ip] -= 1
+            if self._per_client[client_ip] <= 0:
+                del self._per_client[client_ip]
+
+    def busy_response(self, reason):
+        if reason == CLIENT_LIMIT:
+            data = f"Too many concurrent connections from this client (limit {self.max_per_client})"
+        else:
+            data = f"Server busy, {self.pending} connections already waiting (limit {self.max_pending})"
+        return dict(status='BUSY', data=data, data_retry_after=RETRY_AFTER_S)
+
+
+if __name__=='__main__':
+    admission = AdmissionControl(max_pending=1, max_per_client=2)
+    print(admission.admit('10.0.0.1'), admission.admit('10.0.0.2'))
+    print(admission.started(time.perf_counter()), admission.admit('10.0.0.1'), admission.admit('10.0.0.1'))
@@ -0,0 +1,181 @@
+import hashlib
+import os
+import re
+import uuid
+
+"""
+* class BlobStore menyimpan isi file secara content-addressed: satu blob per
+SHA-256 di storage_dir/.blobs/<2 hex awal>/<sha256>, dan nama file di
+storage_dir hanyalah hardlink ke blob tersebut. Upload isi yang sama dengan
+nama berbeda tidak menulis salinan baru; GET/GETB/sendfile membaca inode
+blob yang sama tanpa perubahan apapun di jalur baca
+
+* refcount = st_nlink blob (1 link milik .blobs sendiri + 1 per nama).
+Saat nama diganti atau dihapus, release(inode) menghapus blob yang tidak
+lagi dipakai nama manapun
+
+* metadata nama -> hash: .blobs/inodes/<inode> berupa symlink yang isinya
+sha256 (symlink tidak menambah st_nlink), sehingga hash sebuah nama didapat
+dari os.stat(nama).st_ino tanpa index terpusat, aman dipakai bersama worker
+process mppool
+
+* direktori .blobs tersembunyi (awalan '.') sehingga tidak ikut LIST.
+Hardlink sementara .link-* dibuat di direktori nama tujuan; on_change(path)
+dipanggil setiap kali entri itu muncul/hilang, sehingga pemilik index
+direktori (FileInterface) tahu perubahan mtime itu miliknya sendiri
+"""
+BLOB_DIR = '.blobs'
+INODE_DIR = 'inodes'
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+class HashingWriter:
+    # File object tipis untuk upload/download: setiap write ikut meng-update SHA-256, sehingga hash siap saat
+    # transfer selesai. fp None = bytes hanya di-hash lalu dibuang.
+    def __init__(self, fp=None):
+        self.fp = fp
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.fp.write(data) if self.fp is not None else len(data)
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class BlobStore:
+    def __init__(self, storage_dir, on_change=None):
+        self.storage_dir = storage_dir
+        self.on_change = on_change
+        self.blob_dir = os.path.join(storage_dir, BLOB_DIR)
+        self.inode_dir = os.path.join(self.blob_dir, INODE_DIR)
+        os.makedirs(self.inode_dir, exist_ok=True)
+
+    def path(self, digest):
+        if not DIGEST_PATTERN.match(digest or ''):
+            raise ValueError(f"Invalid SHA-256 digest '{digest}'.")
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def has(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def digest_of(self, ino):
+        """sha256 isi file dengan inode ino, None bila bukan blob (misal ditulis sebelum dedup aktif)."""
+        try:
+            digest = os.readlink(os.path.join(self.inode_dir, str(ino)))
+            return digest if os.stat(self.path(digest)).st_ino == ino else None
+        except (OSError, ValueError):
+            return None
+
+    def store(self, tmp_path, digest, full_path):
+        """
+        Memasukkan file sementara tmp_path (isi dengan hash digest) sebagai blob,
+        lalu membuat full_path menunjuk ke blob itu. Bila blob sudah ada,
+        blob lama yang dipakai. tmp_path baru dibuang setelah full_path
+        ter-link: bila blob lama dihapus release() nama lain di antaranya,
+        isinya masih ada di tmp_path untuk menjadi blob baru.
+        """
+        blob = self.path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            while True:
+                try:
+                    # os.link gagal bila blob sudah ada: dua upload isi sama yang bersamaan tetap berbagi satu blob
+                    os.link(tmp_path, blob)
+                    self._remember(blob, digest)
+                except FileExistsError:
+                    pass
+                if self.link(digest, full_path):
+                    return
+        finally:
+            os.remove(tmp_path)
+
+    def _remember(self, blob, digest):
+        ref = os.path.join(self.inode_dir, str(os.stat(blob).st_ino))
+        try:
+            os.symlink(digest, ref)
+        except FileExistsError:
+            # Sisa inode lama yang nomornya dipakai ulang
+            os.remove(ref)
+            os.symlink(digest, ref)
+
+    def _changed(self, path):
+        if self.on_change is not None:
+            self.on_change(path)
+
+    def link(self, digest, full_path):
+        """Membuat/mengganti full_path secara atomik sebagai hardlink blob; False bila blob tidak ada."""
+        blob = self.path(digest)
+        tmp_link = os.path.join(os.path.dirname(full_path), f".link-{uuid.uuid4().hex}")
+        try:
+            os.link(blob, tmp_link)
+        except FileNotFoundError:
+            return False
+        self._changed(tmp_link)
+        try:
+            old_ino = os.stat(full_path).st_ino
+        except FileNotFoundError:
+            old_ino = None
+        if old_ino == os.stat(tmp_link).st_ino:
+            # Nama sudah menunjuk blob ini; rename ke inode yang sama tidak menghapus tmp_link
+            os.remove(tmp_link)
+            self._changed(tmp_link)
+            return True
+        os.replace(tmp_link, full_path)
+        self._changed(tmp_link)
+        if old_ino is not None:
+            self.release(old_ino)
+        return True
+
+    def release(self, ino):
+        """Dipanggil setelah sebuah nama berhenti menunjuk inode ino: blob dihapus bila tidak ada nama lain."""
+        ref = os.path.join(self.inode_dir, str(ino))
+        try:
+            blob = self.path(os.readlink(ref))
+            st = os.stat(blob)
+        except (OSError, ValueError):
+            return
+        if st.st_ino == ino and st.st_nlink <= 1:
+            for path in (blob, ref):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass # Sudah dihapus worker lain
+
+
+if __name__=='__main__':
+    import tempfile
+    storage = tempfile.mkdtemp()
+    store = BlobStore(storage)
+    for name in ('a.bin', 'b.bin'):
+        tmp = os.path.join(storage, f".tmp-{name}")
+        with open(tmp, 'wb') as fp:
+            writer = HashingWriter(fp)
+            writer.write(b'same content')
+        store.store(tmp, writer.hexdigest(), os.path.join(storage, name))
+    digest = writer.hexdigest()
+    print(digest, store.has(digest), os.stat(store.path(digest)).st_nlink)
+    os.remove(os.path.join(storage, 'a.bin'))
+    store.release(os.stat(os.path.join(storage, 'b.bin')).st_ino)
+    print('after deleting a.bin:', store.has(digest))
+    # Blob yang dipakai dihapus release() nama terakhir tepat sebelum link: isi tmp_path menjadi blob baru
+    tmp = os.path.join(storage, '.tmp-c.bin')
+    with open(tmp, 'wb') as fp:
+        fp.write(b'same content')
+    link = store.link
+    def racing_link(digest, full_path):
+        store.link = link
+        os.remove(os.path.join(storage, 'b.bin'))
+        store.release(os.stat(store.path(digest)).st_ino)
+        return link(digest, full_path)
+    store.link = racing_link
+    store.store(tmp, digest, os.path.join(storage, 'c.bin'))
+    print('stored despite release:', open(os.path.join(storage, 'c.bin'), 'rb').read(), os.path.exists(tmp))
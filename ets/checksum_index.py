@@ -0,0 +1,71 @@
+import os
+import uuid
+
+from blob_store import DIGEST_PATTERN
+
+"""
+* class ChecksumIndex menyimpan SHA-256 isi file di sidecar
+storage_dir/.checksums/<inode> (satu baris: sha256 size mtime_ns), sehingga
+GET/GETB berikutnya cukup membaca sidecar tanpa meng-hash ulang file
+
+* entri hanya dipakai bila inode, size dan mtime_ns file masih sama. Upload
+selalu membuat inode baru (rename file sementara), sehingga isi yang berubah
+tidak pernah cocok dengan entri lama; entri basi cukup diabaikan lalu ditimpa
+
+* sidecar ditulis atomik (file sementara + rename) dan dibaca tanpa lock,
+aman dipakai bersama worker process mppool. Direktori tersembunyi (awalan
+'.') sehingga tidak ikut LIST
+"""
+CHECKSUM_DIR = '.checksums'
+
+class ChecksumIndex:
+    def __init__(self, storage_dir):
+        self.directory = os.path.join(storage_dir, CHECKSUM_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, ino):
+        return os.path.join(self.directory, str(ino))
+
+    def get(self, st):
+        """sha256 isi file dengan os.stat_result st, None bila belum tercatat atau entrinya basi."""
+        try:
+            with open(self._path(st.st_ino)) as fp:
+                digest, size, mtime_ns = fp.read().split()
+            # Entri untuk isi lain (inode dipakai ulang, file diubah di tempat) atau bukan hash yang sah = miss
+            if int(size) != st.st_size or int(mtime_ns) != st.st_mtime_ns or not DIGEST_PATTERN.match(digest):
+                return None
+        except (OSError, ValueError):
+            return None # Belum ada, atau sisa tulisan rusak yang nanti ditimpa
+        return digest
+
+    def put(self, st, digest):
+        tmp_path = os.path.join(self.directory, f".{st.st_ino}-{uuid.uuid4().hex}")
+        with open(tmp_path, 'w') as fp:
+            fp.write(f"{digest} {st.st_size} {st.st_mtime_ns}\n")
+        os.replace(tmp_path, self._path(st.st_ino))
+
+    def discard(self, ino):
+        try:
+            os.remove(self._path(ino))
+        except FileNotFoundError:
+            pass
+
+
+if __name__=='__main__':
+    import tempfile
+    from blob_store import HashingWriter
+    storage = tempfile.mkdtemp()
+    index = ChecksumIndex(storage)
+    path = os.path.join(storage, 'a.txt')
+    with open(path, 'wb') as fp:
+        writer = HashingWriter(fp)
+        writer.write(b'hello checksum')
+    st = os.stat(path)
+    index.put(st, writer.hexdigest())
+    print(index.get(st) == writer.hexdigest())
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    print('after touch:', index.get(os.stat(path)))
+    st = os.stat(path)
+    with open(index._path(st.st_ino), 'w') as fp:
+        fp.write(f"{writer.hexdigest()} {st.st_size + 1} {st.st_mtime_ns}\n")
+    print('size mismatch:', index.get(st))
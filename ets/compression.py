@@ -0,0 +1,156 @@
+import os
+import re
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+"""
+* kompresi on-the-wire untuk response GET/GETB file utuh: client menambahkan
+token encoding=<codec>[,<codec>...] (urutan preferensi) di akhir request,
+server memilih codec pertama yang didukung lalu menandai response dengan
+data_encoding dan data_raw_size. Tanpa token, atau bila server memutuskan
+tidak mengompres, response tetap identik dengan sebelumnya
+
+* zlib selalu tersedia; zstd (paket zstandard) dan lz4 (paket lz4) dipakai
+bila terpasang. ENCODINGS mengembalikan daftar codec server
+
+* file yang sudah terkompres dilewati: berdasarkan ekstensi
+(COMPRESSED_EXTENSIONS) atau sampel SAMPLE_SIZE bytes awal yang tidak
+menyusut minimal MIN_SAVING setelah dikompres (entropi tinggi)
+
+* hasil kompresi file utuh disimpan di FileCache yang sama dengan isi file
+(kind '<codec>' untuk GETB, '<codec>+b64' untuk GET)
+
+* file dibaca dan dikompres per COMPRESS_CHUNK (compressor(codec)), isi
+asli tidak pernah ditampung utuh di memori. Body terkompres tetap utuh di
+memori karena data_size harus dikirim sebelum body, sehingga dibatasi
+MAX_COMPRESS_SIZE; file yang lebih besar dikirim apa adanya (identity)
+"""
+ENCODING_TOKEN = re.compile(r'^encoding=([a-z0-9,]+)$')
+COMPRESSED_EXTENSIONS = frozenset((
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp3', '.mp4', '.m4a', '.mkv', '.mov', '.avi', '.webm',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.lz4', '.7z', '.rar',
+))
+SAMPLE_SIZE = 64 * 1024
+MIN_SAVING = 0.1
+MIN_COMPRESS_SIZE = 1024
+# Body terkompres ditampung utuh sebelum header (data_size) dikirim; file yang lebih besar dikirim apa adanya
+MAX_COMPRESS_SIZE = 16 * 1024 * 1024
+COMPRESS_CHUNK = 1024 * 1024
+ZLIB_LEVEL = 1
+ZSTD_LEVEL = 3
+
+class _Lz4Compressor:
+    # LZ4FrameCompressor dengan antarmuka compressobj (compress/flush): header frame ikut potongan pertama.
+    def __init__(self):
+        self._compressor = lz4_frame.LZ4FrameCompressor()
+        self._header = self._compressor.begin()
+
+    def compress(self, data):
+        out = self._header + self._compressor.compress(data)
+        self._header = b''
+        return out
+
+    def flush(self):
+        return self._header + self._compressor.flush()
+
+
+def _zstd_compressor():
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+def _zstd_decompressor():
+    return zstandard.ZstdDecompressor().decompressobj()
+
+# codec -> (pembuat compressor bertahap, pembuat decompressor bertahap)
+CODECS = {
+    'zlib': (lambda: zlib.compressobj(ZLIB_LEVEL), zlib.decompressobj),
+}
+if zstandard is not None:
+    CODECS['zstd'] = (_zstd_compressor, _zstd_decompressor)
+if lz4_frame is not None:
+    CODECS['lz4'] = (_Lz4Compressor, lz4_frame.LZ4FrameDecompressor)
+
+def available():
+    """Codec yang didukung proses ini, urut dari yang paling disukai."""
+    return [codec for codec in ('zstd', 'lz4', 'zlib') if codec in CODECS]
+
+def split_encoding(params):
+    """Memisahkan token encoding=... terakhir dari params: (params sisanya, list codec client atau None)."""
+    if params and isinstance(params[-1], str):
+        m = ENCODING_TOKEN.match(params[-1])
+        if m:
+            return params[:-1], m.group(1).split(',')
+    return params, None
+
+def choose(accepted):
+    """Codec pertama (menurut urutan client) yang juga didukung di sini, atau None."""
+    for codec in accepted or ():
+        if codec in CODECS:
+            return codec
+    return None
+
+def candidate(filename, size):
+    # Saringan murah sebelum membaca isi: ukuran dan ekstensi
+    if not MIN_COMPRESS_SIZE <= size <= MAX_COMPRESS_SIZE:
+        return False
+    return os.path.splitext(filename)[1].lower() not in COMPRESSED_EXTENSIONS
+
+def saves_enough(raw_size, packed_size):
+    return packed_size <= raw_size * (1 - MIN_SAVING)
+
+def compressible(sample):
+    """Perkiraan entropi: sampel yang hampir tidak menyusut dengan zlib level 1 dianggap sudah terkompres."""
+    return bool(sample) and saves_enough(len(sample), len(zlib.compress(sample, 1)))
+
+def compressor(codec):
+    """Object dengan .compress(chunk) dan .flush() untuk mengompres isi per potongan."""
+    return CODECS[codec][0]()
+
+def compress(codec, data):
+    packer = compressor(codec)
+    return packer.compress(data) + packer.flush()
+
+def decompress(codec, data):
+    decoder = StreamDecoder(codec)
+    out = decoder.inflate.decompress(data)
+    return out + decoder.flush()
+
+
+class StreamDecoder:
+    # Sink untuk body terkompres: tiap write dibongkar lalu diteruskan ke sink.write (None = dibuang), size = bytes asli.
+    def __init__(self, codec, sink=None):
+        self.inflate = CODECS[codec][1]()
+        self.sink = sink
+        self.size = 0
+
+    def _emit(self, data):
+        self.size += len(data)
+        if self.sink is not None and data:
+            self.sink.write(data)
+
+    def write(self, data):
+        self._emit(self.inflate.decompress(data))
+        return len(data)
+
+    def flush(self):
+        # zlib/zstd bisa menahan sisa output sampai flush; LZ4FrameDecompressor tidak punya flush
+        flush = getattr(self.inflate, 'flush', None)
+        data = flush() if flush is not None else b''
+        self._emit(data)
+        return data
+
+
+if __name__=='__main__':
+    text = b"GET /index.html HTTP/1.1 200 OK\n" * 2000
+    print(available(), split_encoding(['a.log', 'encoding=zstd,zlib']))
+    print(candidate('a.log', len(text)), candidate('a.jpg', len(text)), compressible(text[:SAMPLE_SIZE]), compressible(os.urandom(SAMPLE_SIZE)))
+    for codec in available():
+        packed = compress(codec, text)
+        print(codec, len(text), '->', len(packed), decompress(codec, packed) == text)
@@ -0,0 +1,222 @@
+import logging
+import selectors
+import socket
+import time
+from collections import deque
+
+from frame_reader import FrameReader, SlowClient, DEFAULT_MAX_FRAME_SIZE
+
+"""
+* class SelectorFrontEnd memegang semua koneksi client di satu thread
+(selectors) dan baru menyerahkan koneksi ke worker pool lewat dispatch(conn)
+setelah satu frame request lengkap ter-buffer (atau sudah DISPATCH_BYTES,
+misal UPLOAD teks yang di-stream). Client yang membuka socket lalu diam atau
+mengirim header sangat lambat (slowloris) tidak pernah memegang worker,
+sehingga jumlah koneksi terlepas dari jumlah worker
+
+* idle_timeout: koneksi tanpa request yang sedang masuk ditutup setelah
+sekian detik (juga koneksi persistent di antara dua request).
+header_timeout: frame request yang sudah mulai masuk harus lengkap dalam
+sekian detik. Body dan response dibatasi di worker (timeout socket dan
+min_rate FrameReader)
+
+* setelah worker selesai dan tidak ada frame lengkap lagi di buffer,
+koneksi dikembalikan dengan resume(conn) (thread-safe, membangunkan
+selector lewat socketpair) untuk menunggu request berikutnya
+"""
+DISPATCH_BYTES = 4096
+REAP_INTERVAL = 0.5
+# Selama ada frame yang diparkir, kapasitas worker dicek lebih sering
+PARKED_POLL_INTERVAL = 0.01
+DEFAULT_IDLE_TIMEOUT = 120
+DEFAULT_HEADER_TIMEOUT = 10
+# Timeout socket di worker (body, response); tanpa front end juga berlaku sebagai idle timeout
+DEFAULT_CLIENT_TIMEOUT = 120
+
+class FrontEndConnection:
+    def __init__(self, connection, address, reader):
+        self.connection = connection
+        self.address = address
+        self.reader = reader
+        self.accepted_at = time.perf_counter()
+        self.idle_since = time.monotonic()
+        self.request_started = None
+
+
+class SelectorFrontEnd:
+    def __init__(self, listen_socket, dispatch, stats=None, max_frame_size=DEFAULT_MAX_FRAME_SIZE,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, header_timeout=DEFAULT_HEADER_TIMEOUT, min_rate=0,
+                 has_capacity=None, on_accept=None):
+        self.listen_socket = listen_socket
+        self.dispatch = dispatch
+        self.stats = stats
+        self.max_frame_size = max_frame_size
+        self.idle_timeout = idle_timeout
+        self.header_timeout = header_timeout
+        self.min_rate = min_rate
+        # has_capacity(): False = frame yang sudah siap diparkir dulu (admission policy 'delay')
+        self.has_capacity = has_capacity
+        # on_accept(connection, address): False = koneksi sudah ditolak dan ditutup pemanggil
+        self.on_accept = on_accept
+        self.selector = selectors.DefaultSelector()
+        self._waiting = {}
+        self._parked = deque()
+        self._resumed = deque()
+        self._stopped = False
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+    @property
+    def connections(self):
+        """Jumlah koneksi yang sedang dipegang front end (idle atau header belum lengkap)."""
+        return len(self._waiting) + len(self._parked)
+
+    def _connection_error(self, kind):
+        if self.stats is not None:
+            self.stats.incr(f"connection_errors_{kind}")
+
+    def resume(self, conn):
+        """Dipanggil worker: koneksi kembali menunggu request berikutnya."""
+        if self._stopped:
+            self.close(conn)
+            return
+        self._resumed.append(conn)
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass # Buffer socketpair penuh (selector toh sudah akan bangun) atau front end baru berhenti
+
+    def close(self, conn):
+        """Dipanggil worker atau front end saat koneksi selesai."""
+        if self.stats is not None:
+            self.stats.incr('active_connections', -1)
+        try:
+            conn.connection.close()
+        except OSError:
+            pass
+        logging.info(f"Connection with {conn.address} ended.")
+
+    def _accept(self):
+        try:
+            connection, address = self.listen_socket.accept()
+        except (BlockingIOError, socket.timeout):
+            return # Sudah diambil worker process lain yang berbagi listening socket
+        logging.info(f"FrontEnd: Accepted connection from {address}")
+        if self.on_accept is not None and not self.on_accept(connection, address):
+            return
+        if self.stats is not None:
+            self.stats.incr('connections_accepted')
+            self.stats.incr('active_connections')
+        connection.setblocking(False)
+        self._watch(FrontEndConnection(connection, address, FrameReader(connection, max_frame_size=self.max_frame_size, min_rate=self.min_rate)))
+
+    def _watch(self, conn):
+        conn.connection.setblocking(False)
+        conn.idle_since = time.monotonic()
+        # Jendela min_rate request sebelumnya (misal body UPLOADB) ditutup: waktu idle tidak dihitung
+        conn.reader.start_rate_window()
+        conn.request_started = time.monotonic() if conn.reader.buffered else None
+        if conn.reader.frame_ready(DISPATCH_BYTES):
+            self._ready(conn)
+            return
+        self._waiting[conn.connection.fileno()] = conn
+        self.selector.register(conn.connection, selectors.EVENT_READ, conn)
+
+    def _unwatch(self, conn):
+        del self._waiting[conn.connection.fileno()]
+        self.selector.unregister(conn.connection)
+
+    def _readable(self, conn):
+        try:
+            n = conn.reader.fill()
+        except BlockingIOError:
+            return
+        except SlowClient as e:
+            self._unwatch(conn)
+            self._connection_error('slow_client')
+            logging.warning(f"FrontEnd: Slow request header from {conn.address}: {e}")
+            self.close(conn)
+            return
+        except OSError:
+            self._unwatch(conn)
+            self._connection_error('reset')
+            self.close(conn)
+            return
+        if not n:
+            self._unwatch(conn)
+            if conn.reader.buffered:
+                # Frame terpotong saat client menutup koneksi
+                self._connection_error('reset')
+            logging.info(f"Connection closed by {conn.address}")
+            self.close(conn)
+            return
+        if conn.request_started is None:
+            conn.request_started = time.monotonic()
+        if conn.reader.frame_ready(DISPATCH_BYTES):
+            self._unwatch(conn)
+            self._ready(conn)
+
+    def _ready(self, conn):
+        if self._parked or (self.has_capacity is not None and not self.has_capacity()):
+            self._parked.append(conn)
+        else:
+            self._dispatch(conn)
+
+    def _dispatch(self, conn):
+        conn.connection.setblocking(True)
+        try:
+            self.dispatch(conn)
+        except RuntimeError as e:
+            # Executor sudah shutdown
+            logging.warning(f"FrontEnd: Cannot dispatch {conn.address}: {e}")
+            self.close(conn)
+
+    def _reap(self):
+        now = time.monotonic()
+        for conn in list(self._waiting.values()):
+            if conn.request_started is not None:
+                if now - conn.request_started > self.header_timeout:
+                    self._unwatch(conn)
+                    self._connection_error('header_timeout')
+                    logging.warning(f"FrontEnd: Request header from {conn.address} incomplete after {self.header_timeout}s ({conn.reader.buffered} bytes), closing.")
+                    self.close(conn)
+            elif now - conn.idle_since > self.idle_timeout:
+                self._unwatch(conn)
+                self._connection_error('idle_timeout')
+                logging.info(f"FrontEnd: Closing idle connection {conn.address} after {self.idle_timeout}s.")
+                self.close(conn)
+
+    def serve_forever(self, shutdown_event):
+        self.listen_socket.setblocking(False)
+        self.selector.register(self.listen_socket, selectors.EVENT_READ, None)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, self._wake_r)
+        next_reap = time.monotonic() + REAP_INTERVAL
+        try:
+            while not shutdown_event.is_set():
+                for key, _ in self.selector.select(PARKED_POLL_INTERVAL if self._parked else REAP_INTERVAL):
+                    if key.data is None:
+                        self._accept()
+                    elif key.data is self._wake_r:
+                        try:
+                            self._wake_r.recv(4096)
+                        except BlockingIOError:
+                            pass
+                    else:
+                        self._readable(key.data)
+                while self._resumed:
+                    self._watch(self._resumed.popleft())
+                while self._parked and (self.has_capacity is None or self.has_capacity()):
+                    self._dispatch(self._parked.popleft())
+                if time.monotonic() >= next_reap:
+                    self._reap()
+                    next_reap = time.monotonic() + REAP_INTERVAL
+        finally:
+            self._stopped = True
+            for conn in list(self._waiting.values()) + list(self._parked) + list(self._resumed):
+                self.close(conn)
+            self._waiting.clear()
+            self._parked.clear()
+            self.selector.close()
+            self._wake_r.close()
+            self._wake_w.close()
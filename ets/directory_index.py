@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+"""
+* class DirectoryIndex menyimpan daftar file di storage_dir (nama -> size,
+mtime) dalam list nama yang terurut, sehingga LIST tidak perlu men-scan
+direktori setiap request dan bisa dipotong per halaman (prefix + cursor)
+
+* perubahan lewat FileInterface (upload/delete) langsung diterapkan ke
+index (update/remove), dan mtime direktori sesudahnya dicatat
+(acknowledge) sehingga perubahan milik sendiri tidak memicu scan ulang.
+Perubahan dari luar proses ini (worker mppool lain, file yang disalin
+manual) ditangkap dengan os.scandir ulang bila mtime direktori berubah
+(paling sering tiap RESCAN_MIN_INTERVAL detik), atau paling lambat setelah
+RESCAN_MAX_INTERVAL detik bila perubahan luar itu jatuh di antara
+perubahan sendiri dan acknowledge-nya
+
+* file tersembunyi (awalan '.', misal file sementara upload dan sesi
+multipart) tidak ikut diindeks
+"""
+RESCAN_MIN_INTERVAL = 1.0
+RESCAN_MAX_INTERVAL = 30.0
+
+class DirectoryIndex:
+    def __init__(self, directory, min_interval=RESCAN_MIN_INTERVAL, max_interval=RESCAN_MAX_INTERVAL):
+        self.directory = directory
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._names = []
+        self._entries = {}
+        self._scanned_at = None
+        self._dir_mtime = None
+        self._lock = threading.Lock()
+
+    def _rescan(self):
+        entries = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                st = entry.stat()
+                entries[entry.name] = (st.st_size, st.st_mtime)
+        self._entries = entries
+        self._names = sorted(entries)
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._scanned_at is not None and now - self._scanned_at < self.min_interval:
+            return
+        dir_mtime = os.stat(self.directory).st_mtime_ns
+        if self._scanned_at is not None and dir_mtime == self._dir_mtime and now - self._scanned_at < self.max_interval:
+            return
+        self._rescan()
+        self._scanned_at = now
+        self._dir_mtime = dir_mtime
+
+    def _acknowledge(self):
+        if self._dir_mtime is not None:
+            self._dir_mtime = os.stat(self.directory).st_mtime_ns
+
+    def acknowledge(self):
+        """Direktori baru saja diubah oleh proses ini (misal entri tersembunyi): mtime-nya bukan alasan untuk scan ulang."""
+        with self._lock:
+            self._acknowledge()
+
+    def update(self, name, size, mtime):
+        with self._lock:
+            if name not in self._entries:
+                insort(self._names, name)
+            self._entries[name] = (size, mtime)
+            self._acknowledge()
+
+    def remove(self, name):
+        with self._lock:
+            if self._entries.pop(name, None) is not None:
+                del self._names[bisect_left(self._names, name)]
+            self._acknowledge()
+
+    def page(self, prefix='', cursor='', limit=None):
+        """
+        Mengembalikan (list nama, cursor berikutnya atau None). Nama diurutkan,
+        hanya yang diawali prefix dan lebih besar dari cursor (nama terakhir
+        halaman sebelumnya).
+        """
+        with self._lock:
+            self._refresh()
+            start = bisect_right(self._names, cursor) if cursor > prefix else bisect_left(self._names, prefix)
+            names = []
+            for i in range(start, len(self._names)):
+                name = self._names[i]
+                if not name.startswith(prefix):
+                    break
+                if limit is not None and len(names) == limit:
+                    return names, names[-1]
+                names.append(name)
+            return names, None
+
+
+if __name__=='__main__':
+    import tempfile
+    index = DirectoryIndex('.')
+    print(index.page(limit=3))
+    print(index.page(prefix='file_'))
+    storage = tempfile.mkdtemp()
+    index = DirectoryIndex(storage, min_interval=0)
+    index.page()
+    rescans = []
+    rescan = index._rescan
+    index._rescan = lambda: rescans.append(1) or rescan()
+    open(os.path.join(storage, 'a.txt'), 'w').close()
+    index.update('a.txt', 0, 0)
+    print(index.page(), 'rescans after own update:', len(rescans))
+    open(os.path.join(storage, 'b.txt'), 'w').close()
+    print(index.page(), 'rescans after outside edit:', len(rescans))
@@ -0,0 +1,264 @@
+import ctypes
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict
+from multiprocessing import shared_memory, resource_tracker
+
+"""
+* class FileCache menyimpan isi file yang sering di-GET di memori, baik
+dalam bentuk base64 (GET teks) maupun raw bytes (GETB), sehingga file yang
+sama tidak dibaca dan di-encode ulang untuk setiap client
+
+* entry dikunci dengan (path, jenis) dan disimpan bersama versinya
+(mtime_ns, size); versi yang berbeda dari file di disk dianggap miss
+
+* total ukuran entry dibatasi max_bytes, entry yang paling lama tidak
+dipakai dibuang lebih dulu (LRU)
+
+* satu object FileCache aman dipakai bersama oleh banyak thread (mtpool
+dan asyncio)
+
+* class SharedFileCache punya method yang sama namun isinya disimpan di
+segmen multiprocessing.shared_memory (satu segmen per entry) dengan index
+berupa multiprocessing.Array, sehingga semua worker process mppool berbagi
+satu salinan tiap file; harus dibuat di proses induk sebelum worker dibuat
+(sama seperti ServerStats)
+"""
+
+class FileCache:
+    def __init__(self, max_bytes, stats=None):
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self.used_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _incr(self, name, amount=1):
+        if self.stats is not None:
+            self.stats.incr(name, amount)
+
+    def fits(self, size):
+        return 0 < size <= self.max_bytes
+
+    def get(self, path, kind, version):
+        with self._lock:
+            entry = self._entries.get((path, kind))
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end((path, kind))
+                value = entry[1]
+            else:
+                value = None
+        self._incr('cache_hits' if value is not None else 'cache_misses')
+        return value
+
+    def put(self, path, kind, version, value):
+        size = len(value)
+        if not self.fits(size):
+            return
+        evicted = 0
+        with self._lock:
+            old = self._entries.pop((path, kind), None)
+            if old is not None:
+                self.used_bytes -= len(old[1])
+            while self._entries and self.used_bytes + size > self.max_bytes:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self.used_bytes -= len(dropped)
+                evicted += 1
+            self._entries[(path, kind)] = (version, value)
+            self.used_bytes += size
+        if evicted:
+            self._incr('cache_evictions', evicted)
+
+    def invalidate(self, path):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                self.used_bytes -= len(self._entries.pop(key)[1])
+
+    def snapshot(self):
+        with self._lock:
+            return dict(cache_entries=len(self._entries), cache_used_bytes=self.used_bytes, cache_max_bytes=self.max_bytes)
+
+
+SHARED_CACHE_SLOTS = 64
+SHARED_CACHE_PATH_LEN = 512
+# Jenis entry: 'raw', 'b64', '<codec>', '<codec>+b64'; disisakan ruang untuk NUL penutup
+SHARED_CACHE_KIND_LEN = 16
+
+class _Slot(ctypes.Structure):
+    _fields_ = [
+        ('path', ctypes.c_char * SHARED_CACHE_PATH_LEN),
+        ('kind', ctypes.c_char * SHARED_CACHE_KIND_LEN),
+        ('mtime_ns', ctypes.c_int64),
+        ('file_size', ctypes.c_int64),
+        ('length', ctypes.c_int64),
+        ('last_used', ctypes.c_int64),
+        ('segment', ctypes.c_char * 40),
+    ]
+
+class SharedFileCache:
+    def __init__(self, max_bytes, stats=None, slots=SHARED_CACHE_SLOTS):
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self._index = multiprocessing.Array(_Slot, slots)
+        self._clock = multiprocessing.Value(ctypes.c_int64, 0, lock=False)
+        self._init_local()
+
+    def _init_local(self):
+        # Segmen yang sudah di-attach di proses ini (per nama), tidak ikut diwariskan ke proses lain
+        self._attached = {}
+        self._attached_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_attached'], state['_attached_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_local()
+
+    def _incr(self, name, amount=1):
+        if self.stats is not None:
+            self.stats.incr(name, amount)
+
+    def fits(self, size):
+        return 0 < size <= self.max_bytes
+
+    def _find(self, path, kind):
+        for slot in self._index:
+            if slot.segment and slot.path == path and slot.kind == kind:
+                return slot
+        return None
+
+    def _attach(self, name):
+        with self._attached_lock:
+            shm = self._attached.get(name)
+            if shm is None:
+                shm = shared_memory.SharedMemory(name=name)
+                # Umur segmen diatur lewat index (unlink saat evict/invalidate), bukan resource tracker per proses
+                resource_tracker.unregister(shm._name, 'shared_memory')
+                self._attached[name] = shm
+            return shm
+
+    def _detach_stale(self):
+        # Segmen yang sudah tidak ada di index ditutup; yang masih dipakai (BufferError) dicoba lagi nanti
+        with self._index.get_lock():
+            live = {slot.segment.decode() for slot in self._index if slot.segment}
+        with self._attached_lock:
+            for name in [n for n in self._attached if n not in live]:
+                try:
+                    self._attached[name].close()
+                except BufferError:
+                    continue
+                del self._attached[name]
+
+    def get(self, path, kind, version):
+        path_b, kind_b = path.encode(), kind.encode()
+        name = None
+        with self._index.get_lock():
+            slot = self._find(path_b, kind_b)
+            if slot is not None and (slot.mtime_ns, slot.file_size) == tuple(version):
+                self._clock.value += 1
+                slot.last_used = self._clock.value
+                name, length = slot.segment.decode(), slot.length
+        value = None
+        if name is not None:
+            if name not in self._attached:
+                self._detach_stale()
+            try:
+                value = self._attach(name).buf[:length]
+            except FileNotFoundError:
+                # Dihapus worker lain di antara lookup dan attach
+                value = None
+        self._incr('cache_hits' if value is not None else 'cache_misses')
+        return value
+
+    def put(self, path, kind, version, value):
+        path_b, kind_b = path.encode(), kind.encode()
+        size = len(value)
+        # Path/jenis yang tidak muat di field index tidak di-cache (ctypes akan memotongnya diam-diam)
+        if not self.fits(size) or len(path_b) >= SHARED_CACHE_PATH_LEN or len(kind_b) >= SHARED_CACHE_KIND_LEN:
+            return
+        self._detach_stale()
+        shm = shared_memory.SharedMemory(name=f"ets-{uuid.uuid4().hex[:24]}", create=True, size=size)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        shm.buf[:size] = value
+        shm.close()
+
+        dropped = []
+        evicted = 0
+        with self._index.get_lock():
+            slot = self._find(path_b, kind_b)
+            if slot is not None:
+                dropped.append(slot.segment.decode())
+                slot.segment = b''
+            used = sum(s.length for s in self._index if s.segment)
+            free = None
+            while True:
+                free = next((s for s in self._index if not s.segment), None)
+                if free is not None and used + size <= self.max_bytes:
+                    break
+                victim = min((s for s in self._index if s.segment), key=lambda s: s.last_used)
+                dropped.append(victim.segment.decode())
+                used -= victim.length
+                victim.segment = b''
+                evicted += 1
+            self._clock.value += 1
+            free.path, free.kind = path_b, kind_b
+            free.mtime_ns, free.file_size = version
+            free.length, free.last_used = size, self._clock.value
+            free.segment = shm.name.encode()
+        self._unlink(dropped)
+        if evicted:
+            self._incr('cache_evictions', evicted)
+
+    def _unlink(self, names):
+        # Attach lalu unlink; mapping yang masih dipakai proses lain tetap valid sampai mereka menutupnya
+        for name in names:
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            shm.close()
+            shm.unlink()
+
+    def invalidate(self, path):
+        path_b = path.encode()
+        dropped = []
+        with self._index.get_lock():
+            for slot in self._index:
+                if slot.segment and slot.path == path_b:
+                    dropped.append(slot.segment.decode())
+                    slot.segment = b''
+        self._unlink(dropped)
+
+    def snapshot(self):
+        with self._index.get_lock():
+            live = [slot.length for slot in self._index if slot.segment]
+        return dict(cache_entries=len(live), cache_used_bytes=sum(live), cache_max_bytes=self.max_bytes)
+
+    def close(self):
+        # Dipanggil proses induk saat shutdown: semua segmen yang masih terdaftar dihapus dari /dev/shm
+        with self._index.get_lock():
+            dropped = [slot.segment.decode() for slot in self._index if slot.segment]
+            for slot in self._index:
+                slot.segment = b''
+        self._unlink(dropped)
+
+
+if __name__=='__main__':
+    cache = FileCache(max_bytes=10)
+    cache.put('a', 'raw', (1, 6), b'aaaaaa')
+    cache.put('b', 'raw', (1, 6), b'bbbbbb')
+    print(cache.get('a', 'raw', (1, 6)), cache.get('b', 'raw', (1, 6)))
+    print(cache.snapshot())
+
+    shared = SharedFileCache(max_bytes=10)
+    shared.put('a', 'b64', (1, 4), b'YWFh')
+    print(bytes(shared.get('a', 'b64', (1, 4))), shared.snapshot())
+    shared.put('a', 'zlib+b64', (1, 4), b'eJzL')
+    print(bytes(shared.get('a', 'zlib+b64', (1, 4))), shared.get('a', 'zlib', (1, 4)))
+    shared.put('a', 'brotli+b64+extra', (1, 4), b'xxxx')
+    print('kind too long:', shared.get('a', 'brotli+b64+extra', (1, 4)))
+    shared.close()
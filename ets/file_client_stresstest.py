@@ -1,18 +1,31 @@
 import socket
 import json
 import base64
+import hashlib
 import logging
+import math
 import time
 import os
 import argparse
+import random
+import re
+import threading
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
+import compression
+import json_codec
+from frame_reader import FrameReader
+from latency_histogram import LatencyHistogram
+from file_interface import Base64ChunkDecoder
+from blob_store import HashingWriter, file_sha256
+
 server_address = ('0.0.0.0', 6665)
 
 FILENAME_MAP = {
     "10MB": "10m.jpg",
     "50MB": "50m.mp4",
-    "100MB": "100m.mp4"
+    "100MB": "100m.mp4",
+    "10MB_log": "10m.log"
 }
 
 def truncate_data(data, max_len=100):
@@ -22,46 +35,413 @@ def truncate_data(data, max_len=100):
         return s_data[:half_len] + "..." + s_data[-half_len:] + f" (len {len(s_data)})"
     return s_data
 
+class OpTimer:
+    """
+    Fase waktu satu operasi (per thread yang menjalankannya): connect = waktu
+    membuka koneksi baru, ttfb = dari request pertama dikirim sampai byte
+    response pertama diterima, transfer = sisa durasi setelah byte pertama.
+    wire_bytes = bytes yang benar-benar lewat socket (kirim + terima) pada
+    koneksi thread ini, bisa jauh lebih kecil dari isi file bila terkompres.
+    """
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.connect_s = 0.0
+        self.sent_at = None
+        self.first_byte_at = None
+        self.wire_bytes = 0
+
+    def phases(self, finished_at):
+        if self.sent_at is None or self.first_byte_at is None:
+            return dict(connect_sec=self.connect_s, ttfb_sec=None, transfer_sec=None)
+        return dict(connect_sec=self.connect_s,
+                    ttfb_sec=self.first_byte_at - self.sent_at,
+                    transfer_sec=finished_at - self.first_byte_at)
+
+_op_local = threading.local()
+
+def _current_timer():
+    return getattr(_op_local, 'timer', None)
+
+class _TimedSocket:
+    """Membungkus socket untuk FrameReader: mencatat saat byte response pertama dari operasi berjalan tiba."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.received = 0
+
+    def recv_into(self, buffer, nbytes=0):
+        n = self.sock.recv_into(buffer, nbytes)
+        self.received += n
+        timer = _current_timer()
+        if n and timer is not None:
+            timer.wire_bytes += n
+            if timer.sent_at is not None and timer.first_byte_at is None:
+                timer.first_byte_at = time.perf_counter()
+        return n
+
+class ClientConnection:
+    """Satu koneksi TCP ke server beserta FrameReader-nya (bytes yang tersisa tetap milik response berikutnya)."""
+    def __init__(self, address, timeout=300):
+        self.address = address
+        self.timeout = timeout
+        connect_start = time.perf_counter()
+        self.sock = socket.create_connection(address, timeout=timeout)
+        timer = _current_timer()
+        if timer is not None:
+            timer.connect_s += time.perf_counter() - connect_start
+        self.timed_sock = _TimedSocket(self.sock)
+        self.reader = FrameReader(self.timed_sock)
+        self.reused = False
+
+    def send_frames(self, command_strs):
+        timer = _current_timer()
+        if timer is not None and timer.sent_at is None:
+            timer.sent_at = time.perf_counter()
+        self.sendall("".join(c + "\r\n\r\n" for c in command_strs).encode())
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+        timer = _current_timer()
+        if timer is not None:
+            timer.wire_bytes += len(data)
+
+    def read_json(self):
+        frame = self.reader.read_frame()
+        if frame is None:
+            raise ConnectionError('Connection closed prematurely by server')
+        return json_codec.loads(frame)
+
+    def close(self):
+        self.sock.close()
+
+# Diatur oleh run_test_batch (sama seperti server_address) sehingga ikut terwarisi worker process.
+persistent_connections = False
+_pool_local = threading.local()
+_pool_lock = threading.Lock()
+_pool_all = []
+
+def _acquire_connection():
+    if not persistent_connections:
+        return ClientConnection(server_address)
+    conn = getattr(_pool_local, 'conn', None)
+    if conn is not None and conn.address == server_address:
+        conn.reused = True
+        return conn
+    if conn is not None:
+        _release_connection(conn, broken=True)
+    conn = ClientConnection(server_address)
+    _pool_local.conn = conn
+    with _pool_lock:
+        _pool_all.append(conn)
+    return conn
+
+def _release_connection(conn, broken=False):
+    if persistent_connections and not broken:
+        return
+    conn.close()
+    if getattr(_pool_local, 'conn', None) is conn:
+        _pool_local.conn = None
+    with _pool_lock:
+        if conn in _pool_all:
+            _pool_all.remove(conn)
+
+def close_pooled_connections():
+    with _pool_lock:
+        conns = list(_pool_all)
+        _pool_all.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except OSError:
+            pass
+    _pool_local.conn = None
+
+def _with_connection(func, command_name):
+    """
+    Menjalankan func(conn) pada koneksi dari pool. Koneksi pool yang ternyata
+    sudah ditutup server (idle timeout) dicoba ulang sekali dengan koneksi baru,
+    hanya bila belum ada byte response yang diterima: putus di tengah response
+    tidak diulang karena sink download sudah terisi sebagian.
+    """
+    for attempt in range(2):
+        conn = None
+        received = 0
+        try:
+            conn = _acquire_connection()
+            received = conn.timed_sock.received
+            result = func(conn)
+            _release_connection(conn)
+            return result
+        except (ConnectionError, BrokenPipeError) as e:
+            stale = conn is not None and conn.reused and conn.timed_sock.received == received
+            if conn is not None:
+                _release_connection(conn, broken=True)
+            if stale and attempt == 0:
+                logging.info(f"Pooled connection to {server_address} was stale ({e}), reconnecting for {command_name}")
+                continue
+            raise
+        except BaseException:
+            if conn is not None:
+                _release_connection(conn, broken=True)
+            raise
+
 def send_command(command_str=""):
-    global server_address
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    timeout_duration = 300 
-    sock.settimeout(timeout_duration)
-    
+    command_name = command_str.split(' ')[0]
     try:
-        sock.connect(server_address)
-
-        command_to_send = command_str + "\r\n\r\n"
-        
-        sock.sendall(command_to_send.encode())
-
-        data_received = ""
-        while True:
-            data = sock.recv(8192 * 2)
-            if data:
-                data_received += data.decode()
-                if "\r\n\r\n" in data_received:
-                    message_part = data_received.split("\r\n\r\n", 1)[0]
-                    try:
-                        hasil = json.loads(message_part)
-                    except json.JSONDecodeError as je:
-                        logging.error(f"JSONDecodeError from server: {je}. Received: {truncate_data(message_part)}")
-                        return dict(status='ERROR', data=f"JSONDecodeError: {je}")
-                    return hasil
-            else:
-                logging.warning(f"Socket closed by server prematurely for command {command_str.split(' ')[0]}. Received so far: {truncate_data(data_received)}")
-                return dict(status='ERROR', data='Connection closed prematurely by server')
+        return _with_connection(lambda conn: (conn.send_frames([command_str]), conn.read_json())[1], command_name)
+    except json.JSONDecodeError as je:
+        logging.error(f"JSONDecodeError from server: {je}. Received: {truncate_data(je.doc)}")
+        return dict(status='ERROR', data=f"JSONDecodeError: {je}")
     except socket.timeout:
-        logging.error(f"Socket timeout connecting or receiving from {server_address} for command {command_str.split(' ')[0]}")
-        return dict(status='ERROR', data=f'Socket timeout after {timeout_duration}s')
+        logging.error(f"Socket timeout connecting or receiving from {server_address} for command {command_name}")
+        return dict(status='ERROR', data='Socket timeout after 300s')
     except ConnectionRefusedError:
-        logging.error(f"Connection refused by {server_address} for command {command_str.split(' ')[0]}")
+        logging.error(f"Connection refused by {server_address} for command {command_name}")
         return dict(status='ERROR',data=f'Connection refused by server {server_address}')
+    except ConnectionError as e:
+        logging.warning(f"Socket closed by server prematurely for command {command_name}: {e}")
+        return dict(status='ERROR', data='Connection closed prematurely by server')
     except Exception as e:
-        logging.error(f"Error in send_command for {command_str.split(' ')[0]}: {e}", exc_info=False) # exc_info can be verbose
+        logging.error(f"Error in send_command for {command_name}: {e}", exc_info=False) # exc_info can be verbose
         return dict(status='ERROR',data=str(e))
+
+def send_commands_pipelined(command_strs):
+    """
+    Mengirim semua command sekaligus pada satu koneksi lalu membaca response
+    satu per satu. Mengembalikan list (hasil, detik sejak kirim, wire bytes)
+    sesuai urutan; wire bytes = frame command itu + bytes socket yang dibaca
+    sampai response-nya lengkap (read-ahead ikut response yang sedang dibaca).
+    """
+    def _run(conn):
+        # OpTimer sendiri untuk koneksi ini, hanya untuk menghitung bytes yang diterima per response
+        previous_timer, _op_local.timer = _current_timer(), OpTimer()
+        try:
+            sent_at = time.perf_counter()
+            conn.send_frames(command_strs)
+            received_mark = _op_local.timer.wire_bytes
+            responses = []
+            for command in command_strs:
+                hasil = conn.read_json()
+                wire_bytes = len((command + "\r\n\r\n").encode()) + _op_local.timer.wire_bytes - received_mark
+                received_mark = _op_local.timer.wire_bytes
+                responses.append((hasil, time.perf_counter() - sent_at, wire_bytes))
+            return responses
+        finally:
+            _op_local.timer = previous_timer
+    try:
+        return _with_connection(_run, f"{len(command_strs)} pipelined")
+    except Exception as e:
+        logging.error(f"Error in send_commands_pipelined ({len(command_strs)} commands): {e}", exc_info=False)
+        return [(dict(status='ERROR', data=str(e)), 0, 0)] * len(command_strs)
+
+BINARY_CHUNK_SIZE = 1024 * 1024
+
+"""
+* tujuan isi file hasil download (download_sink):
+  - memory : response JSON utuh di memori, data_file didecode setelahnya (perilaku awal)
+  - discard: isi file didecode/dihitung per potongan lalu dibuang
+  - disk   : isi file didecode per potongan dan ditulis ke DOWNLOAD_DIR
+"""
+DOWNLOAD_SINKS = ('memory', 'discard', 'disk')
+DOWNLOAD_DIR = 'downloads'
+download_sink = 'memory'
+
+def _download_path(filename):
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    # Satu file per worker agar download paralel dengan nama sama tidak saling menimpa
+    local_name = f"{os.getpid()}-{threading.get_ident()}-{os.path.basename(filename)}"
+    return os.path.join(DOWNLOAD_DIR, local_name)
+
+def _open_download_sink(filename):
+    if download_sink != 'disk':
+        return None
+    return open(_download_path(filename), 'wb')
+
+# Diatur oleh run_test_batch: True = isi yang diterima dibandingkan dengan data_sha256 dari server
+# (di-hash sambil di-stream, tanpa membaca ulang file); False untuk mengukur overhead-nya.
+verify_checksums = True
+
+def _checksum_mismatch(hasil, digest):
+    """Pesan error bila data_sha256 dari server berbeda dengan hash isi yang diterima/dikirim, selain itu None."""
+    expected = hasil.get('data_sha256')
+    if expected is None or expected == digest:
+        return None
+    return f"Checksum mismatch for '{hasil.get('data_namafile', '')}': server sha256 {expected}, local {digest}"
+
+def _checksum_sink(sink):
+    return HashingWriter(sink) if verify_checksums else sink
+
+def _verified(hasil, out):
+    # out: sink dari _checksum_sink yang sudah menerima seluruh isi asli
+    if hasil.get('status') != 'OK' or not isinstance(out, HashingWriter):
+        return hasil
+    mismatch = _checksum_mismatch(hasil, out.hexdigest())
+    return hasil if mismatch is None else dict(status='ERROR', data=mismatch)
+
+DATA_FILE_MARKER = b'"data_file": "'
+DATA_ENCODING_PATTERN = re.compile(rb'"data_encoding":\s*"(\w+)"')
+
+# Diatur oleh run_test_batch: codec yang diterima untuk download file utuh (token encoding=..., lihat compression.py)
+accept_encoding = []
+
+def _with_encoding(command_str):
+    return f"{command_str} encoding={','.join(accept_encoding)}" if accept_encoding else command_str
+
+def resolve_encoding(requested):
+    """
+    --compress: 'none' -> [], codec tertentu -> [codec], 'auto' -> codec
+    dari ENCODINGS server yang juga tersedia di client (urutan server).
+    """
+    if requested == 'none':
+        return []
+    if requested != 'auto':
+        if requested not in compression.available():
+            raise ValueError(f"Codec '{requested}' is not available on this client (available: {compression.available()}).")
+        return [requested]
+    hasil = send_command("ENCODINGS")
+    if hasil.get('status') != 'OK':
+        logging.warning(f"ENCODINGS failed ({hasil.get('data')}), downloading uncompressed.")
+        return []
+    return [codec for codec in hasil['data'] if codec in compression.available()]
+
+def _read_get_response_streaming(conn, sink=None):
+    """
+    Membaca response GET text tanpa menampung base64-nya: bagian JSON sebelum
+    data_file dan sesudah penutup '"' disimpan, isi data_file didecode per potongan
+    ke sink (atau dibuang). Mengembalikan (hasil, jumlah bytes hasil decode).
+    Bila header berisi data_encoding, hasil decode dibongkar lagi (StreamDecoder)
+    dan jumlah bytes yang dikembalikan adalah ukuran isi asli.
+    """
+    head = bytearray()
+    tail = bytearray()
+    state = 'head'
+    decoder = Base64ChunkDecoder()
+    inflate = None
+    total = 0
+    for chunk in conn.reader.iter_frame():
+        if state == 'head':
+            head += chunk
+            idx = head.find(DATA_FILE_MARKER)
+            if idx < 0:
+                continue
+            start = idx + len(DATA_FILE_MARKER)
+            chunk = bytes(head[start:])
+            del head[start:]
+            encoding = DATA_ENCODING_PATTERN.search(head)
+            if encoding:
+                inflate = compression.StreamDecoder(encoding.group(1).decode(), sink)
+            state = 'payload'
+        if state == 'payload':
+            quote = chunk.find(b'"')
+            payload = chunk if quote < 0 else chunk[:quote]
+            decoded = decoder.feed(payload)
+            if inflate is not None:
+                inflate.write(decoded)
+            else:
+                total += len(decoded)
+                if sink is not None:
+                    sink.write(decoded)
+            if quote < 0:
+                continue
+            decoder.finish()
+            if inflate is not None:
+                inflate.flush()
+                total = inflate.size
+            chunk = chunk[quote:]
+            state = 'tail'
+        tail += chunk
+    hasil = json_codec.loads(bytes(head + tail))
+    if state != 'head':
+        hasil['data_size'] = total
+    return hasil, total
+
+def send_command_streaming_get(filename):
+    sink = None
+    try:
+        sink = _open_download_sink(filename)
+        def _run(conn):
+            out = _checksum_sink(sink)
+            conn.send_frames([_with_encoding(f"GET {filename}")])
+            hasil, total = _read_get_response_streaming(conn, out)
+            return _verified(hasil, out), total
+        return _with_connection(_run, "GET")
+    except socket.timeout:
+        logging.error(f"Socket timeout connecting or receiving from {server_address} for command GET")
+        return dict(status='ERROR', data='Socket timeout'), 0
+    except ConnectionRefusedError:
+        logging.error(f"Connection refused by {server_address} for command GET")
+        return dict(status='ERROR', data=f'Connection refused by server {server_address}'), 0
+    except base64.binascii.Error as b64e:
+        logging.error(f"Base64 decode error for GET '{filename}': {b64e}")
+        return dict(status='ERROR', data=f"Base64 decode error: {b64e}"), 0
+    except Exception as e:
+        logging.error(f"Error in send_command_streaming_get for '{filename}': {e}", exc_info=False)
+        return dict(status='ERROR', data=str(e)), 0
     finally:
-        sock.close()
+        if sink:
+            sink.close()
+
+def send_command_binary_get(filename):
+    """
+    GETB: header JSON lalu raw bytes; body ditulis ke sink disk atau dibuang,
+    tidak ditampung di memori. Body terkompres (data_encoding) dibongkar per
+    potongan; yang dikembalikan tetap ukuran isi asli.
+    """
+    sink = None
+    def _run(conn):
+        conn.send_frames([_with_encoding(f"GETB {filename}")])
+        hasil = conn.read_json()
+        if hasil.get('status') != 'OK':
+            return hasil, 0
+        size = int(hasil.get('data_size', 0))
+        out = _checksum_sink(sink)
+        if 'data_encoding' not in hasil:
+            conn.reader.read_exact(size, sink=out)
+            return _verified(hasil, out), size
+        inflate = compression.StreamDecoder(hasil['data_encoding'], out)
+        conn.reader.read_exact(size, sink=inflate)
+        inflate.flush()
+        if inflate.size != hasil.get('data_raw_size'):
+            raise ValueError(f"Decompressed {inflate.size} bytes, expected {hasil.get('data_raw_size')}.")
+        return _verified(hasil, out), inflate.size
+    try:
+        sink = _open_download_sink(filename)
+        return _with_connection(_run, "GETB")
+    except socket.timeout:
+        logging.error(f"Socket timeout connecting or receiving from {server_address} for command GETB")
+        return dict(status='ERROR', data='Socket timeout'), 0
+    except ConnectionRefusedError:
+        logging.error(f"Connection refused by {server_address} for command GETB")
+        return dict(status='ERROR', data=f'Connection refused by server {server_address}'), 0
+    except Exception as e:
+        logging.error(f"Error in send_command_binary_get for '{filename}': {e}", exc_info=False)
+        return dict(status='ERROR', data=str(e)), 0
+    finally:
+        if sink:
+            sink.close()
+
+def send_command_binary_upload(local_path, remote_name):
+    """UPLOADB: header teks berisi ukuran lalu raw bytes dikirim per chunk dari disk."""
+    def _run(conn):
+        size = os.path.getsize(local_path)
+        conn.send_frames([f"UPLOADB {remote_name} {size}"])
+        with open(local_path, 'rb') as fp:
+            while True:
+                chunk = fp.read(BINARY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                conn.sendall(chunk)
+        return conn.read_json()
+    try:
+        return _with_connection(_run, "UPLOADB")
+    except socket.timeout:
+        logging.error(f"Socket timeout connecting or receiving from {server_address} for command UPLOADB")
+        return dict(status='ERROR', data='Socket timeout')
+    except ConnectionRefusedError:
+        logging.error(f"Connection refused by {server_address} for command UPLOADB")
+        return dict(status='ERROR', data=f'Connection refused by server {server_address}')
+    except Exception as e:
+        logging.error(f"Error in send_command_binary_upload for '{local_path}': {e}", exc_info=False)
+        return dict(status='ERROR', data=str(e))
 
 def remote_list():
     command_str = "LIST"
@@ -72,11 +452,33 @@ def remote_list():
         logging.error(f"Gagal LIST: {hasil.get('data', 'Unknown error')}")
         return False, hasil
 
-def remote_get(filename=""):
+def remote_stats():
+    hasil = send_command("STATS")
+    if hasil.get('status') == 'OK':
+        return True, hasil
+    else:
+        logging.error(f"Gagal STATS: {hasil.get('data', 'Unknown error')}")
+        return False, hasil
+
+def remote_get(filename="", transfer_mode='text'):
     if not filename:
         return False, {"status": "ERROR", "data": "Filename for GET not provided"}, 0
+
+    if transfer_mode == 'binary':
+        hasil, bytes_dl = send_command_binary_get(filename)
+        if hasil.get('status') == 'OK':
+            return True, hasil, bytes_dl
+        logging.error(f"Gagal GETB '{filename}': {hasil.get('data', 'Unknown error')}")
+        return False, hasil, 0
+
+    if download_sink != 'memory':
+        hasil, bytes_dl = send_command_streaming_get(filename)
+        if hasil.get('status') == 'OK':
+            return True, hasil, bytes_dl
+        logging.error(f"Gagal GET '{filename}': {hasil.get('data', 'Unknown error')}")
+        return False, hasil, 0
         
-    command_str = f"GET {filename}"
+    command_str = _with_encoding(f"GET {filename}")
     hasil = send_command(command_str)
     bytes_dl = 0
     if hasil.get('status') == 'OK':
@@ -84,7 +486,13 @@ def remote_get(filename=""):
             isifile_b64 = hasil.get('data_file', '')
             if isifile_b64:
                 decoded_bytes = base64.b64decode(isifile_b64)
+                if 'data_encoding' in hasil:
+                    decoded_bytes = compression.decompress(hasil['data_encoding'], decoded_bytes)
                 bytes_dl = len(decoded_bytes)
+                mismatch = _checksum_mismatch(hasil, hashlib.sha256(decoded_bytes).hexdigest()) if verify_checksums else None
+                if mismatch is not None:
+                    logging.error(f"Gagal GET '{filename}': {mismatch}")
+                    return False, {"status": "ERROR", "data": mismatch}, 0
             else:
                 logging.warning(f"GET '{filename}' status OK, but no 'data_file' field or it's empty in response.")
             return True, hasil, bytes_dl
@@ -98,7 +506,195 @@ def remote_get(filename=""):
         logging.error(f"Gagal GET '{filename}': {hasil.get('data', 'Unknown error')}")
         return False, hasil, 0
 
-def remote_upload(filename_local_and_remote=""):
+def remote_stat(filename=""):
+    hasil = send_command(f"STAT {filename}")
+    if hasil.get('status') == 'OK':
+        return True, hasil
+    else:
+        logging.error(f"Gagal STAT '{filename}': {hasil.get('data', 'Unknown error')}")
+        return False, hasil
+
+# Diatur oleh run_test_batch; > 1 berarti satu download dipecah menjadi sekian range paralel.
+parallel_ranges = 1
+RANGE_MAX_RETRIES = 3
+
+class _RangeSink:
+    """Menulis isi range ke file tujuan pada offset-nya (pwrite) atau membuangnya, sambil mencatat progres."""
+    def __init__(self, fd, offset):
+        self.fd = fd
+        self.offset = offset
+        self.written = 0
+
+    def write(self, data):
+        if self.fd is not None:
+            os.pwrite(self.fd, data, self.offset + self.written)
+        self.written += len(data)
+
+def _fetch_range(conn, filename, offset, length, transfer_mode, sink):
+    if transfer_mode == 'binary':
+        conn.send_frames([f"GETB {filename} {offset} {length}"])
+        hasil = conn.read_json()
+        if hasil.get('status') == 'OK':
+            conn.reader.read_exact(int(hasil.get('data_size', 0)), sink=sink)
+        return hasil
+    conn.send_frames([f"GET {filename} {offset} {length}"])
+    hasil, _ = _read_get_response_streaming(conn, sink)
+    return hasil
+
+def remote_get_range(filename, offset, length, transfer_mode='text', fd=None):
+    """
+    Mengambil bytes [offset, offset+length) dari file. Bila koneksi putus di
+    tengah jalan, range dilanjutkan dari byte terakhir yang diterima (bukan dari awal).
+    """
+    sink = _RangeSink(fd, offset)
+    hasil = dict(status='ERROR', data='Range not attempted')
+    for attempt in range(RANGE_MAX_RETRIES + 1):
+        if sink.written >= length:
+            break
+        try:
+            hasil = _with_connection(
+                lambda conn: _fetch_range(conn, filename, offset + sink.written, length - sink.written, transfer_mode, sink),
+                "GET range")
+        except (OSError, ValueError) as e:
+            hasil = dict(status='ERROR', data=str(e))
+            logging.warning(f"Range {offset}+{length} of '{filename}' interrupted after {sink.written} bytes ({e}); resuming (attempt {attempt + 1}/{RANGE_MAX_RETRIES}).")
+            continue
+        if hasil.get('status') != 'OK':
+            break
+    return sink.written == length and hasil.get('status') == 'OK', hasil, sink.written
+
+def remote_get_parallel(filename="", num_ranges=2, transfer_mode='text'):
+    """
+    STAT lalu download file sebagai num_ranges range yang diambil bersamaan lewat
+    koneksi terpisah. Dengan download_sink 'disk' tiap range ditulis langsung ke
+    posisinya di satu file; selain itu isi range dibuang.
+    """
+    ok, hasil = remote_stat(filename)
+    if not ok:
+        return False, hasil, 0
+    size = int(hasil['data_size'])
+    part = max(1, -(-size // num_ranges))
+    ranges = [(start, min(part, size - start)) for start in range(0, size, part)]
+
+    fd = None
+    if download_sink == 'disk':
+        fd = os.open(_download_path(filename), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.ftruncate(fd, size)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(ranges))) as executor:
+            results = list(executor.map(lambda r: remote_get_range(filename, r[0], r[1], transfer_mode, fd), ranges))
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+    bytes_dl = sum(r[2] for r in results)
+    failed = [r[1] for r in results if not r[0]]
+    if failed:
+        logging.error(f"Gagal GET paralel '{filename}': {len(failed)}/{len(ranges)} range gagal, contoh: {failed[0].get('data', 'Unknown error')}")
+        return False, failed[0], bytes_dl
+    return True, dict(status='OK', data_namafile=filename, data_size=bytes_dl, data_ranges=len(ranges)), bytes_dl
+
+# Diatur oleh run_test_batch; > 1 berarti satu upload dipecah menjadi sekian part paralel (UPLOAD_INIT/PART/COMMIT).
+parallel_parts = 1
+
+def _send_part(conn, upload_id, n, fd, offset, length, transfer_mode):
+    if transfer_mode == 'binary':
+        conn.send_frames([f"UPLOAD_PARTB {upload_id} {n} {length}"])
+        sent = 0
+        while sent < length:
+            chunk = os.pread(fd, min(BINARY_CHUNK_SIZE, length - sent), offset + sent)
+            if not chunk:
+                raise IOError(f"Local file truncated while sending part {n}.")
+            conn.sendall(chunk)
+            sent += len(chunk)
+    else:
+        isipart_b64 = base64.b64encode(os.pread(fd, length, offset)).decode()
+        conn.send_frames([f"UPLOAD_PART {upload_id} {n} {isipart_b64}"])
+    return conn.read_json()
+
+def remote_upload_part(upload_id, n, fd, offset, length, transfer_mode='text'):
+    """Mengirim satu part; bila koneksi putus hanya part ini yang dikirim ulang."""
+    hasil = dict(status='ERROR', data='Part not attempted')
+    for attempt in range(RANGE_MAX_RETRIES + 1):
+        try:
+            hasil = _with_connection(lambda conn: _send_part(conn, upload_id, n, fd, offset, length, transfer_mode), "UPLOAD_PART")
+        except (OSError, ValueError) as e:
+            hasil = dict(status='ERROR', data=str(e))
+            logging.warning(f"Part {n} of upload {upload_id} interrupted ({e}); resending (attempt {attempt + 1}/{RANGE_MAX_RETRIES}).")
+            continue
+        break
+    return hasil.get('status') == 'OK', hasil
+
+def remote_upload_multipart(local_path, remote_name, num_parts=2, transfer_mode='text'):
+    """
+    UPLOAD_INIT lalu kirim num_parts part bersamaan lewat koneksi terpisah,
+    kemudian UPLOAD_COMMIT. Part yang menurut server belum diterima dikirim
+    ulang sekali sebelum commit dicoba lagi; bila tetap gagal sesi di-ABORT.
+    """
+    size = os.path.getsize(local_path)
+    part_size = max(1, -(-size // num_parts))
+    hasil = send_command(f"UPLOAD_INIT {remote_name} {size} {part_size}")
+    if hasil.get('status') != 'OK':
+        logging.error(f"Gagal UPLOAD_INIT '{remote_name}': {hasil.get('data', 'Unknown error')}")
+        return False, hasil
+    upload_id = hasil['data_upload_id']
+    parts = list(range(int(hasil['data_parts'])))
+
+    fd = os.open(local_path, os.O_RDONLY)
+    try:
+        for attempt in range(2):
+            with ThreadPoolExecutor(max_workers=max(1, len(parts))) as executor:
+                list(executor.map(lambda n: remote_upload_part(upload_id, n, fd, n * part_size, min(part_size, size - n * part_size), transfer_mode), parts))
+            hasil = send_command(f"UPLOAD_COMMIT {upload_id}")
+            if hasil.get('status') == 'OK' or not hasil.get('data_missing'):
+                break
+            parts = hasil['data_missing']
+            logging.warning(f"Upload {upload_id} of '{remote_name}' missing {len(parts)} part(s) at commit, resending them.")
+    finally:
+        os.close(fd)
+
+    if hasil.get('status') != 'OK':
+        logging.error(f"Gagal UPLOAD_COMMIT '{remote_name}': {hasil.get('data', 'Unknown error')}")
+        send_command(f"UPLOAD_ABORT {upload_id}")
+        return False, hasil
+    return True, hasil
+
+# Diatur oleh run_test_batch; True berarti tiap upload diawali HAVE sha256 (server --dedup) dan isi
+# hanya dikirim bila server belum menyimpannya.
+dedup_uploads = False
+_local_digests = {}
+
+def _local_sha256(path):
+    # Hash file lokal dihitung sekali per (path, mtime, size), bukan per op
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key not in _local_digests:
+        _local_digests[key] = file_sha256(path)
+    return _local_digests[key]
+
+def remote_have(local_path, remote_name):
+    """HAVE sha256 namafile: True bila server sudah punya isinya dan langsung menautkannya ke remote_name."""
+    hasil = send_command(f"HAVE {_local_sha256(local_path)} {remote_name}")
+    if hasil.get('status') != 'OK':
+        logging.warning(f"HAVE '{remote_name}' gagal, upload dikirim utuh: {hasil.get('data', 'Unknown error')}")
+        return False, hasil
+    return bool(hasil.get('data_have')), hasil
+
+def _upload_verified(local_path, hasil):
+    # data_sha256 di response upload = hash isi yang diterima server; dibandingkan dengan hash file lokal (di-cache per versi).
+    # Response upload selalu membawanya, jadi bila tidak ada upload dianggap tidak terverifikasi (gagal).
+    if not verify_checksums:
+        return True, hasil
+    if hasil.get('data_sha256') is None:
+        mismatch = f"Upload response for '{local_path}' has no data_sha256, content cannot be verified"
+    else:
+        mismatch = _checksum_mismatch(hasil, _local_sha256(local_path))
+    if mismatch is None:
+        return True, hasil
+    logging.error(f"Gagal UPLOAD '{local_path}': {mismatch}")
+    return False, dict(status='ERROR', data=mismatch)
+
+def remote_upload(filename_local_and_remote="", transfer_mode='text'):
     if not filename_local_and_remote:
         logging.error("UPLOAD call missing filename.")
         return False, {"status": "ERROR", "data": "Filename for upload not provided"}, 0
@@ -108,6 +704,27 @@ def remote_upload(filename_local_and_remote=""):
         return False, {"status": "ERROR", "data": f"Local file '{filename_local_and_remote}' not found"}, 0
     
     bytes_ul = 0
+    if dedup_uploads:
+        # Isi yang sudah ada di server tidak dikirim; bytes dihitung ukuran file (logis) agar op tetap sebanding
+        have, hasil = remote_have(filename_local_and_remote, filename_local_and_remote)
+        if have:
+            return True, hasil, os.path.getsize(filename_local_and_remote)
+
+    if parallel_parts > 1:
+        ok, hasil = remote_upload_multipart(filename_local_and_remote, filename_local_and_remote, parallel_parts, transfer_mode)
+        if ok:
+            ok, hasil = _upload_verified(filename_local_and_remote, hasil)
+        return ok, hasil, os.path.getsize(filename_local_and_remote) if ok else 0
+
+    if transfer_mode == 'binary':
+        bytes_ul = os.path.getsize(filename_local_and_remote)
+        hasil = send_command_binary_upload(filename_local_and_remote, filename_local_and_remote)
+        if hasil.get('status') == 'OK':
+            ok, hasil = _upload_verified(filename_local_and_remote, hasil)
+            return ok, hasil, bytes_ul if ok else 0
+        logging.error(f"Gagal UPLOADB '{filename_local_and_remote}': {hasil.get('data', 'Unknown error')}")
+        return False, hasil, 0
+
     try:
         bytes_ul = os.path.getsize(filename_local_and_remote)
         with open(filename_local_and_remote, 'rb') as fp:
@@ -118,7 +735,8 @@ def remote_upload(filename_local_and_remote=""):
         hasil = send_command(command_str)
 
         if hasil.get('status') == 'OK':
-            return True, hasil, bytes_ul
+            ok, hasil = _upload_verified(filename_local_and_remote, hasil)
+            return ok, hasil, bytes_ul if ok else 0
         else:
             logging.error(f"Gagal UPLOAD '{filename_local_and_remote}': {hasil.get('data', 'Unknown error')}")
             return False, hasil, 0
@@ -140,44 +758,180 @@ def remote_delete(filename=""):
         logging.error(f"Gagal DELETE '{filename}': {hasil.get('data', 'Unknown error')}")
         return False, hasil
 
-def client_single_op_runner(action, file_key):
-    start_time = time.perf_counter()
+def client_single_op_runner(action, file_key, transfer_mode='text', intended_start=None):
+    """
+    intended_start (open-loop): waktu mulai terjadwal (perf_counter, CLOCK_MONOTONIC
+    yang sama untuk semua process di Linux). Durasi dihitung dari waktu itu sehingga
+    antrian di client saat server melambat ikut terukur (queue_sec).
+    """
+    _op_local.timer = timer = OpTimer()
+    start_time = timer.started_at if intended_start is None else intended_start
     success = False
     bytes_transferred = 0
     
     filename_to_use = FILENAME_MAP[file_key]
 
     if action == "upload":
-        success, _, bytes_transferred = remote_upload(filename_to_use)
+        success, _, bytes_transferred = remote_upload(filename_to_use, transfer_mode)
+    elif action == "download" and parallel_ranges > 1:
+        success, _, bytes_transferred = remote_get_parallel(filename_to_use, parallel_ranges, transfer_mode)
     elif action == "download":
-        success, _, bytes_transferred = remote_get(filename_to_use)
+        success, _, bytes_transferred = remote_get(filename_to_use, transfer_mode)
+    elif action == "list":
+        success, _ = remote_list()
     
-    duration_sec = time.perf_counter() - start_time
+    finished_at = time.perf_counter()
+    duration_sec = finished_at - start_time
+    _op_local.timer = None
     
     return {
         "success": success,
         "duration_sec": duration_sec,
         "bytes_transferred": bytes_transferred if success else 0,
+        "wire_bytes": timer.wire_bytes if success else 0,
+        "queue_sec": timer.started_at - start_time,
+        **timer.phases(finished_at),
     }
 
+PIPELINE_ACTIONS = ('list', 'download')
+
+def client_pipelined_op_runner(action, file_key, depth):
+    """
+    Menjalankan `depth` operasi text (LIST atau GET) yang dikirim sekaligus pada
+    satu koneksi. Durasi tiap operasi dihitung dari saat kirim sampai response-nya tiba.
+    """
+    if action == 'list':
+        commands = ["LIST"] * depth
+    else:
+        commands = [_with_encoding(f"GET {FILENAME_MAP[file_key]}")] * depth
+
+    results = []
+    for hasil, duration_sec, wire_bytes in send_commands_pipelined(commands):
+        success = hasil.get('status') == 'OK'
+        bytes_transferred = 0
+        if success and action == 'download':
+            decoded = base64.b64decode(hasil.get('data_file', ''))
+            if 'data_encoding' in hasil:
+                decoded = compression.decompress(hasil['data_encoding'], decoded)
+            bytes_transferred = len(decoded)
+            mismatch = _checksum_mismatch(hasil, hashlib.sha256(decoded).hexdigest()) if verify_checksums else None
+            if mismatch is not None:
+                logging.error(f"Gagal GET (pipelined): {mismatch}")
+                success, bytes_transferred = False, 0
+        elif not success:
+            logging.error(f"Gagal {commands[0].split(' ')[0]} (pipelined): {hasil.get('data', 'Unknown error')}")
+        results.append({
+            "success": success,
+            "duration_sec": duration_sec,
+            "bytes_transferred": bytes_transferred,
+            "wire_bytes": wire_bytes if success else 0,
+        })
+    return results
+
+
+LATENCY_PHASES = ('latency', 'queue', 'connect', 'ttfb', 'transfer')
+
+ARRIVAL_MODES = ('constant', 'poisson')
+# Op yang dikirim lebih lambat dari ini setelah jadwalnya dihitung sebagai late dispatch (client kewalahan)
+LATE_DISPATCH_TOLERANCE_S = 0.01
+# Open-loop: pool client diukur dengan hukum Little (op berjalan = rate x latensi) memakai latensi wajar
+# terburuk ini, supaya kedatangan tidak mengantri di executor dan beban tetap sesuai --rate
+OPEN_LOOP_EXPECTED_LATENCY_S = 2.0
+OPEN_LOOP_MAX_WORKERS = 512
+
+def parse_duration(text):
+    """'60', '60s', '500ms', '2m', '1h' -> detik (float)."""
+    match = re.fullmatch(r'\s*([0-9]*\.?[0-9]+)\s*(ms|s|m|h)?\s*', str(text))
+    if not match:
+        raise ValueError(f"Invalid duration '{text}'")
+    scale = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[match.group(2) or 's']
+    return float(match.group(1)) * scale
+
+def arrival_offsets(rate, arrival='constant', ramp_up_s=0.0, duration_s=None, max_ops=None, seed=None):
+    """
+    Jadwal open-loop: offset (detik dari awal batch) tiap op. Titik kedatangan
+    laju 1 (k untuk constant, jumlahan Exp(1) untuk poisson) dipetakan lewat
+    invers intensitas kumulatif, yang naik linear dari 0 ke `rate` selama
+    ramp_up_s lalu konstan. Berhenti di duration_s atau setelah max_ops op.
+    """
+    rng = random.Random(seed)
+    ramp_area = rate * ramp_up_s / 2
+    unit_time = 0.0
+    count = 0
+    while max_ops is None or count < max_ops:
+        if unit_time < ramp_area:
+            offset = (2 * ramp_up_s * unit_time / rate) ** 0.5
+        else:
+            offset = ramp_up_s + (unit_time - ramp_area) / rate
+        if duration_s is not None and offset >= duration_s:
+            return
+        yield offset
+        count += 1
+        unit_time += rng.expovariate(1.0) if arrival == 'poisson' else 1.0
 
 def run_test_batch(
         p_server_ip, p_server_port,
         p_action, p_file_key,
         p_num_client_workers, p_total_ops,
-        p_client_pool_mode):
-    
-    global server_address
+        p_client_pool_mode, p_transfer_mode='text',
+        p_persistent=False, p_pipeline_depth=1, p_download_sink='memory',
+        p_parallel_ranges=1, p_parallel_parts=1, p_dedup=False, p_compress='none', p_verify=True,
+        p_rate=None, p_duration_s=None, p_arrival='constant', p_ramp_up_s=0.0, p_expected_latency_s=OPEN_LOOP_EXPECTED_LATENCY_S):
+    """
+    Closed-loop (default): p_total_ops op dibagi ke p_num_client_workers worker,
+    op berikutnya baru dikirim setelah yang sebelumnya selesai.
+
+    Open-loop (p_rate = op/detik): op dikirim sesuai jadwal arrival_offsets
+    tanpa menunggu op sebelumnya, selama p_duration_s detik (atau p_total_ops
+    op bila tidak diisi). Latensi dihitung dari waktu terjadwal, sehingga
+    perlambatan server tidak menurunkan beban yang diberikan (coordinated omission).
+    Pool client minimal ceil(p_rate * p_expected_latency_s) worker (p_num_client_workers
+    hanya batas bawah); kedatangan yang tetap harus mengantri karena semua worker
+    sibuk dihitung sebagai queued dispatch dan waktu antriannya masuk latensi (queue).
+
+    p_compress: kompresi download file utuh (lihat resolve_encoding). Throughput
+    efektif dihitung dari isi asli, throughput wire dari bytes yang lewat socket
+    (tidak termasuk koneksi sub-thread parallel ranges/parts).
+    """
+    global server_address, persistent_connections, download_sink, parallel_ranges, parallel_parts, dedup_uploads, accept_encoding, verify_checksums
     server_address = (p_server_ip, p_server_port)
+    persistent_connections = p_persistent
+    download_sink = p_download_sink
+    parallel_ranges = p_parallel_ranges
+    parallel_parts = p_parallel_parts
+    dedup_uploads = p_dedup
+    verify_checksums = p_verify
+    accept_encoding = resolve_encoding(p_compress)
+    close_pooled_connections()
 
     ExecutorClass = ThreadPoolExecutor if p_client_pool_mode == 'thread' else ProcessPoolExecutor
     
     logging.info(
         f"Starting Batch: TargetServer={server_address}, Action={p_action}, FileKey={p_file_key}, "
-        f"ClientWorkers={p_num_client_workers}, TotalOps={p_total_ops}, ClientMode={p_client_pool_mode}"
+        f"ClientWorkers={p_num_client_workers}, TotalOps={p_total_ops}, ClientMode={p_client_pool_mode}, TransferMode={p_transfer_mode}, "
+        f"Persistent={p_persistent}, PipelineDepth={p_pipeline_depth}, DownloadSink={p_download_sink}, ParallelRanges={p_parallel_ranges}, ParallelParts={p_parallel_parts}, Dedup={p_dedup}, "
+        f"Compress={p_compress} (accept: {','.join(accept_encoding) or 'none'}), VerifyChecksums={p_verify}, "
+        f"Rate={p_rate}, Duration={p_duration_s}, Arrival={p_arrival}, RampUp={p_ramp_up_s}"
     )
 
+    open_loop = p_rate is not None and p_rate > 0
+    use_pipeline = p_pipeline_depth > 1
+    if use_pipeline and open_loop:
+        logging.warning("Pipelining is not supported in open-loop (--rate) mode; running unpipelined.")
+        use_pipeline = False
+    if use_pipeline and (p_action not in PIPELINE_ACTIONS or p_transfer_mode != 'text'):
+        logging.warning(f"Pipelining only applies to text {'/'.join(PIPELINE_ACTIONS)}; running {p_action} ({p_transfer_mode}) unpipelined.")
+        use_pipeline = False
+
+    pool_size = p_num_client_workers
+    if open_loop:
+        pool_size = max(p_num_client_workers, min(OPEN_LOOP_MAX_WORKERS, math.ceil(p_rate * p_expected_latency_s)))
+        if pool_size > p_num_client_workers:
+            logging.info(f"Open-loop: client pool sized to {pool_size} workers for {p_rate} ops/s x {p_expected_latency_s}s expected latency.")
+
     op_results_list = []
+    late_dispatches = 0
+    queued_dispatches = 0
     batch_start_time = time.perf_counter()
 
     if p_action == 'upload':
@@ -189,16 +943,45 @@ def run_test_batch(
                 f"This batch will likely have all ops fail."
             )
 
-    with ExecutorClass(max_workers=p_num_client_workers) as executor:
-        futures = [executor.submit(client_single_op_runner, p_action, p_file_key) for _ in range(p_total_ops)]
+    with ExecutorClass(max_workers=pool_size) as executor:
+        if use_pipeline:
+            depths = [p_pipeline_depth] * (p_total_ops // p_pipeline_depth)
+            if p_total_ops % p_pipeline_depth:
+                depths.append(p_total_ops % p_pipeline_depth)
+            futures = {executor.submit(client_pipelined_op_runner, p_action, p_file_key, d): d for d in depths}
+        elif open_loop:
+            futures = {}
+            in_flight = set()
+            schedule = arrival_offsets(p_rate, p_arrival, p_ramp_up_s, p_duration_s,
+                                       max_ops=None if p_duration_s else p_total_ops)
+            for offset in schedule:
+                intended_start = batch_start_time + offset
+                delay = intended_start - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif -delay > LATE_DISPATCH_TOLERANCE_S:
+                    late_dispatches += 1
+                in_flight = {f for f in in_flight if not f.done()}
+                if len(in_flight) >= pool_size:
+                    queued_dispatches += 1
+                future = executor.submit(client_single_op_runner, p_action, p_file_key, p_transfer_mode, intended_start)
+                futures[future] = 1
+                in_flight.add(future)
+            if late_dispatches:
+                logging.warning(f"{late_dispatches}/{len(futures)} ops were dispatched >{LATE_DISPATCH_TOLERANCE_S}s behind schedule (client-side limit, not server latency).")
+            if queued_dispatches:
+                logging.warning(f"{queued_dispatches}/{len(futures)} ops waited for a free client worker (all {pool_size} busy); their wait is in the queue latency. Raise --expected_latency to offer the full rate.")
+        else:
+            futures = {executor.submit(client_single_op_runner, p_action, p_file_key, p_transfer_mode): 1 for _ in range(p_total_ops)}
         
         for i, future in enumerate(as_completed(futures)):
             try:
                 result = future.result()
-                op_results_list.append(result)
+                op_results_list.extend(result if use_pipeline else [result])
             except Exception as e:
                 logging.error(f"Exception from a client task future: {e}", exc_info=True)
-                op_results_list.append({"success": False, "duration_sec": 0, "bytes_transferred": 0})
+                op_results_list.extend({"success": False, "duration_sec": 0, "bytes_transferred": 0} for _ in range(futures[future]))
+    close_pooled_connections()
     
     batch_wall_time_s = time.perf_counter() - batch_start_time
 
@@ -210,19 +993,47 @@ def run_test_batch(
     
     avg_op_duration_s = total_duration_successful_s / successful_ops_count if successful_ops_count > 0 else 0
     avg_op_throughput_Bps = total_bytes_successful / total_duration_successful_s if total_duration_successful_s > 0 else 0
+    wire_results = [r for r in op_results_list if r["success"] and r.get('wire_bytes') is not None]
+    total_wire_bytes = sum(r['wire_bytes'] for r in wire_results)
+    wire_duration_s = sum(r['duration_sec'] for r in wire_results)
+    avg_op_wire_throughput_Bps = total_wire_bytes / wire_duration_s if wire_duration_s > 0 else 0
+    ops_per_sec = successful_ops_count / batch_wall_time_s if batch_wall_time_s > 0 else 0
+
+    # Histogram latensi op sukses: durasi total dan fasenya (fase None = tidak terukur, misal op pipelined)
+    histograms = {phase: LatencyHistogram() for phase in LATENCY_PHASES}
+    for r in op_results_list:
+        if not r["success"]:
+            continue
+        histograms['latency'].record(r['duration_sec'])
+        for phase in LATENCY_PHASES[1:]:
+            if r.get(f"{phase}_sec") is not None:
+                histograms[phase].record(r[f"{phase}_sec"])
+    latency_summary = {}
+    for phase, histogram in histograms.items():
+        latency_summary.update(histogram.summary(prefix=f"{phase}_"))
 
     logging.info(
         f"Batch Finished. WallTime={batch_wall_time_s:.2f}s. SuccessOps={successful_ops_count}, FailedOps={failed_ops_count}. "
-        f"AvgOpDur_Success={avg_op_duration_s:.4f}s, AvgOpThr_Success={avg_op_throughput_Bps / (1024*1024):.4f} MB/s"
+        f"AvgOpDur_Success={avg_op_duration_s:.4f}s, AvgOpThr_Success={avg_op_throughput_Bps / (1024*1024):.4f} MB/s, AvgOpWireThr_Success={avg_op_wire_throughput_Bps / (1024*1024):.4f} MB/s, OpsPerSec={ops_per_sec:.1f}, "
+        f"p50={latency_summary['latency_p50_s']:.4f}s, p99={latency_summary['latency_p99_s']:.4f}s, max={latency_summary['latency_max_s']:.4f}s"
+        + (f", OfferedRate={p_rate}/s, LateDispatches={late_dispatches}" if open_loop else "")
     )
     
     return {
+        **latency_summary,
+        "offered_rate_ops_per_sec": p_rate if open_loop else 0,
+        "ops_late_dispatch": late_dispatches,
+        "ops_queued_dispatch": queued_dispatches,
+        "latency_histograms": histograms,
         "avg_op_duration_s": avg_op_duration_s,
         "avg_op_throughput_Bps": avg_op_throughput_Bps,
+        "avg_op_wire_throughput_Bps": avg_op_wire_throughput_Bps,
         "ops_successful": successful_ops_count,
         "ops_failed": failed_ops_count,
         "batch_wall_time_s": batch_wall_time_s,
+        "ops_per_sec": ops_per_sec,
         "total_bytes_transferred_successful_ops": total_bytes_successful,
+        "total_wire_bytes_successful_ops": total_wire_bytes,
     }
 
 
@@ -235,9 +1046,25 @@ def main():
     parser.add_argument('--mode', type=str, default='thread', choices=['thread', 'process'], help='Client concurrency mode')
     parser.add_argument('--action', type=str, required=True, choices=['upload', 'download', 'list'], help='Action to perform')
     parser.add_argument('--file_key', type=str, default=list(FILENAME_MAP.keys())[0], choices=list(FILENAME_MAP.keys()), help='File key (e.g., 10MB)')
+    parser.add_argument('--transfer_mode', type=str, default='text', choices=['text', 'binary'], help='text: GET/UPLOAD with base64 JSON, binary: GETB/UPLOADB raw framed bytes')
+    parser.add_argument('--persistent', action='store_true', help='Reuse one connection per client worker instead of connecting per command')
+    parser.add_argument('--pipeline', type=int, default=1, help='Outstanding requests sent back-to-back per connection (text list/download only)')
+    parser.add_argument('--download_sink', type=str, default='memory', choices=list(DOWNLOAD_SINKS), help=f"Where downloaded content goes: memory (whole JSON response), discard (streamed and dropped), disk (streamed into ./{DOWNLOAD_DIR})")
+    parser.add_argument('--parallel_ranges', '--parallel-ranges', type=int, default=1, help='Split each download into N byte ranges fetched concurrently (resumed per range on failure)')
+    parser.add_argument('--parallel_parts', '--parallel-parts', type=int, default=1, help='Split each upload into N parts sent concurrently (UPLOAD_INIT/UPLOAD_PART/UPLOAD_COMMIT)')
+    parser.add_argument('--dedup', action='store_true', help='Send HAVE <sha256> before each upload and skip the content when the server (--dedup) already stores it')
+    parser.add_argument('--compress', type=str, default='none', choices=['none', 'auto'] + sorted(compression.CODECS), help='Ask for compressed whole-file downloads: auto negotiates via ENCODINGS, or force one codec')
+    parser.add_argument('--no_verify', action='store_true', help='Do not compare received/sent content with the data_sha256 reported by the server (to measure the checksum overhead)')
+    parser.add_argument('--rate', type=float, default=None, help='Open-loop mode: start ops at R per second regardless of completions (latency measured from scheduled start)')
+    parser.add_argument('--duration', type=parse_duration, default=None, help='Open-loop run length, e.g. 60s, 2m (default: --total_ops arrivals)')
+    parser.add_argument('--arrival', type=str, default='constant', choices=list(ARRIVAL_MODES), help='Open-loop arrival process: constant spacing or poisson')
+    parser.add_argument('--ramp_up', '--ramp-up', type=parse_duration, default=0.0, help='Open-loop linear ramp from 0 to --rate over this long (part of --duration)')
+    parser.add_argument('--expected_latency', type=parse_duration, default=OPEN_LOOP_EXPECTED_LATENCY_S, help='Open-loop: size the client pool for --rate x this latency (at least --workers) so arrivals are not held back by busy workers')
     parser.add_argument('--loglevel', type=str, default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'])
     
     args = parser.parse_args()
+    if args.duration is not None and not (args.rate and args.rate > 0):
+        parser.error('--duration only applies to open-loop mode, give --rate as well')
     
     global server_address 
     server_address = (args.server_ip, args.server_port)
@@ -257,12 +1084,19 @@ def main():
             if args.file_key == "10MB": file_size_bytes = 10 * 1024 * 1024
             elif args.file_key == "50MB": file_size_bytes = 50 * 1024 * 1024
             elif args.file_key == "100MB": file_size_bytes = 100 * 1024 * 1024
+            elif args.file_key == "10MB_log":
+                # Teks log (mudah dikompres) untuk menguji --compress; file lain berisi bytes acak
+                logging.warning(f"Creating dummy log file {local_file_path} of about 10 MB.")
+                with open(local_file_path, 'w') as f:
+                    while f.tell() < 10 * 1024 * 1024:
+                        f.write(f"2024-01-01 12:00:{random.randint(0, 59):02d} INFO worker-{random.randint(1, 8)} GET /files/{random.randint(1, 500)}.jpg 200 {random.randint(100, 99999)} bytes\n")
+                file_size_bytes = 0
             
             if file_size_bytes > 0:
                 logging.warning(f"Creating dummy file {local_file_path} of size {file_size_bytes} bytes.")
                 with open(local_file_path, 'wb') as f:
                     f.write(os.urandom(file_size_bytes))
-            else:
+            elif not os.path.exists(local_file_path):
                  return 
 
     results = run_test_batch(
@@ -272,16 +1106,42 @@ def main():
         p_file_key=args.file_key,
         p_num_client_workers=args.workers,
         p_total_ops=args.total_ops,
-        p_client_pool_mode=args.mode
+        p_client_pool_mode=args.mode,
+        p_transfer_mode=args.transfer_mode,
+        p_persistent=args.persistent,
+        p_pipeline_depth=args.pipeline,
+        p_download_sink=args.download_sink,
+        p_parallel_ranges=args.parallel_ranges,
+        p_parallel_parts=args.parallel_parts,
+        p_dedup=args.dedup,
+        p_compress=args.compress,
+        p_verify=not args.no_verify,
+        p_rate=args.rate,
+        p_duration_s=args.duration,
+        p_arrival=args.arrival,
+        p_ramp_up_s=args.ramp_up,
+        p_expected_latency_s=args.expected_latency
     )
 
-    logging.info(f"CLI Batch Test Results for {args.action} {args.file_key} (Client Mode: {args.mode}):")
+    logging.info(f"CLI Batch Test Results for {args.action} {args.file_key} (Client Mode: {args.mode}, Transfer Mode: {args.transfer_mode}):")
     logging.info(f"  Avg Op Duration (successful ops): {results['avg_op_duration_s']:.4f} s")
     logging.info(f"  Avg Op Throughput (successful ops): {results['avg_op_throughput_Bps'] / (1024*1024):.4f} MB/s")
     logging.info(f"  Successful Ops: {results['ops_successful']}")
     logging.info(f"  Failed Ops: {results['ops_failed']}")
     logging.info(f"  Total Bytes Transferred (successful ops): {results['total_bytes_transferred_successful_ops']} B")
+    logging.info(f"  Avg Op Wire Throughput (successful ops): {results['avg_op_wire_throughput_Bps'] / (1024*1024):.4f} MB/s, Total Wire Bytes: {results['total_wire_bytes_successful_ops']} B")
     logging.info(f"  Batch Wall Time: {results['batch_wall_time_s']:.2f} s")
+    logging.info(f"  Successful Ops per Second: {results['ops_per_sec']:.1f}")
+    if results['offered_rate_ops_per_sec']:
+        logging.info(f"  Offered Rate: {results['offered_rate_ops_per_sec']} ops/s ({args.arrival}), Late Dispatches: {results['ops_late_dispatch']}, Queued Dispatches: {results['ops_queued_dispatch']}")
+    for phase in LATENCY_PHASES:
+        logging.info(
+            f"  {phase.capitalize()} (s): p50={results[f'{phase}_p50_s']:.4f} p90={results[f'{phase}_p90_s']:.4f} "
+            f"p99={results[f'{phase}_p99_s']:.4f} p99.9={results[f'{phase}_p999_s']:.4f} max={results[f'{phase}_max_s']:.4f}"
+        )
+    logging.info("  Latency histogram (successful ops):")
+    for line in results['latency_histograms']['latency'].format_buckets():
+        logging.info(f"    {line}")
             
 if __name__=='__main__':
     main()
\ No newline at end of file
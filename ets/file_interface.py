@@ -1,26 +1,358 @@
 import os
 import json
 import base64
-from glob import glob
+import binascii
+import hashlib
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+import compression
+from directory_index import DirectoryIndex
+from blob_store import BlobStore, HashingWriter, file_sha256
+from checksum_index import ChecksumIndex
+
+# Potongan base64 yang didecode per langkah (kelipatan 4) pada upload bertahap
+UPLOAD_DECODE_CHUNK = 64 * 1024
+
+# Placeholder parameter LIST untuk "tanpa prefix" / "tanpa cursor"
+LIST_ANY = ('*', '-')
+
+# Upload multipart: sesi disimpan di disk (bukan memori) agar bisa dipakai bersama worker process mppool
+MULTIPART_PREFIX = '.multipart-'
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+MULTIPART_MAX_SIZE = 64 * 1024 * 1024 * 1024
+MULTIPART_MAX_PARTS = 10000
+# Sesi tanpa part baru selama ini dianggap ditinggalkan; disapu paling sering tiap MULTIPART_SWEEP_INTERVAL
+MULTIPART_SESSION_TTL = 24 * 3600
+MULTIPART_SWEEP_INTERVAL = 60
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+# Pemisah bagian path nama file dari client (juga '\\' agar tidak lolos di Windows)
+PATH_SEPARATORS = re.compile(r'[\\/]')
+
+class Base64ChunkDecoder:
+    # Decodes a base64 stream piecewise: only whole 4-char groups are decoded, the rest waits for the next chunk.
+    def __init__(self):
+        self.pending = b""
+
+    def feed(self, chunk):
+        self.pending += chunk
+        cut = len(self.pending) - (len(self.pending) % 4)
+        if not cut:
+            return b""
+        decoded = base64.b64decode(self.pending[:cut])
+        self.pending = self.pending[cut:]
+        return decoded
+
+    def finish(self):
+        if self.pending:
+            raise base64.binascii.Error('Incorrect padding')
+
+class PartWriter:
+    # Writes one multipart part at its offset with pwrite; the part is only marked received by finish().
+    def __init__(self, fd, offset, length, marker_path):
+        self.fd = fd
+        self.offset = offset
+        self.length = length
+        self.marker_path = marker_path
+        self.written = 0
+
+    def write(self, data):
+        if self.written + len(data) > self.length:
+            raise ValueError(f"Part data exceeds expected length {self.length}.")
+        os.pwrite(self.fd, data, self.offset + self.written)
+        self.written += len(data)
+
+    def finish(self):
+        if self.written != self.length:
+            raise ValueError(f"Part incomplete: {self.written} of {self.length} bytes received.")
+        open(self.marker_path, 'wb').close()
+
+    def close(self):
+        os.close(self.fd)
 
 class FileInterface:
-    def __init__(self, base_storage_path="files"):
+    def __init__(self, base_storage_path="files", cache=None, dedup=False):
         self.storage_dir = os.path.abspath(base_storage_path)
+        # cache: FileCache opsional untuk isi file GET/GETB, diinvalidasi saat file diganti/dihapus
+        self.cache = cache
         if not os.path.exists(self.storage_dir):
             try:
                 os.makedirs(self.storage_dir)
             except OSError as e:
                 raise 
+        self.index = DirectoryIndex(self.storage_dir)
+        self._next_session_sweep = 0
+        # dedup: isi upload disimpan sekali per SHA-256 (BlobStore), nama file berupa hardlink ke blob
+        self.blobs = BlobStore(self.storage_dir, on_change=self._hidden_changed) if dedup else None
+        # SHA-256 isi file, dihitung saat upload di-stream ke disk dan dikirim di header GET/GETB (data_sha256)
+        self.checksums = ChecksumIndex(self.storage_dir)
 
     def _get_full_path(self, filename):
+        # Nama dengan bagian berawalan '.' ditolak: selain '..', itu area internal server (.blobs, .checksums,
+        # .multipart-*, file sementara upload) yang tidak boleh dibaca, ditimpa atau dihapus client
         if os.path.isabs(filename) or ".." in filename:
              return None
+        if any(part.startswith('.') for part in PATH_SEPARATORS.split(filename)):
+             return None
         return os.path.join(self.storage_dir, filename)
 
+    def _open_for_read(self, filename):
+        # Binary (GETB) path: content skips base64/JSON, caller reads and closes the file object.
+        if not filename:
+            raise ValueError('Filename cannot be empty for GETB')
+        full_path = self._get_full_path(filename)
+        if not full_path:
+            raise ValueError(f"Invalid filename '{filename}' for GETB.")
+        fp = open(full_path, 'rb')
+        return fp, os.fstat(fp.fileno()).st_size
+
+    def _cache_version(self, fp):
+        # Cache version (mtime, size) of the freshly opened fp; None when there is no cache or the file does not fit.
+        if self.cache is None:
+            return None
+        st = os.fstat(fp.fileno())
+        if not self.cache.fits(st.st_size):
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read_cached(self, fp, kind='raw'):
+        # Whole content of the freshly opened fp from the cache, read from fp on a miss; kind 'b64' holds
+        # the base64 bytes for GET. None when there is no cache or the file does not fit, so callers stream it.
+        version = self._cache_version(fp)
+        if version is None:
+            return None
+        value = self.cache.get(fp.name, kind, version)
+        if value is None:
+            fp.seek(0)
+            value = fp.read()
+            if kind == 'b64':
+                value = base64.b64encode(value)
+            self.cache.put(fp.name, kind, version, value)
+        return value
+
+    def _read_encoded(self, fp, filename, accepted, b64=False):
+        # Whole file compressed with the first codec in accepted that this side supports: (codec, body), or
+        # (None, None) when it goes out as is (no common codec, too small/large, already compressed).
+        # Compressed bodies are cached next to the raw ones under kind '<codec>' (GETB) / '<codec>+b64' (GET).
+        codec = compression.choose(accepted)
+        size = os.fstat(fp.fileno()).st_size
+        if codec is None or not compression.candidate(filename, size):
+            return None, None
+        kind = f"{codec}+b64" if b64 else codec
+        version = self._cache_version(fp)
+        body = self.cache.get(fp.name, kind, version) if version is not None else None
+        if body is None:
+            fp.seek(0)
+            sample = fp.read(compression.SAMPLE_SIZE)
+            fp.seek(0)
+            if not compression.compressible(sample):
+                return None, None
+            # Read and compressed chunk by chunk (the raw content is never held whole), hashed on the way if unknown
+            sha256 = hashlib.sha256() if self._checksum(fp) is None else None
+            packer = compression.compressor(codec)
+            body = bytearray()
+            for chunk in iter(lambda: fp.read(compression.COMPRESS_CHUNK), b''):
+                if sha256 is not None:
+                    sha256.update(chunk)
+                body += packer.compress(chunk)
+            body += packer.flush()
+            fp.seek(0)
+            if sha256 is not None:
+                self._store_checksum(fp, sha256.hexdigest())
+            if not compression.saves_enough(size, len(body)):
+                return None, None
+            if b64:
+                body = base64.b64encode(body)
+            if version is not None:
+                self.cache.put(fp.name, kind, version, body)
+        return codec, body
+
+    def _checksum_of(self, st):
+        # sha256 of the content behind os.stat_result st (blob store or sidecar index), None when it was never hashed.
+        if self.blobs is not None:
+            digest = self.blobs.digest_of(st.st_ino)
+            if digest is not None:
+                return digest
+        return self.checksums.get(st)
+
+    def _checksum(self, fp, content=None):
+        # sha256 of the freshly opened fp; with content (its whole raw bytes, already in memory) a miss is
+        # hashed from it and stored in the index, so the next GET only reads the sidecar.
+        st = os.fstat(fp.fileno())
+        digest = self._checksum_of(st)
+        if digest is None and content is not None:
+            digest = hashlib.sha256(content).hexdigest()
+            self.checksums.put(st, digest)
+        return digest
+
+    def _store_checksum(self, fp, digest):
+        # For callers that hashed the whole of fp while streaming it out (GETB without cache).
+        self.checksums.put(os.fstat(fp.fileno()), digest)
+
+    def _forget_checksum(self, full_path):
+        # Called before full_path is replaced or removed: the sidecar entry goes with the last name of the inode.
+        try:
+            st = os.stat(full_path)
+        except FileNotFoundError:
+            return
+        if st.st_nlink <= 1:
+            self.checksums.discard(st.st_ino)
+
+    def _file_changed(self, full_path):
+        # Called after a file was replaced or deleted through this interface: drop cached content, update the LIST index.
+        if self.cache is not None:
+            self.cache.invalidate(full_path)
+        if os.path.dirname(full_path) != self.storage_dir:
+            return
+        try:
+            st = os.stat(full_path)
+        except FileNotFoundError:
+            self.index.remove(os.path.basename(full_path))
+            return
+        self.index.update(os.path.basename(full_path), st.st_size, st.st_mtime)
+
+    def _hidden_changed(self, path):
+        # Our own hidden entry (upload temp file, multipart session) appeared in or left storage_dir:
+        # the new directory mtime is not a reason for the index to rescan.
+        if os.path.dirname(path) == self.storage_dir:
+            self.index.acknowledge()
+
+    def _parse_range(self, params, size):
+        # Optional "offset [length]" after the filename; length defaults to the rest of the file.
+        try:
+            offset = int(params[0]) if len(params) > 0 else 0
+            length = int(params[1]) if len(params) > 1 else None
+        except ValueError:
+            raise ValueError(f"Invalid range '{' '.join(params)}', offset and length must be integers.")
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError('Range offset and length cannot be negative.')
+        if offset > size:
+            raise ValueError(f"Range offset {offset} is beyond end of file ({size} bytes).")
+        available = size - offset
+        return offset, available if length is None else min(length, available)
+
+    @contextmanager
+    def _atomic_write(self, full_path):
+        # Written to a hidden temp file in the same directory and renamed over the
+        # target only when the block completes, so readers never see a partial upload.
+        # The content is hashed while it is written (the yielded writer has hexdigest()); with dedup it is
+        # stored as a blob instead of renamed.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(full_path), prefix='.upload-', suffix='.part')
+        self._hidden_changed(tmp_path)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                sink = HashingWriter(fp)
+                yield sink
+            self._commit(tmp_path, full_path, sink.hexdigest())
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+                self._hidden_changed(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _commit(self, tmp_path, full_path, digest=None):
+        # Finished upload tmp_path becomes full_path: renamed, or with dedup linked to the blob of its content.
+        # Without a digest from streaming (multipart) the assembled file is hashed here. Returns the sha256.
+        digest = digest or file_sha256(tmp_path)
+        self._forget_checksum(full_path)
+        if self.blobs is None:
+            os.replace(tmp_path, full_path)
+            self.checksums.put(os.stat(full_path), digest)
+        else:
+            self.blobs.store(tmp_path, digest, full_path)
+        self._file_changed(full_path)
+        return digest
+
+    def _open_for_write(self, filename):
+        # Binary (UPLOADB) path: caller writes raw bytes incrementally inside the returned context.
+        if not filename:
+            raise ValueError('Filename cannot be empty for UPLOADB')
+        full_path = self._get_full_path(filename)
+        if not full_path:
+            raise ValueError(f"Invalid filename '{filename}' for UPLOADB.")
+        return self._atomic_write(full_path)
+
+    def _session_dir(self, upload_id):
+        if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+            raise ValueError(f"Invalid upload id '{upload_id}'.")
+        session_dir = os.path.join(self.storage_dir, MULTIPART_PREFIX + upload_id)
+        if not os.path.isdir(session_dir) or self._expire_session(session_dir):
+            raise ValueError(f"Upload '{upload_id}' not found (never started, committed, aborted or expired).")
+        return session_dir
+
+    def _expire_session(self, session_dir, now=None):
+        # Last activity = newest of the session dir (part markers) and its data file (pwrite); True = removed.
+        now = now or time.time()
+        last_active = now
+        try:
+            last_active = os.stat(session_dir).st_mtime
+            last_active = max(last_active, os.stat(os.path.join(session_dir, 'data')).st_mtime)
+        except FileNotFoundError:
+            pass # Session being created (no data yet) or already removed
+        if now - last_active <= MULTIPART_SESSION_TTL:
+            return False
+        shutil.rmtree(session_dir, ignore_errors=True)
+        self._hidden_changed(session_dir)
+        return True
+
+    def _sweep_sessions(self):
+        # Abandoned multipart sessions would otherwise hold their (preallocated) data forever.
+        now = time.time()
+        if now < self._next_session_sweep:
+            return
+        self._next_session_sweep = now + MULTIPART_SWEEP_INTERVAL
+        with os.scandir(self.storage_dir) as it:
+            sessions = [entry.path for entry in it if entry.name.startswith(MULTIPART_PREFIX) and entry.is_dir()]
+        for session_dir in sessions:
+            self._expire_session(session_dir, now)
+
+    def _load_session(self, upload_id):
+        session_dir = self._session_dir(upload_id)
+        with open(os.path.join(session_dir, 'meta.json')) as fp:
+            meta = json.load(fp)
+        meta['parts'] = max(1, -(-meta['size'] // meta['part_size']))
+        return session_dir, meta
+
+    def _missing_parts(self, session_dir, meta):
+        return [n for n in range(meta['parts']) if not os.path.exists(os.path.join(session_dir, f"part-{n}"))]
+
+    def _open_part(self, upload_id, part_number, length=None):
+        # Multipart (UPLOAD_PART/UPLOAD_PARTB) path: returns a PartWriter for part n, caller writes then finish().
+        session_dir, meta = self._load_session(upload_id)
+        try:
+            n = int(part_number)
+        except ValueError:
+            raise ValueError(f"Invalid part number '{part_number}'.")
+        if not 0 <= n < meta['parts']:
+            raise ValueError(f"Part number {n} out of range, upload '{upload_id}' has {meta['parts']} parts.")
+        offset = n * meta['part_size']
+        expected = min(meta['part_size'], meta['size'] - offset)
+        if length is not None and length != expected:
+            raise ValueError(f"Part {n} must be {expected} bytes, got {length}.")
+        fd = os.open(os.path.join(session_dir, 'data'), os.O_WRONLY)
+        return PartWriter(fd, offset, expected, os.path.join(session_dir, f"part-{n}"))
+
     def list(self, params=[]):
+        # LIST [prefix] [cursor] [limit]; '*' / '-' skip prefix / cursor. data_next_cursor is set while more names remain.
         try:
-            filelist = [os.path.basename(f) for f in glob(os.path.join(self.storage_dir, '*.*'))]
-            return dict(status='OK', data=filelist)
+            prefix = params[0] if len(params) > 0 and params[0] not in LIST_ANY else ''
+            cursor = params[1] if len(params) > 1 and params[1] not in LIST_ANY else ''
+            try:
+                limit = int(params[2]) if len(params) > 2 else None
+            except ValueError:
+                return dict(status='ERROR', data=f"Invalid limit '{params[2]}' for LIST.")
+            if limit is not None and limit <= 0:
+                return dict(status='ERROR', data='LIST limit must be positive.')
+            filelist, next_cursor = self.index.page(prefix, cursor, limit)
+            if next_cursor is None:
+                return dict(status='OK', data=filelist)
+            return dict(status='OK', data=filelist, data_next_cursor=next_cursor)
         except Exception as e:
             return dict(status='ERROR', data=str(e))
 
@@ -36,32 +368,225 @@ class FileInterface:
             if not full_path:
                 return dict(status='ERROR', data=f"Invalid filename '{filename}' for GET.")
             
+            # Token encoding=... terakhir: client menerima body terkompres (hanya untuk file utuh)
+            params, accepted = compression.split_encoding(params)
+            if len(params) > 1:
+                with open(full_path, 'rb') as fp:
+                    offset, length = self._parse_range(params[1:], os.fstat(fp.fileno()).st_size)
+                    fp.seek(offset)
+                    isifile = base64.b64encode(fp.read(length))
+                return dict(status='OK', data_namafile=filename, data_offset=offset, data_length=length, data_file=isifile)
+
+            # data_sha256: hash isi asli file utuh (dari index; bila belum ada dihitung dari isi yang sudah dibaca)
             with open(full_path, 'rb') as fp:
-                isifile = base64.b64encode(fp.read()).decode()
-            return dict(status='OK', data_namafile=filename, data_file=isifile)
+                if accepted:
+                    codec, isifile = self._read_encoded(fp, filename, accepted, b64=True)
+                    if codec is not None:
+                        hasil = dict(status='OK', data_namafile=filename, data_encoding=codec, data_raw_size=os.fstat(fp.fileno()).st_size, data_file=isifile)
+                        digest = self._checksum(fp)
+                        if digest is not None:
+                            hasil['data_sha256'] = digest
+                        return hasil
+                digest = self._checksum(fp)
+                isifile = self._read_cached(fp, 'b64')
+                if isifile is None or digest is None:
+                    fp.seek(0)
+                    raw = fp.read()
+                    digest = self._checksum(fp, raw)
+                    if isifile is None:
+                        isifile = base64.b64encode(raw)
+            return dict(status='OK', data_namafile=filename, data_sha256=digest, data_file=isifile)
         except FileNotFoundError:
             return dict(status='ERROR', data=f"File '{filename}' not found.")
         except Exception as e:
             return dict(status='ERROR', data=str(e))
 
-    def upload(self, params=[]):
+    def encodings(self, params=[]):
+        # Codec yang bisa dipakai client pada token encoding=... GET/GETB, urut dari yang paling disukai server
+        return dict(status='OK', data=compression.available())
+
+    def stat(self, params=[]):
         try:
-            if len(params) < 2:
-                return dict(status='ERROR', data='UPLOAD command requires filename and content.')
+            if not params:
+                return dict(status='ERROR', data='Filename not provided for STAT')
             filename = params[0]
-            content_b64 = params[1]
-            if not filename or not content_b64:
+            if not filename:
+                return dict(status='ERROR', data='Filename cannot be empty for STAT')
+
+            full_path = self._get_full_path(filename)
+            if not full_path:
+                return dict(status='ERROR', data=f"Invalid filename '{filename}' for STAT.")
+
+            st = os.stat(full_path)
+            digest = self._checksum_of(st)
+            if digest is None:
+                return dict(status='OK', data_namafile=filename, data_size=st.st_size, data_mtime=st.st_mtime)
+            return dict(status='OK', data_namafile=filename, data_size=st.st_size, data_mtime=st.st_mtime, data_sha256=digest)
+        except FileNotFoundError:
+            return dict(status='ERROR', data=f"File '{filename}' not found.")
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def upload(self, params=[]):
+        if len(params) < 2:
+            return dict(status='ERROR', data='UPLOAD command requires filename and content.')
+        filename = params[0]
+        content_b64 = params[1]
+        if not filename or not content_b64:
+            return dict(status='ERROR', data='Filename or content cannot be empty for UPLOAD.')
+
+        # content_b64: str, atau bytes/memoryview dari frame (dipotong per chunk tanpa menyalin seluruh payload)
+        payload = memoryview(content_b64.encode() if isinstance(content_b64, str) else content_b64)
+        chunks = (payload[i:i + UPLOAD_DECODE_CHUNK] for i in range(0, len(payload), UPLOAD_DECODE_CHUNK))
+        return self.upload_stream(filename, chunks)
+
+    def upload_stream(self, filename, chunks):
+        """
+        chunks: iterable bytes base64 (misal langsung dari socket). Didecode per
+        potongan kelipatan 4 dan ditulis ke file sementara yang di-rename setelah
+        selesai, sehingga memori tidak bergantung ukuran file.
+        """
+        try:
+            if not filename:
                 return dict(status='ERROR', data='Filename or content cannot be empty for UPLOAD.')
 
             full_path = self._get_full_path(filename)
             if not full_path:
                 return dict(status='ERROR', data=f"Invalid filename '{filename}' for UPLOAD.")
 
-            with open(full_path, 'wb+') as fp:
-                fp.write(base64.b64decode(content_b64.encode()))
-            return dict(status='OK', data=f"File '{filename}' uploaded successfully to {self.storage_dir}.")
+            decoder = Base64ChunkDecoder()
+            with self._atomic_write(full_path) as fp:
+                for chunk in chunks:
+                    fp.write(decoder.feed(chunk))
+                decoder.finish()
+            return dict(status='OK', data=f"File '{filename}' uploaded successfully to {self.storage_dir}.", data_sha256=fp.hexdigest())
         except base64.binascii.Error as b64e:
             return dict(status='ERROR', data=f"Invalid Base64 content for UPLOAD: {str(b64e)}")
+        except ConnectionError:
+            # Socket gone mid-upload: nothing to answer, let the server loop close the connection.
+            raise
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def upload_init(self, params=[]):
+        try:
+            if len(params) < 2:
+                return dict(status='ERROR', data='UPLOAD_INIT command requires filename and size.')
+            filename = params[0]
+            full_path = self._get_full_path(filename)
+            if not filename or not full_path:
+                return dict(status='ERROR', data=f"Invalid filename '{filename}' for UPLOAD_INIT.")
+            try:
+                size = int(params[1])
+                part_size = int(params[2]) if len(params) > 2 else MULTIPART_PART_SIZE
+            except ValueError:
+                return dict(status='ERROR', data=f"Invalid size '{' '.join(params[1:])}' for UPLOAD_INIT.")
+            if size < 0 or part_size <= 0:
+                return dict(status='ERROR', data='UPLOAD_INIT size cannot be negative and part size must be positive.')
+            if size > MULTIPART_MAX_SIZE:
+                return dict(status='ERROR', data=f"UPLOAD_INIT size {size} exceeds the limit of {MULTIPART_MAX_SIZE} bytes.")
+            if -(-size // part_size) > MULTIPART_MAX_PARTS:
+                return dict(status='ERROR', data=f"UPLOAD_INIT part size {part_size} gives more than {MULTIPART_MAX_PARTS} parts.")
+            self._sweep_sessions()
+            if size > shutil.disk_usage(self.storage_dir).free:
+                return dict(status='ERROR', data=f"UPLOAD_INIT size {size} exceeds the free space of the server storage.")
+
+            upload_id = uuid.uuid4().hex
+            session_dir = os.path.join(self.storage_dir, MULTIPART_PREFIX + upload_id)
+            os.makedirs(session_dir)
+            self._hidden_changed(session_dir)
+            with open(os.path.join(session_dir, 'data'), 'wb') as fp:
+                fp.truncate(size)
+            with open(os.path.join(session_dir, 'meta.json'), 'w') as fp:
+                json.dump(dict(filename=filename, size=size, part_size=part_size), fp)
+            parts = max(1, -(-size // part_size))
+            return dict(status='OK', data_upload_id=upload_id, data_part_size=part_size, data_parts=parts)
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def upload_part(self, params=[]):
+        writer = None
+        try:
+            if len(params) < 2:
+                return dict(status='ERROR', data='UPLOAD_PART command requires upload id, part number and content.')
+            # a2b_base64 reads str/bytes/memoryview in place, b64decode would copy a memoryview first
+            content = binascii.a2b_base64(params[2]) if len(params) > 2 else b""
+            writer = self._open_part(params[0], params[1], len(content))
+            writer.write(content)
+            writer.finish()
+            return dict(status='OK', data_upload_id=params[0], data_part=int(params[1]), data_size=len(content))
+        except base64.binascii.Error as b64e:
+            return dict(status='ERROR', data=f"Invalid Base64 content for UPLOAD_PART: {str(b64e)}")
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def upload_status(self, params=[]):
+        try:
+            if not params:
+                return dict(status='ERROR', data='Upload id not provided for UPLOAD_STATUS')
+            session_dir, meta = self._load_session(params[0])
+            return dict(status='OK', data_upload_id=params[0], data_namafile=meta['filename'], data_parts=meta['parts'],
+                        data_missing=self._missing_parts(session_dir, meta))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def upload_commit(self, params=[]):
+        full_path = None
+        try:
+            if not params:
+                return dict(status='ERROR', data='Upload id not provided for UPLOAD_COMMIT')
+            session_dir, meta = self._load_session(params[0])
+            missing = self._missing_parts(session_dir, meta)
+            if missing:
+                return dict(status='ERROR', data=f"Upload '{params[0]}' is missing {len(missing)} part(s).", data_missing=missing)
+            # Rename is atomic within storage_dir: readers see either the old file or the complete new one.
+            # Parts arrive out of order, so the assembled file is hashed here in one pass (data_sha256).
+            full_path = self._get_full_path(meta['filename'])
+            digest = self._commit(os.path.join(session_dir, 'data'), full_path)
+            shutil.rmtree(session_dir, ignore_errors=True)
+            self._hidden_changed(session_dir)
+            return dict(status='OK', data=f"File '{meta['filename']}' uploaded successfully to {self.storage_dir}.", data_sha256=digest)
+        except FileNotFoundError as e:
+            # Session data gone under us: a concurrent commit of the same id only if the file is now there
+            if full_path is not None and os.path.exists(full_path):
+                return dict(status='ERROR', data=f"Upload '{params[0]}' was already committed.")
+            return dict(status='ERROR', data=str(e))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def upload_abort(self, params=[]):
+        try:
+            if not params:
+                return dict(status='ERROR', data='Upload id not provided for UPLOAD_ABORT')
+            session_dir = self._session_dir(params[0])
+            shutil.rmtree(session_dir)
+            self._hidden_changed(session_dir)
+            return dict(status='OK', data=f"Upload '{params[0]}' aborted.")
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def have(self, params=[]):
+        # HAVE sha256 [filename]: is this content stored already? With a filename a stored blob is linked
+        # under that name right away, so an identical upload finishes without sending any content.
+        try:
+            if self.blobs is None:
+                return dict(status='ERROR', data='HAVE requires content-addressed storage (server started with --dedup).')
+            if not params:
+                return dict(status='ERROR', data='SHA-256 digest not provided for HAVE')
+            digest = params[0].lower()
+            if len(params) < 2:
+                return dict(status='OK', data_sha256=digest, data_have=self.blobs.has(digest))
+            filename = params[1]
+            full_path = self._get_full_path(filename)
+            if not filename or not full_path:
+                return dict(status='ERROR', data=f"Invalid filename '{filename}' for HAVE.")
+            if not self.blobs.link(digest, full_path):
+                return dict(status='OK', data_sha256=digest, data_have=False)
+            self._file_changed(full_path)
+            return dict(status='OK', data_sha256=digest, data_have=True, data_namafile=filename, data_size=os.stat(full_path).st_size)
         except Exception as e:
             return dict(status='ERROR', data=str(e))
 
@@ -78,7 +603,12 @@ class FileInterface:
                 return dict(status='ERROR', data=f"Invalid filename '{filename}' for DELETE.")
 
             if os.path.exists(full_path):
+                ino = os.stat(full_path).st_ino
+                self._forget_checksum(full_path)
                 os.remove(full_path)
+                if self.blobs is not None:
+                    self.blobs.release(ino)
+                self._file_changed(full_path)
                 return dict(status='OK', data=f"File '{filename}' deleted successfully from {self.storage_dir}.")
             else:
                 return dict(status='ERROR', data=f"File '{filename}' not found for deletion.")
@@ -108,6 +638,21 @@ if __name__=='__main__':
     print("\n--- DELETE test_upload.txt ---")
     print(f.delete(['test_upload.txt']))
     print(f.list())
+
+    print("\n--- Internal dirs (.blobs, .checksums, .multipart-*) are not reachable by name ---")
+    storage = tempfile.mkdtemp()
+    fd = FileInterface(storage, dedup=True)
+    fd.upload(['a.txt', base64.b64encode(b"dedup content").decode()])
+    digest = fd.stat(['a.txt'])['data_sha256']
+    blob_name = os.path.relpath(fd.blobs.path(digest), storage)
+    ino = os.stat(os.path.join(storage, 'a.txt')).st_ino
+    for name in (blob_name, f".blobs/inodes/{ino}", f".checksums/{ino}", '.multipart-x/data', 'sub/.hidden'):
+        results = (fd.upload([name, base64.b64encode(b"EVIL").decode()]), fd.get([name]), fd.delete([name]))
+        assert all(r['status'] == 'ERROR' for r in results), (name, results)
+    assert fd.have([digest, 'b.txt'])['data_have'] and base64.b64decode(fd.get(['b.txt'])['data_file']) == b"dedup content"
+    assert fd.list()['data'] == ['a.txt', 'b.txt']
+    print('OK')
+    shutil.rmtree(storage)
     
     if os.path.exists("pokijan.jpg"):
         os.remove("pokijan.jpg")
@@ -1,7 +1,13 @@
-import json
 import logging
+import re
+import time
 
+import compression
+import json_codec
+from blob_store import HashingWriter
 from file_interface import FileInterface
+from file_cache import FileCache
+from server_stats import ServerStats
 
 """
 * class FileProtocol bertugas untuk memproses 
@@ -16,42 +22,396 @@ string
 """
 MAX_LOG_LEN = 200
 
+"""
+* perintah biner (GETB/UPLOADB) memakai header JSON/teks yang diakhiri
+"\r\n\r\n" lalu diikuti raw bytes sepanjang data_size, tanpa base64
+
+  GETB namafile             -> {"status": "OK", "data_namafile": .., "data_size": N}\r\n\r\n + N bytes
+  GETB namafile offset [len] -> idem, ditambah data_offset; N = panjang range
+  UPLOADB namafile N + N bytes -> {"status": "OK", "data": .., "data_sha256": ..}\r\n\r\n
+  UPLOAD_PARTB id n N + N bytes -> {"status": "OK", "data_upload_id": .., "data_part": n, ..}\r\n\r\n
+
+* GET/GETB file utuh boleh diakhiri token encoding=<codec>[,<codec>] (lihat
+compression.py, daftar codec server lewat ENCODINGS). Bila server memilih
+mengompres, header berisi data_encoding dan data_raw_size (ukuran asli),
+data_size/data_file adalah body terkompres; sendfile tidak dipakai
+
+  GETB namafile encoding=zlib -> {"status": "OK", .., "data_size": M, "data_encoding": "zlib", "data_raw_size": N}\r\n\r\n + M bytes
+
+* integritas: header GET/GETB file utuh membawa data_sha256 (hash isi asli,
+dari sidecar ChecksumIndex atau blob dedup), response UPLOAD/UPLOADB membawa
+hash isi yang diterima. Hash dihitung sambil bytes di-stream, tidak dengan
+membaca ulang file. File yang belum pernah di-hash (misal disalin manual)
+dikirim GETB tanpa data_sha256 lalu hash-nya disimpan untuk GET berikutnya
+(tidak untuk sendfile, yang isinya tidak melewati userspace)
+"""
+BINARY_COMMANDS = ('getb', 'uploadb', 'upload_partb')
+BINARY_CHUNK_SIZE = 1024 * 1024
+
+"""
+* upload multipart: file besar dipecah menjadi part yang boleh dikirim
+paralel lewat beberapa koneksi (dan worker) sekaligus, tiap part ditulis
+dengan pwrite pada offsetnya lalu di-commit secara atomik (rename)
+
+  UPLOAD_INIT namafile size [part_size] -> data_upload_id, data_part_size, data_parts
+  UPLOAD_PART id n <base64>             -> part n (teks)
+  UPLOAD_PARTB id n N + N bytes         -> part n (biner, lihat di atas)
+  UPLOAD_STATUS id                      -> data_missing: part yang belum diterima
+  UPLOAD_COMMIT id                      -> file muncul utuh dengan nama namafile
+  UPLOAD_ABORT id                       -> sesi dan datanya dihapus
+
+* size dibatasi MULTIPART_MAX_SIZE (dan ruang disk yang tersisa), jumlah
+part MULTIPART_MAX_PARTS; sesi yang tidak menerima part selama
+MULTIPART_SESSION_TTL detik dianggap ditinggalkan dan dihapus
+"""
+
+"""
+* UPLOAD teks (base64) tidak ditampung sebagai satu frame: setelah
+"UPLOAD namafile " terbaca, sisa frame didecode bertahap ke disk
+"""
+STREAM_HEAD_SIZE = 4096
+STREAM_UPLOAD_PATTERN = re.compile(rb'^\s*upload[ \t]+(\S+)[ \t]+(?=\S)', re.IGNORECASE)
+
+"""
+* request teks dipetakan ke handler lewat tabel command yang terdaftar
+(FILE_COMMANDS ke method FileInterface, ditambah register_command), bukan
+hasattr/getattr bebas
+
+* frame tidak di-split seluruhnya: untuk command ber-payload hanya token
+header yang dipisah (PAYLOAD_COMMANDS: jumlah token sebelum payload), sisa
+frame diteruskan sebagai memoryview tanpa disalin
+"""
+FILE_COMMANDS = ('list', 'get', 'stat', 'upload', 'delete', 'have', 'encodings',
+                 'upload_init', 'upload_part', 'upload_status', 'upload_commit', 'upload_abort')
+PAYLOAD_COMMANDS = {'upload': 1, 'upload_part': 2}
+# Command yang dicatat terpisah di ServerStats (request, error, histogram latensi); lainnya masuk 'other'
+METRIC_COMMANDS = FILE_COMMANDS + ('stats',) + BINARY_COMMANDS + ('upload_stream',)
+REQUEST_TOKEN = re.compile(rb'\s*(\S+)')
+PAYLOAD_START = re.compile(rb'\s*')
+WHITESPACE = b' \t\r\n\x0b\x0c'
+
+def send_chunks(connection, chunks):
+    """
+    Mengirim semua potongan bytes-like dengan socket.sendmsg (scatter/gather),
+    melanjutkan dari posisi terakhir bila terkirim sebagian. Mengembalikan
+    jumlah bytes terkirim.
+    """
+    views = [memoryview(c).cast('B') for c in chunks if len(c)]
+    total = sum(len(v) for v in views)
+    if not hasattr(connection, 'sendmsg'):
+        for view in views:
+            connection.sendall(view)
+        return total
+    while views:
+        sent = connection.sendmsg(views)
+        while sent:
+            if sent >= len(views[0]):
+                sent -= len(views.pop(0))
+            else:
+                views[0] = views[0][sent:]
+                sent = 0
+    return total
+
 class FileProtocol:
-    def __init__(self):
-        self.file = FileInterface()
+    def __init__(self, use_sendfile=False, stats=None, cache_bytes=0, cache=None, dedup=False):
+        self.stats = stats if stats is not None else ServerStats(commands=METRIC_COMMANDS)
+        # cache_bytes > 0: isi file GET (base64) / GETB (raw) disimpan di FileCache sebesar itu;
+        # cache: object cache yang sudah jadi (misal SharedFileCache milik mppool) dipakai apa adanya
+        if cache is None and cache_bytes > 0:
+            cache = FileCache(cache_bytes, stats=self.stats)
+        self.cache = cache
+        # dedup: penyimpanan content-addressed (BlobStore), mengaktifkan HAVE sha256 [namafile]
+        self.file = FileInterface(cache=self.cache, dedup=dedup)
+        # use_sendfile: body GETB dikirim via socket.sendfile langsung dari page cache
+        self.use_sendfile = use_sendfile
+        self.commands = {name: getattr(self.file, name) for name in FILE_COMMANDS}
+        self.register_command('stats', self._stats)
+
+    def register_command(self, name, handler):
+        # handler(params) -> dict response; params berisi token request setelah nama command
+        self.commands[name.lower()] = handler
+
+    def _stats(self, params=[]):
+        return dict(status='OK', data=self.stats_snapshot())
+
+    def parse_request(self, frame):
+        """
+        Memecah frame (bytes) menjadi (command, params, payload). Payload hanya
+        ada untuk PAYLOAD_COMMANDS, berupa memoryview ke frame (tanpa salinan,
+        whitespace di ujungnya tidak ikut), dan tidak termasuk di params.
+        """
+        m = REQUEST_TOKEN.match(frame)
+        if not m:
+            return '', [], None
+        command = m.group(1).decode().lower()
+        pos = m.end()
+        header_tokens = PAYLOAD_COMMANDS.get(command)
+        if header_tokens is None:
+            return command, frame[pos:].decode().split(), None
+
+        params = []
+        for _ in range(header_tokens):
+            m = REQUEST_TOKEN.match(frame, pos)
+            if not m:
+                return command, params, None
+            params.append(m.group(1).decode())
+            pos = m.end()
+        start = PAYLOAD_START.match(frame, pos).end()
+        end = len(frame)
+        while end > start and frame[end - 1] in WHITESPACE:
+            end -= 1
+        return command, params, memoryview(frame)[start:end] if end > start else None
+
+    def _log_display(self, command, params, payload):
+        display = ' '.join([command.upper()] + params)
+        if len(display) > MAX_LOG_LEN:
+            display = display[:MAX_LOG_LEN] + f"... [Truncated, Total len: {len(display)}]"
+        if payload is not None:
+            display += f" [CONTENT_TRUNCATED]... (Payload len: {len(payload)})"
+        return display
 
     def proses_string(self,string_datamasuk=''):
-        log_display_string = string_datamasuk
-        if len(string_datamasuk) > MAX_LOG_LEN:
-            command_part = string_datamasuk.split(' ')[0]
-            if command_part.upper() == "UPLOAD" and len(string_datamasuk.split(' ')) > 2:
-                 filename_part = string_datamasuk.split(' ')[1]
-                 log_display_string = f"{command_part} {filename_part} [CONTENT_TRUNCATED]... (Total len: {len(string_datamasuk)})"
-            else:
-                log_display_string = string_datamasuk[:MAX_LOG_LEN] + f"... [Truncated, Total len: {len(string_datamasuk)}]"
-        
-        c = str.split(string_datamasuk)
-        if not c:
+        # string_datamasuk: satu frame request, sebaiknya bytes (str diterima untuk pemanggilan langsung).
+        # Mengembalikan response JSON sebagai str; server memakai proses_command + kirim_response.
+        if isinstance(string_datamasuk, str):
+            string_datamasuk = string_datamasuk.encode()
+        try:
+            c_request, params, payload = self.parse_request(string_datamasuk)
+        except UnicodeDecodeError as e:
+            logging.warning(f"Server Proto: Request header is not valid UTF-8: {e}")
+            hasil = dict(status='ERROR', data='Request header is not valid UTF-8')
+        else:
+            hasil = self.proses_command(c_request, params, payload)
+        return b''.join(json_codec.encode_response(hasil))[:-len(json_codec.DELIMITER)].decode()
+
+    def proses_command(self, c_request, params, payload=None):
+        # Mengembalikan dict response; data_file (base64) boleh berupa bytes, lihat json_codec.encode_response
+        if not c_request:
             logging.warning("Server Proto: Empty request received.")
-            return json.dumps(dict(status='ERROR', data='Empty request received'))
-        
+            return dict(status='ERROR', data='Empty request received')
+
+        handler = self.commands.get(c_request)
+        if handler is None:
+            logging.warning(f"Server Proto: Unknown command '{c_request}'. Full request: {self._log_display(c_request, params, payload)}")
+            return dict(status='ERROR',data=f"Request command '{c_request}' not recognized")
+        try:
+            hasil = handler(params if payload is None else params + [payload])
+            if 'data_encoding' in hasil:
+                # GET terkompres: penghematan dibanding base64 isi asli
+                self.count_compressed(4 * -(-hasil['data_raw_size'] // 3), len(hasil['data_file']))
+            return hasil
+        except Exception as e:
+            logging.error(f"Server Proto: Exception processing request '{self._log_display(c_request, params, payload)}': {e}", exc_info=True)
+            return dict(status='ERROR',data=f'Error processing request: {str(e)}')
+
+    def kirim_response(self, connection, hasil):
+        # Header JSON, payload base64 dan penutup dikirim dalam satu sendmsg (writev), tanpa digabung dulu
+        sent = send_chunks(connection, json_codec.encode_response(hasil))
+        self.stats.incr('bytes_sent', sent)
+
+    def count_compressed(self, plain_size, sent_size):
+        self.stats.incr('compressed_responses')
+        self.stats.incr('compression_saved_bytes', plain_size - sent_size)
+
+    def stats_snapshot(self):
+        data = self.stats.snapshot()
+        if self.cache is not None:
+            data.update(self.cache.snapshot())
+        return data
+
+    def proses_request(self, reader, connection):
+        """
+        Memproses satu request dari reader (FrameReader) dan mengirim
+        responsenya. Mengembalikan False bila koneksi sudah ditutup client.
+        """
+        head = reader.peek(STREAM_HEAD_SIZE)
+        if not head:
+            return False
+
+        # Latensi dihitung sejak awal request tiba sampai response terkirim; exception = error.
+        # Frame yang tidak sampai ter-parse (koneksi putus, terlalu besar) dicatat sebagai connection error oleh server.
+        started = time.perf_counter()
+        command, ok = None, False
         try:
-            c_request = c[0].strip().lower()
-            params = [x for x in c[1:]]
-            
-            if hasattr(self.file, c_request):
-                method_to_call = getattr(self.file, c_request)
-                cl = method_to_call(params)
-                return json.dumps(cl)
+            stream_upload = STREAM_UPLOAD_PATTERN.match(head)
+            if stream_upload:
+                command = 'upload_stream'
+                reader.read_exact(stream_upload.end())
+                filename = stream_upload.group(1).decode()
+                hasil = self.proses_upload_stream(filename, reader.iter_frame())
             else:
-                logging.warning(f"Server Proto: Unknown command '{c_request}'. Full request: {log_display_string}")
-                return json.dumps(dict(status='ERROR',data=f"Request command '{c_request}' not recognized"))
-        except AttributeError:
-             logging.error(f"Server Proto: Attribute error for command. Request: {log_display_string}", exc_info=True)
-             return json.dumps(dict(status='ERROR',data='Internal server error processing request type'))
+                frame = reader.read_frame()
+                if frame is None:
+                    return False
+                c_request, params, payload = self.parse_request(frame)
+                command = c_request or 'other'
+                if c_request in BINARY_COMMANDS:
+                    # GETB/UPLOADB stream raw bytes on the socket; the reader keeps bytes of the next request
+                    ok = self.proses_binary(c_request, params, connection, reader)
+                    return True
+                hasil = self.proses_command(c_request, params, payload)
+
+            self.kirim_response(connection, hasil)
+            ok = hasil.get('status') == 'OK'
+            return True
+        finally:
+            self.stats.incr('bytes_received', reader.take_bytes_received())
+            if command is not None:
+                self.stats.observe(command, time.perf_counter() - started, ok)
+
+    def proses_upload_stream(self, filename, chunks):
+        chunks = iter(chunks)
+        try:
+            cl = self.file.upload_stream(filename, chunks)
+        finally:
+            # Sisa frame (misal setelah base64 tidak valid) tetap dibuang agar stream sinkron.
+            for _ in chunks:
+                pass
+        if cl.get('status') != 'OK':
+            logging.warning(f"Server Proto: UPLOAD {filename} [STREAMED] failed: {cl.get('data')}")
+        return cl
+
+    def proses_binary(self, c_request, params, connection, reader):
+        """
+        Memproses perintah biner langsung pada socket. Body UPLOADB dibaca
+        lewat reader (FrameReader) agar bytes yang sudah ter-buffer ikut terpakai.
+        Mengembalikan True bila response berstatus OK.
+        """
+        if c_request == 'getb':
+            return self._kirim_file(params, connection)
+        elif c_request == 'upload_partb':
+            return self._terima_part(params, connection, reader)
+        else:
+            return self._terima_file(params, connection, reader)
+
+    def _kirim_header(self, connection, header):
+        header_bytes = json_codec.dumps(header) + json_codec.DELIMITER
+        connection.sendall(header_bytes)
+        self.stats.incr('bytes_sent', len(header_bytes))
+        return header.get('status') == 'OK'
+
+    def _kirim_file(self, params, connection):
+        params, accepted = compression.split_encoding(params)
+        if not params:
+            return self._kirim_header(connection, dict(status='ERROR', data='Filename not provided for GETB'))
+        filename = params[0]
+        try:
+            fp, size = self.file._open_for_read(filename)
+        except FileNotFoundError:
+            return self._kirim_header(connection, dict(status='ERROR', data=f"File '{filename}' not found."))
         except Exception as e:
-            logging.error(f"Server Proto: Exception processing string '{log_display_string}': {e}", exc_info=True)
-            return json.dumps(dict(status='ERROR',data=f'Error processing request: {str(e)}'))
+            return self._kirim_header(connection, dict(status='ERROR', data=str(e)))
+
+        with fp:
+            if accepted and len(params) == 1:
+                codec, body = self.file._read_encoded(fp, filename, accepted)
+                if codec is not None:
+                    header = dict(status='OK', data_namafile=filename, data_size=len(body), data_encoding=codec, data_raw_size=size)
+                    digest = self.file._checksum(fp)
+                    if digest is not None:
+                        header['data_sha256'] = digest
+                    self._kirim_header(connection, header)
+                    connection.sendall(body)
+                    self.stats.incr('bytes_sent', len(body))
+                    self.stats.incr('files_sent')
+                    self.count_compressed(size, len(body))
+                    return True
+            header = dict(status='OK', data_namafile=filename, data_size=size)
+            offset = 0
+            if len(params) > 1:
+                try:
+                    offset, size = self.file._parse_range(params[1:], size)
+                except ValueError as e:
+                    return self._kirim_header(connection, dict(status='ERROR', data=str(e)))
+                fp.seek(offset)
+                header = dict(status='OK', data_namafile=filename, data_offset=offset, data_size=size)
+            cached = None if self.use_sendfile else self.file._read_cached(fp)
+            digest = None
+            if len(params) == 1:
+                digest = self.file._checksum(fp, cached)
+                if digest is not None:
+                    header['data_sha256'] = digest
+            self._kirim_header(connection, header)
+            if cached is not None:
+                view = memoryview(cached)[offset:offset + size]
+                connection.sendall(view)
+                self.stats.incr('bytes_sent', len(view))
+                self.stats.incr('files_sent')
+                return True
+            if self.use_sendfile:
+                sent = connection.sendfile(fp, offset, size)
+                self.stats.incr('bytes_sent', sent)
+                self.stats.incr('bytes_sent_sendfile', sent)
+                self.stats.incr('files_sent')
+                if sent != size:
+                    raise IOError(f"File '{filename}' truncated while sending ({size - sent} bytes short).")
+                return True
+            hashing = HashingWriter() if len(params) == 1 and digest is None else None
+            remaining = size
+            while remaining > 0:
+                chunk = fp.read(min(BINARY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"File '{filename}' truncated while sending ({remaining} bytes short).")
+                if hashing is not None:
+                    hashing.write(chunk)
+                connection.sendall(chunk)
+                self.stats.incr('bytes_sent', len(chunk))
+                remaining -= len(chunk)
+            if hashing is not None:
+                self.file._store_checksum(fp, hashing.hexdigest())
+            self.stats.incr('files_sent')
+            return True
+
+    def _terima_file(self, params, connection, reader):
+        if len(params) < 2:
+            # Tanpa ukuran body tidak bisa dipisahkan dari request berikutnya.
+            self._kirim_header(connection, dict(status='ERROR', data='UPLOADB command requires filename and size.'))
+            raise ConnectionAbortedError('UPLOADB without size, stream cannot be resynchronised')
+        filename = params[0]
+        try:
+            size = int(params[1])
+            if size < 0:
+                raise ValueError
+        except ValueError:
+            self._kirim_header(connection, dict(status='ERROR', data=f"Invalid size '{params[1]}' for UPLOADB."))
+            raise ConnectionAbortedError('UPLOADB with invalid size, stream cannot be resynchronised')
+
+        try:
+            fp = self.file._open_for_write(filename)
+        except Exception as e:
+            # Body tetap dibaca (dibuang) agar stream sinkron untuk request berikutnya.
+            reader.read_exact(size)
+            return self._kirim_header(connection, dict(status='ERROR', data=str(e)))
+
+        with fp as sink:
+            reader.read_exact(size, sink=sink)
+        return self._kirim_header(connection, dict(status='OK', data=f"File '{filename}' uploaded successfully to {self.file.storage_dir}.", data_sha256=sink.hexdigest()))
+
+    def _terima_part(self, params, connection, reader):
+        if len(params) < 3:
+            self._kirim_header(connection, dict(status='ERROR', data='UPLOAD_PARTB command requires upload id, part number and size.'))
+            raise ConnectionAbortedError('UPLOAD_PARTB without size, stream cannot be resynchronised')
+        upload_id, part_number = params[0], params[1]
+        try:
+            size = int(params[2])
+            if size < 0:
+                raise ValueError
+        except ValueError:
+            self._kirim_header(connection, dict(status='ERROR', data=f"Invalid size '{params[2]}' for UPLOAD_PARTB."))
+            raise ConnectionAbortedError('UPLOAD_PARTB with invalid size, stream cannot be resynchronised')
+
+        try:
+            writer = self.file._open_part(upload_id, part_number, size)
+        except Exception as e:
+            reader.read_exact(size)
+            return self._kirim_header(connection, dict(status='ERROR', data=str(e)))
+
+        try:
+            reader.read_exact(size, sink=writer)
+            writer.finish()
+        finally:
+            writer.close()
+        return self._kirim_header(connection, dict(status='OK', data_upload_id=upload_id, data_part=int(part_number), data_size=size))
 
 
 if __name__=='__main__':
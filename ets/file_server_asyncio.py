@@ -0,0 +1,341 @@
+import asyncio
+import binascii
+import logging
+import argparse
+import os
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import compression
+import json_codec
+from file_protocol import FileProtocol, STREAM_HEAD_SIZE, STREAM_UPLOAD_PATTERN, BINARY_CHUNK_SIZE, BINARY_COMMANDS, METRIC_COMMANDS
+from file_interface import Base64ChunkDecoder
+from blob_store import HashingWriter
+from frame_reader import AsyncFrameReader, FrameTooLarge, DEFAULT_MAX_FRAME_SIZE
+from connection_frontend import DEFAULT_CLIENT_TIMEOUT
+from server_stats import ServerStats
+
+# Connections are plain coroutines on one event loop, so idle/slow clients cost no thread.
+# Anything that touches the disk (or base64-encodes a whole file for text GET) runs on a
+# bounded ThreadPoolExecutor of --workers threads, including the enter/exit of the
+# upload context managers (mkstemp, rename/blob commit).
+
+class ProcessTheClient():
+    def __init__(self, reader, writer, fp_protocol_instance, executor, max_frame_size=DEFAULT_MAX_FRAME_SIZE, timeout=DEFAULT_CLIENT_TIMEOUT):
+        self.writer = writer
+        self.address = writer.get_extra_info('peername')
+        self.fp_protocol = fp_protocol_instance
+        self.executor = executor
+        self.frames = AsyncFrameReader(reader, max_frame_size=max_frame_size, timeout=timeout)
+
+    async def _offload(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    @asynccontextmanager
+    async def _offload_context(self, context):
+        # Sync context manager (FileInterface._atomic_write) whose __enter__/__exit__ touch the disk.
+        value = await self._offload(context.__enter__)
+        try:
+            yield value
+        except BaseException as e:
+            if not await self._offload(context.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            await self._offload(context.__exit__, None, None, None)
+
+    async def _kirim(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+        self.fp_protocol.stats.incr('bytes_sent', len(data))
+
+    async def _kirim_json(self, hasil):
+        # Potongan response (header, payload base64, penutup) diserahkan ke transport tanpa digabung
+        chunks = json_codec.encode_response(hasil)
+        self.writer.writelines(chunks)
+        await self.writer.drain()
+        self.fp_protocol.stats.incr('bytes_sent', sum(len(c) for c in chunks))
+        return hasil.get('status') == 'OK'
+
+    async def run(self):
+        try:
+            while True:
+                if not await self.proses_request():
+                    logging.info(f"Connection closed by {self.address}")
+                    break
+        except asyncio.TimeoutError:
+            logging.warning(f"Socket timeout for client {self.address}.")
+        except FrameTooLarge as e:
+            logging.warning(f"Oversized request from {self.address}: {e}")
+            try:
+                await self._kirim_json(dict(status='ERROR', data=str(e)))
+            except OSError:
+                pass
+        except UnicodeDecodeError as e:
+            logging.error(f"UnicodeDecodeError from {self.address}: {e}. Frame: {e.object[:100]}...")
+        except ConnectionAbortedError as e:
+            logging.warning(f"Aborted binary transfer with client {self.address}: {e}")
+        except ConnectionResetError:
+            logging.warning(f"Connection reset by client {self.address}.")
+        except BrokenPipeError:
+            logging.warning(f"Broken pipe with client {self.address}.")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Unexpected error processing client {self.address}: {e}", exc_info=True)
+        finally:
+            self.writer.close()
+            logging.info(f"Connection with {self.address} ended.")
+
+    async def proses_request(self):
+        # Same framing rules as FileProtocol.proses_request, with awaits instead of blocking socket calls.
+        head = await self.frames.peek(STREAM_HEAD_SIZE)
+        if not head:
+            return False
+
+        started = time.perf_counter()
+        command, ok = None, False
+        try:
+            stream_upload = STREAM_UPLOAD_PATTERN.match(head)
+            if stream_upload:
+                command = 'upload_stream'
+                async for _ in self.frames.read_chunks(stream_upload.end()):
+                    pass
+                ok = await self._kirim_json(await self._upload_stream(stream_upload.group(1).decode()))
+                return True
+
+            frame = await self.frames.read_frame()
+            if frame is None:
+                return False
+            c_request, params, payload = self.fp_protocol.parse_request(frame)
+            command = c_request or 'other'
+            if c_request in BINARY_COMMANDS:
+                if c_request == 'getb':
+                    ok = await self._kirim_file(params)
+                elif c_request == 'upload_partb':
+                    ok = await self._terima_part(params)
+                else:
+                    ok = await self._terima_file(params)
+                return True
+
+            hasil = await self._offload(self.fp_protocol.proses_command, c_request, params, payload)
+            ok = await self._kirim_json(hasil)
+            return True
+        finally:
+            if command is not None:
+                self.fp_protocol.stats.observe(command, time.perf_counter() - started, ok)
+
+    async def _upload_stream(self, filename):
+        chunks = self.frames.iter_frame()
+        full_path = self.fp_protocol.file._get_full_path(filename)
+        try:
+            if not full_path:
+                return dict(status='ERROR', data=f"Invalid filename '{filename}' for UPLOAD.")
+            decoder = Base64ChunkDecoder()
+
+            def tulis(chunk):
+                # Decode base64 dan tulis ke disk di executor, bukan di event loop.
+                fp.write(decoder.feed(chunk))
+
+            async with self._offload_context(self.fp_protocol.file._atomic_write(full_path)) as fp:
+                async for chunk in chunks:
+                    await self._offload(tulis, chunk)
+                await self._offload(decoder.finish)
+            return dict(status='OK', data=f"File '{filename}' uploaded successfully to {self.fp_protocol.file.storage_dir}.", data_sha256=fp.hexdigest())
+        except binascii.Error as b64e:
+            return dict(status='ERROR', data=f"Invalid Base64 content for UPLOAD: {str(b64e)}")
+        except ConnectionError:
+            raise
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+        finally:
+            # Sisa frame tetap dibuang agar stream sinkron untuk request berikutnya.
+            async for _ in chunks:
+                pass
+
+    async def _kirim_file(self, params):
+        params, accepted = compression.split_encoding(params)
+        if not params:
+            return await self._kirim_json(dict(status='ERROR', data='Filename not provided for GETB'))
+        filename = params[0]
+        try:
+            fp, size = await self._offload(self.fp_protocol.file._open_for_read, filename)
+        except FileNotFoundError:
+            return await self._kirim_json(dict(status='ERROR', data=f"File '{filename}' not found."))
+        except Exception as e:
+            return await self._kirim_json(dict(status='ERROR', data=str(e)))
+
+        try:
+            if accepted and len(params) == 1:
+                codec, body = await self._offload(self.fp_protocol.file._read_encoded, fp, filename, accepted)
+                if codec is not None:
+                    header = dict(status='OK', data_namafile=filename, data_size=len(body), data_encoding=codec, data_raw_size=size)
+                    digest = await self._offload(self.fp_protocol.file._checksum, fp)
+                    if digest is not None:
+                        header['data_sha256'] = digest
+                    await self._kirim_json(header)
+                    await self._kirim(body)
+                    self.fp_protocol.stats.incr('files_sent')
+                    self.fp_protocol.count_compressed(size, len(body))
+                    return True
+            header = dict(status='OK', data_namafile=filename, data_size=size)
+            offset = 0
+            if len(params) > 1:
+                try:
+                    offset, size = self.fp_protocol.file._parse_range(params[1:], size)
+                except ValueError as e:
+                    return await self._kirim_json(dict(status='ERROR', data=str(e)))
+                fp.seek(offset)
+                header = dict(status='OK', data_namafile=filename, data_offset=offset, data_size=size)
+            cached = None if self.fp_protocol.use_sendfile else await self._offload(self.fp_protocol.file._read_cached, fp)
+            digest = None
+            if len(params) == 1:
+                digest = await self._offload(self.fp_protocol.file._checksum, fp, cached)
+                if digest is not None:
+                    header['data_sha256'] = digest
+            await self._kirim_json(header)
+            if cached is not None:
+                await self._kirim(memoryview(cached)[offset:offset + size])
+            elif self.fp_protocol.use_sendfile:
+                sent = await asyncio.get_running_loop().sendfile(self.writer.transport, fp, offset, size)
+                self.fp_protocol.stats.incr('bytes_sent', sent)
+                self.fp_protocol.stats.incr('bytes_sent_sendfile', sent)
+            else:
+                hashing = HashingWriter() if len(params) == 1 and digest is None else None
+                remaining = size
+                while remaining > 0:
+                    chunk = await self._offload(fp.read, min(BINARY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise IOError(f"File '{filename}' truncated while sending ({remaining} bytes short).")
+                    if hashing is not None:
+                        await self._offload(hashing.write, chunk)
+                    await self._kirim(chunk)
+                    remaining -= len(chunk)
+                if hashing is not None:
+                    await self._offload(self.fp_protocol.file._store_checksum, fp, hashing.hexdigest())
+            self.fp_protocol.stats.incr('files_sent')
+            return True
+        finally:
+            fp.close()
+
+    async def _terima_file(self, params):
+        if len(params) < 2:
+            await self._kirim_json(dict(status='ERROR', data='UPLOADB command requires filename and size.'))
+            raise ConnectionAbortedError('UPLOADB without size, stream cannot be resynchronised')
+        filename = params[0]
+        try:
+            size = int(params[1])
+            if size < 0:
+                raise ValueError
+        except ValueError:
+            await self._kirim_json(dict(status='ERROR', data=f"Invalid size '{params[1]}' for UPLOADB."))
+            raise ConnectionAbortedError('UPLOADB with invalid size, stream cannot be resynchronised')
+
+        chunks = self.frames.read_chunks(size)
+        try:
+            async with self._offload_context(self.fp_protocol.file._open_for_write(filename)) as sink:
+                async for chunk in chunks:
+                    await self._offload(sink.write, chunk)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            async for _ in chunks:
+                pass
+            return await self._kirim_json(dict(status='ERROR', data=str(e)))
+        return await self._kirim_json(dict(status='OK', data=f"File '{filename}' uploaded successfully to {self.fp_protocol.file.storage_dir}.", data_sha256=sink.hexdigest()))
+
+    async def _terima_part(self, params):
+        if len(params) < 3:
+            await self._kirim_json(dict(status='ERROR', data='UPLOAD_PARTB command requires upload id, part number and size.'))
+            raise ConnectionAbortedError('UPLOAD_PARTB without size, stream cannot be resynchronised')
+        upload_id, part_number = params[0], params[1]
+        try:
+            size = int(params[2])
+            if size < 0:
+                raise ValueError
+        except ValueError:
+            await self._kirim_json(dict(status='ERROR', data=f"Invalid size '{params[2]}' for UPLOAD_PARTB."))
+            raise ConnectionAbortedError('UPLOAD_PARTB with invalid size, stream cannot be resynchronised')
+
+        chunks = self.frames.read_chunks(size)
+        try:
+            writer = await self._offload(self.fp_protocol.file._open_part, upload_id, part_number, size)
+        except Exception as e:
+            async for _ in chunks:
+                pass
+            return await self._kirim_json(dict(status='ERROR', data=str(e)))
+        try:
+            async for chunk in chunks:
+                await self._offload(writer.write, chunk)
+            await self._offload(writer.finish)
+        finally:
+            writer.close()
+        return await self._kirim_json(dict(status='OK', data_upload_id=upload_id, data_part=int(part_number), data_size=size))
+
+
+class Server():
+    def __init__(self,ipaddress='0.0.0.0',port=6665, max_workers=None, use_sendfile=False, max_frame_size=DEFAULT_MAX_FRAME_SIZE, cache_bytes=0, dedup=False, client_timeout=DEFAULT_CLIENT_TIMEOUT):
+        self.ipinfo=(ipaddress,port)
+
+        if max_workers is None or max_workers <= 0:
+            self.max_workers = (os.cpu_count() or 1) * 5
+            logging.info(f"Max workers not specified or invalid, defaulting to {self.max_workers}")
+        else:
+            self.max_workers = max_workers
+
+        self.max_frame_size = max_frame_size
+        self.client_timeout = client_timeout
+        self.stats = ServerStats(commands=METRIC_COMMANDS)
+        self.cache_bytes = cache_bytes
+        self.fp_protocol_main_instance = FileProtocol(use_sendfile=use_sendfile, stats=self.stats, cache_bytes=cache_bytes, dedup=dedup)
+        self.executor = None
+
+    async def handle_client(self, reader, writer):
+        logging.info(f"EventLoop: Accepted connection from {writer.get_extra_info('peername')}")
+        client_processor = ProcessTheClient(reader, writer, self.fp_protocol_main_instance, self.executor, self.max_frame_size, self.client_timeout)
+        await client_processor.run()
+
+    async def run(self):
+        logging.warning(f"Asyncio Server starting on {self.ipinfo}, max disk I/O threads: {self.max_workers}, sendfile: {self.fp_protocol_main_instance.use_sendfile}, cache_bytes: {self.cache_bytes}, client_timeout: {self.client_timeout}, dedup: {self.fp_protocol_main_instance.file.blobs is not None}")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self.executor = executor
+            server = await asyncio.start_server(self.handle_client, self.ipinfo[0], self.ipinfo[1], backlog=128, reuse_address=True)
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                logging.warning(f"Asyncio Server: Transfer counters: {self.stats.snapshot()}")
+                logging.warning("Asyncio Server: Listening socket closed. Shutdown complete.")
+
+def main():
+    parser = argparse.ArgumentParser(description="File Server with asyncio streams")
+    parser.add_argument('--ip', type=str, default='0.0.0.0', help='IP address to bind the server to')
+    parser.add_argument('--port', type=int, default=6665, help='Port to bind the server to')
+    parser.add_argument('--workers', type=int, default=None, help='Number of disk I/O threads (default: 5 * CPU cores)')
+    parser.add_argument('--sendfile', action='store_true', help='Send GETB file bodies with loop.sendfile (zero-copy from page cache)')
+    parser.add_argument('--max_frame_size', type=int, default=DEFAULT_MAX_FRAME_SIZE, help='Maximum size in bytes of one request frame (text commands incl. base64 UPLOAD payload)')
+    parser.add_argument('--client_timeout', type=float, default=DEFAULT_CLIENT_TIMEOUT, help='Seconds a connection may wait for the next request or for more of a request body before it is closed')
+    parser.add_argument('--cache_bytes', type=int, default=0, help='Byte budget of the in-memory LRU cache of GET/GETB file contents (0 disables it)')
+    parser.add_argument('--dedup', action='store_true', help='Content-addressed storage: identical uploads are stored once (SHA-256 blobs hardlinked under each name), enables HAVE')
+    parser.add_argument('--loglevel', type=str, default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='Logging level')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, args.loglevel.upper()),
+        format='%(asctime)s - %(levelname)s - %(threadName)s - %(module)s:%(lineno)d - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    if not os.path.exists('files'):
+        os.makedirs('files')
+        logging.info("Created 'files' directory for server storage.")
+
+    svr = Server(ipaddress=args.ip, port=args.port, max_workers=args.workers, use_sendfile=args.sendfile, max_frame_size=args.max_frame_size, cache_bytes=args.cache_bytes, dedup=args.dedup, client_timeout=args.client_timeout)
+    try:
+        asyncio.run(svr.run())
+    except KeyboardInterrupt:
+        logging.warning("MainThread (Orchestrator): KeyboardInterrupt. Server stopped.")
+    logging.warning("MainThread (Orchestrator): Application exiting.")
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,155 @@
 from socket import *
 import socket
+import json
 import threading
 import logging
 import time
 import sys
 import argparse
 import os
-from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
-from file_protocol import FileProtocol
+from file_protocol import FileProtocol, METRIC_COMMANDS
+from metrics_http import start_metrics_listener
+from frame_reader import FrameReader, FrameTooLarge, SlowClient, DEFAULT_MAX_FRAME_SIZE
+from connection_frontend import SelectorFrontEnd, DISPATCH_BYTES, DEFAULT_CLIENT_TIMEOUT, DEFAULT_IDLE_TIMEOUT, DEFAULT_HEADER_TIMEOUT
+from server_stats import ServerStats
+from file_cache import SharedFileCache
 
-def process_client_connection(connection, address):
-    fp_instance = FileProtocol()
-    client_handler = ProcessTheClient(connection, address, fp_instance)
-    client_handler.run()
+def create_listen_socket(ipinfo, reuseport=False):
+    my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuseport:
+        my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    my_socket.bind(ipinfo)
+    my_socket.listen(128)
+    return my_socket
+
+def worker_main(worker_id, listen_socket, ipinfo, shutdown_event, stats, use_sendfile, max_frame_size, cache=None,
+                client_timeout=DEFAULT_CLIENT_TIMEOUT, min_rate=0, frontend=None, dedup=False):
+    # Pre-forked worker: accepts directly from the shared listening socket (or its own
+    # SO_REUSEPORT socket when listen_socket is None) so the parent never touches client sockets.
+    try:
+        if listen_socket is None:
+            listen_socket = create_listen_socket(ipinfo, reuseport=True)
+        listen_socket.settimeout(1.0) # For periodic shutdown_event checks
+        stats.use_shard(worker_id)
+        fp_instance = FileProtocol(use_sendfile=use_sendfile, stats=stats, cache=cache, dedup=dedup)
+        logging.info(f"Worker {worker_id}: accepting connections on {ipinfo}")
+
+        if frontend is not None:
+            # frontend: dict(idle_timeout, header_timeout). Worker process ini memegang banyak koneksi
+            # di selector dan memproses (serial) hanya koneksi yang frame request-nya sudah lengkap.
+            def on_accept(connection, client_address):
+                stats.incr_worker(worker_id)
+                return True
+
+            def serve_ready(conn):
+                if ProcessTheClient(conn.connection, conn.address, fp_instance, max_frame_size, client_timeout, min_rate).serve(conn.reader, until_idle=True):
+                    selector_frontend.resume(conn)
+                else:
+                    selector_frontend.close(conn)
+
+            selector_frontend = SelectorFrontEnd(listen_socket, serve_ready, stats=stats, max_frame_size=max_frame_size,
+                                                 min_rate=min_rate, on_accept=on_accept, **frontend)
+            selector_frontend.serve_forever(shutdown_event)
+
+        while not shutdown_event.is_set():
+            try:
+                connection, client_address = listen_socket.accept()
+            except socket.timeout:
+                continue
+            logging.info(f"Worker {worker_id}: Accepted connection from {client_address}")
+            stats.incr_worker(worker_id)
+            ProcessTheClient(connection, client_address, fp_instance, max_frame_size, client_timeout, min_rate).run()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logging.error(f"Worker {worker_id}: unhandled error: {e}", exc_info=True)
+        # Exit code != 0 agar supervisor (Server.run) menganggapnya crash dan menjalankan worker pengganti
+        sys.exit(1)
+    finally:
+        if listen_socket is not None:
+            listen_socket.close()
 
 class ProcessTheClient():
-    def __init__(self, connection, address, fp_protocol_instance):
+    def __init__(self, connection, address, fp_protocol_instance, max_frame_size=DEFAULT_MAX_FRAME_SIZE, timeout=DEFAULT_CLIENT_TIMEOUT, min_rate=0):
         self.connection = connection
         self.address = address
         self.fp_protocol = fp_protocol_instance
+        self.max_frame_size = max_frame_size
+        self.timeout = timeout
+        self.min_rate = min_rate
+
+    def _connection_error(self, kind):
+        self.fp_protocol.stats.incr(f"connection_errors_{kind}")
 
     def run(self):
-        buffer = ""
+        reader = FrameReader(self.connection, max_frame_size=self.max_frame_size, min_rate=self.min_rate)
+        stats = self.fp_protocol.stats
+        stats.incr('connections_accepted')
+        stats.incr('active_connections')
         try:
-            self.connection.settimeout(120)
-            while True:
-                data = self.connection.recv(16384)
-                if not data: 
+            self.serve(reader)
+        finally:
+            stats.incr('active_connections', -1)
+            self.connection.close()
+            logging.info(f"Connection with {self.address} ended.")
+
+    def serve(self, reader, until_idle=False):
+        """
+        Memproses request sampai koneksi ditutup atau error. Dengan until_idle
+        (front end selector) berhenti begitu tidak ada frame siap di buffer dan
+        mengembalikan True: koneksi masih terbuka dan kembali ke front end.
+        """
+        try:
+            self.connection.settimeout(self.timeout)
+            while not until_idle or reader.frame_ready(DISPATCH_BYTES):
+                reader.start_rate_window()
+                if not self.fp_protocol.proses_request(reader, self.connection):
                     logging.info(f"Connection closed by {self.address}")
                     break
-                try:
-                    buffer += data.decode()
-                except UnicodeDecodeError as e:
-                    logging.error(f"UnicodeDecodeError from {self.address}: {e}. Buffer: {buffer[:100]}...")
-                    break 
-                
-                while "\r\n\r\n" in buffer:
-                    command_to_process, buffer = buffer.split("\r\n\r\n", 1)
-                    
-                    hasil_json_str = self.fp_protocol.proses_string(command_to_process)
-                    
-                    response_to_send = hasil_json_str + "\r\n\r\n"
-                    self.connection.sendall(response_to_send.encode())
-
+            else:
+                return True
+        except SlowClient as e:
+            self._connection_error('slow_client')
+            logging.warning(f"Slow client {self.address}: {e}")
         except socket.timeout:
+            self._connection_error('timeout')
             logging.warning(f"Socket timeout for client {self.address}.")
+        except FrameTooLarge as e:
+            self._connection_error('frame_too_large')
+            logging.warning(f"Oversized request from {self.address}: {e}")
+            try:
+                self.connection.sendall((json.dumps(dict(status='ERROR', data=str(e))) + "\r\n\r\n").encode())
+            except OSError:
+                pass
+        except UnicodeDecodeError as e:
+            self._connection_error('unicode')
+            logging.error(f"UnicodeDecodeError from {self.address}: {e}. Frame: {e.object[:100]}...")
+        except ConnectionAbortedError as e:
+            self._connection_error('aborted')
+            logging.warning(f"Aborted binary transfer with client {self.address}: {e}")
         except ConnectionResetError:
+            self._connection_error('reset')
             logging.warning(f"Connection reset by client {self.address}.")
         except BrokenPipeError:
+            self._connection_error('broken_pipe')
             logging.warning(f"Broken pipe with client {self.address} (client likely closed connection abruptly).")
         except Exception as e:
+            self._connection_error('other')
             logging.error(f"Unexpected error processing client {self.address}: {e}", exc_info=True)
-        finally:
-            self.connection.close()
-            logging.info(f"Connection with {self.address} ended.")
+        return False
 
 
 class Server(threading.Thread):
-    def __init__(self,ipaddress='0.0.0.0',port=6665, max_workers=None):
+    def __init__(self,ipaddress='0.0.0.0',port=6665, max_workers=None, use_sendfile=False, max_frame_size=DEFAULT_MAX_FRAME_SIZE, reuseport=False, cache_bytes=0, metrics_port=None,
+                 frontend=False, idle_timeout=DEFAULT_IDLE_TIMEOUT, header_timeout=DEFAULT_HEADER_TIMEOUT, client_timeout=DEFAULT_CLIENT_TIMEOUT, min_rate=0,
+                 dedup=False):
         super().__init__()
         self.ipinfo=(ipaddress,port)
-        self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.reuseport = reuseport
+        self.my_socket = None
         
         if max_workers is None or max_workers <= 0:
             self.max_workers = os.cpu_count() or 1
@@ -70,40 +157,68 @@ class Server(threading.Thread):
         else:
             self.max_workers = max_workers
             
+        self.use_sendfile = use_sendfile
+        self.max_frame_size = max_frame_size
+        self.cache_bytes = cache_bytes
+        self.client_timeout = client_timeout
+        self.min_rate = min_rate
+        self.dedup = dedup
+        self.frontend = dict(idle_timeout=idle_timeout, header_timeout=header_timeout) if frontend else None
+        self.stats = ServerStats(num_workers=self.max_workers, commands=METRIC_COMMANDS)
+        self.metrics_port = metrics_port
+        self.metrics_listener = None
+        # Satu cache di shared memory untuk semua worker: file yang sama hanya disimpan sekali
+        self.cache = SharedFileCache(cache_bytes, stats=self.stats) if cache_bytes > 0 else None
         self.shutdown_event = threading.Event()
-        self.executor = None
+        self.worker_shutdown_event = multiprocessing.Event()
+        self.workers = []
+
+    def _spawn_worker(self, worker_id):
+        process = multiprocessing.Process(
+            target=worker_main,
+            name=f"MPWorker-{worker_id}",
+            args=(worker_id, self.my_socket, self.ipinfo, self.worker_shutdown_event,
+                  self.stats, self.use_sendfile, self.max_frame_size, self.cache,
+                  self.client_timeout, self.min_rate, self.frontend, self.dedup),
+            daemon=True
+        )
+        process.start()
+        return process
     
     def run(self):
-        logging.warning(f"MPPool Server starting on {self.ipinfo}, max worker processes: {self.max_workers}")
-        self.my_socket.bind(self.ipinfo)
-        self.my_socket.listen(128)
-        self.my_socket.settimeout(1.0)
+        logging.warning(f"MPPool Server starting on {self.ipinfo}, pre-forked worker processes: {self.max_workers}, reuseport: {self.reuseport}, sendfile: {self.use_sendfile}, shared cache_bytes: {self.cache_bytes}, frontend: {self.frontend}, client_timeout: {self.client_timeout}, min_rate: {self.min_rate}, dedup: {self.dedup}")
 
         try:
-            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-                self.executor = executor
-                logging.info(f"ProcessPoolExecutor started with {self.max_workers} worker processes.")
-
-                while not self.shutdown_event.is_set():
-                    try:
-                        connection, client_address = self.my_socket.accept()
-                        logging.info(f"MainProc: Accepted connection from {client_address}")
-                        self.executor.submit(process_client_connection, connection, client_address)
-                    except socket.timeout:
-                        continue
-                    except OSError as e:
-                        if self.shutdown_event.is_set():
-                            logging.info("MP Server: Socket operation interrupted by shutdown.")
-                            break
-                        logging.error(f"MP Server: Socket error during accept: {e}", exc_info=True)
-                        break 
+            if not self.reuseport:
+                self.my_socket = create_listen_socket(self.ipinfo)
+            self.workers = [self._spawn_worker(i) for i in range(self.max_workers)]
+            logging.info(f"Started {self.max_workers} worker processes.")
+            if self.metrics_port:
+                # Di proses induk: snapshot menjumlahkan shard counter semua worker
+                self.metrics_listener = start_metrics_listener(self.ipinfo[0], self.metrics_port, self.stats_snapshot)
+
+            while not self.shutdown_event.is_set():
+                time.sleep(0.5)
+                for i, process in enumerate(self.workers):
+                    # Exit code 0 is a worker leaving on SIGINT/shutdown; anything else is a crash.
+                    if not process.is_alive() and process.exitcode != 0 and not self.shutdown_event.is_set():
+                        logging.error(f"MP Server: Worker {i} (pid {process.pid}) died with exit code {process.exitcode}, respawning.")
+                        self.workers[i] = self._spawn_worker(i)
         except KeyboardInterrupt:
             logging.warning("MP Server: KeyboardInterrupt received, initiating shutdown...")
         except Exception as e:
             logging.error(f"MP Server: Main loop encountered an unhandled error: {e}", exc_info=True)
         finally:
             self.shutdown_event.set()
-            logging.warning("MP Server: Shutdown initiated (or already in progress from with-block exit).")
+            self.worker_shutdown_event.set()
+            logging.warning("MP Server: Shutdown initiated, waiting for workers to finish their current connection.")
+
+            for process in self.workers:
+                process.join(timeout=10)
+                if process.is_alive():
+                    logging.warning(f"MP Server: Worker {process.name} did not stop in time, terminating.")
+                    process.terminate()
+                    process.join()
             
             if self.my_socket:
                 try:
@@ -112,17 +227,41 @@ class Server(threading.Thread):
                 except Exception as e:
                     logging.error(f"MP Server: Error closing listening socket: {e}")
             
+            if self.metrics_listener is not None:
+                self.metrics_listener.shutdown()
+            if self.cache is not None:
+                logging.info(f"MP Server: Releasing shared cache {self.cache.snapshot()}")
+                self.cache.close()
+            logging.warning(f"MP Server: Transfer counters: {self.stats.snapshot()}")
             logging.warning("MP Server: Run method finishing.")
 
+    def stats_snapshot(self):
+        data = self.stats.snapshot()
+        data['active_workers'] = sum(1 for process in self.workers if process.is_alive())
+        if self.cache is not None:
+            data.update(self.cache.snapshot())
+        return data
+
     def stop(self):
         logging.info("MP Server: Stop requested.")
         self.shutdown_event.set()
 
 def main():
-    parser = argparse.ArgumentParser(description="File Server with ProcessPoolExecutor")
+    parser = argparse.ArgumentParser(description="File Server with pre-forked worker processes")
     parser.add_argument('--ip', type=str, default='0.0.0.0', help='IP address to bind the server to')
     parser.add_argument('--port', type=int, default=6665, help='Port to bind the server to')
     parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU cores)')
+    parser.add_argument('--reuseport', action='store_true', help='Give every worker its own SO_REUSEPORT listening socket instead of sharing one')
+    parser.add_argument('--sendfile', action='store_true', help='Send GETB file bodies with socket.sendfile (zero-copy from page cache)')
+    parser.add_argument('--max_frame_size', type=int, default=DEFAULT_MAX_FRAME_SIZE, help='Maximum size in bytes of one request frame (text commands incl. base64 UPLOAD payload)')
+    parser.add_argument('--cache_bytes', type=int, default=0, help='Byte budget of the in-memory LRU cache (shared memory, one copy for all workers) of GET/GETB file contents (0 disables it)')
+    parser.add_argument('--metrics_port', type=int, default=None, help='Serve Prometheus text metrics (aggregated over all workers) over HTTP on this port')
+    parser.add_argument('--frontend', action='store_true', help='Each worker holds its connections in a selector and serves only those with a complete request frame buffered (idle/slow clients do not block the worker)')
+    parser.add_argument('--idle_timeout', type=float, default=DEFAULT_IDLE_TIMEOUT, help='With --frontend: close connections idle between requests after this many seconds')
+    parser.add_argument('--header_timeout', type=float, default=DEFAULT_HEADER_TIMEOUT, help='With --frontend: a started request frame must be complete within this many seconds')
+    parser.add_argument('--client_timeout', type=float, default=DEFAULT_CLIENT_TIMEOUT, help='Socket timeout in seconds for reads/writes while serving a request (without --frontend also the idle timeout)')
+    parser.add_argument('--min_rate', type=int, default=0, help='Minimum request upload rate in bytes/s once a request has started; slower clients are dropped (0 disables it)')
+    parser.add_argument('--dedup', action='store_true', help='Content-addressed storage: identical uploads are stored once (SHA-256 blobs hardlinked under each name), enables HAVE')
     parser.add_argument('--loglevel', type=str, default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='Logging level')
     args = parser.parse_args()
 
@@ -136,7 +275,9 @@ def main():
         os.makedirs('files')
         logging.info("Created 'files' directory for server storage.")
 
-    svr = Server(ipaddress=args.ip, port=args.port, max_workers=args.workers)
+    svr = Server(ipaddress=args.ip, port=args.port, max_workers=args.workers, use_sendfile=args.sendfile, max_frame_size=args.max_frame_size, reuseport=args.reuseport, cache_bytes=args.cache_bytes, metrics_port=args.metrics_port,
+                 frontend=args.frontend, idle_timeout=args.idle_timeout, header_timeout=args.header_timeout, client_timeout=args.client_timeout, min_rate=args.min_rate,
+                 dedup=args.dedup)
     svr.start()
 
     try:
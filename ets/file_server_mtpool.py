@@ -1,5 +1,6 @@
 from socket import *
 import socket
+import json
 import threading
 import logging
 import time
@@ -9,7 +10,13 @@ import os # For os.cpu_count()
 from concurrent.futures import ThreadPoolExecutor
 
 # Assuming file_protocol.py is in the same directory or Python path
-from file_protocol import FileProtocol
+import json_codec
+from file_protocol import FileProtocol, METRIC_COMMANDS, send_chunks
+from admission import AdmissionControl, POLICIES
+from metrics_http import start_metrics_listener
+from frame_reader import FrameReader, FrameTooLarge, SlowClient, DEFAULT_MAX_FRAME_SIZE
+from connection_frontend import SelectorFrontEnd, DISPATCH_BYTES, DEFAULT_CLIENT_TIMEOUT, DEFAULT_IDLE_TIMEOUT, DEFAULT_HEADER_TIMEOUT
+from server_stats import ServerStats
 # fp_global = FileProtocol() # Instantiate once if FileInterface's os.chdir() is managed carefully
 # However, os.chdir in FileInterface.__init__ makes it tricky for a single global FileProtocol
 # if the server's CWD is important for other things.
@@ -18,52 +25,81 @@ from file_protocol import FileProtocol
 # is designed such that os.chdir('files') is called once and is stable.
 
 class ProcessTheClient(): # Removed (threading.Thread) as it's now a target for pool threads
-    def __init__(self, connection, address, fp_protocol_instance):
+    def __init__(self, connection, address, fp_protocol_instance, max_frame_size=DEFAULT_MAX_FRAME_SIZE, timeout=DEFAULT_CLIENT_TIMEOUT, min_rate=0):
         self.connection = connection
         self.address = address
         self.fp_protocol = fp_protocol_instance
+        self.max_frame_size = max_frame_size
+        self.timeout = timeout
+        self.min_rate = min_rate
+
+    def _connection_error(self, kind):
+        self.fp_protocol.stats.incr(f"connection_errors_{kind}")
 
     def run(self):
-        buffer = ""
+        reader = FrameReader(self.connection, max_frame_size=self.max_frame_size, min_rate=self.min_rate)
+        stats = self.fp_protocol.stats
+        stats.incr('connections_accepted')
+        stats.incr('active_connections')
+        try:
+            self.serve(reader)
+        finally:
+            stats.incr('active_connections', -1)
+            self.connection.close()
+            logging.info(f"Connection with {self.address} ended.")
+
+    def serve(self, reader, until_idle=False):
+        """
+        Memproses request sampai koneksi ditutup atau error. Dengan until_idle
+        (front end selector) berhenti begitu tidak ada frame siap di buffer dan
+        mengembalikan True: koneksi masih terbuka dan kembali ke front end.
+        """
         try:
-            self.connection.settimeout(120) # Timeout for individual connection operations
-            while True:
-                data = self.connection.recv(16384) # Increased buffer size
-                if not data: # Connection closed by client
+            self.connection.settimeout(self.timeout) # Timeout for individual connection operations
+            while not until_idle or reader.frame_ready(DISPATCH_BYTES):
+                reader.start_rate_window()
+                if not self.fp_protocol.proses_request(reader, self.connection): # Connection closed by client
                     logging.info(f"Connection closed by {self.address}")
                     break
-                try:
-                    buffer += data.decode() # Assuming UTF-8
-                except UnicodeDecodeError as e:
-                    logging.error(f"UnicodeDecodeError from {self.address}: {e}. Buffer: {buffer[:100]}...")
-                    break
-                
-                while "\r\n\r\n" in buffer:
-                    command_to_process, buffer = buffer.split("\r\n\r\n", 1)
-                    # logging.debug(f"Processing command from {self.address}: {command_to_process.split(' ')[0]}")
-                    
-                    hasil_json_str = self.fp_protocol.proses_string(command_to_process)
-                    
-                    response_to_send = hasil_json_str + "\r\n\r\n"
-                    self.connection.sendall(response_to_send.encode())
-                    # logging.debug(f"Sent response to {self.address} for {command_to_process.split(' ')[0]}")
-
+            else:
+                return True
+        except SlowClient as e:
+            self._connection_error('slow_client')
+            logging.warning(f"Slow client {self.address}: {e}")
         except socket.timeout:
+            self._connection_error('timeout')
             logging.warning(f"Socket timeout for client {self.address}.")
+        except FrameTooLarge as e:
+            self._connection_error('frame_too_large')
+            logging.warning(f"Oversized request from {self.address}: {e}")
+            try:
+                self.connection.sendall((json.dumps(dict(status='ERROR', data=str(e))) + "\r\n\r\n").encode())
+            except OSError:
+                pass
+        except UnicodeDecodeError as e:
+            self._connection_error('unicode')
+            logging.error(f"UnicodeDecodeError from {self.address}: {e}. Frame: {e.object[:100]}...")
+        except ConnectionAbortedError as e:
+            self._connection_error('aborted')
+            logging.warning(f"Aborted binary transfer with client {self.address}: {e}")
         except ConnectionResetError:
+            self._connection_error('reset')
             logging.warning(f"Connection reset by client {self.address}.")
         except BrokenPipeError:
+            self._connection_error('broken_pipe')
             logging.warning(f"Broken pipe with client {self.address}.")
         except Exception as e:
+            self._connection_error('other')
             # Log full traceback for unexpected errors in worker threads
             logging.error(f"Unexpected error processing client {self.address}: {e}", exc_info=True)
-        finally:
-            self.connection.close()
-            logging.info(f"Connection with {self.address} ended.")
+        return False
 
 
 class Server(threading.Thread):
-    def __init__(self,ipaddress='0.0.0.0',port=6665, max_workers=None): # Default port changed
+    def __init__(self,ipaddress='0.0.0.0',port=6665, max_workers=None, use_sendfile=False, max_frame_size=DEFAULT_MAX_FRAME_SIZE, cache_bytes=0, metrics_port=None,
+                 max_pending=0, max_per_client=0, admission_policy='reject',
+                 frontend=False, idle_timeout=DEFAULT_IDLE_TIMEOUT, header_timeout=DEFAULT_HEADER_TIMEOUT, client_timeout=DEFAULT_CLIENT_TIMEOUT, min_rate=0,
+                 dedup=False): # Default port changed
         super().__init__()
         self.ipinfo=(ipaddress,port)
         self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -84,33 +120,112 @@ class Server(threading.Thread):
         # With os.chdir('files') in FileInterface, having one FileProtocol instance
         # for all threads is generally fine because all threads share the CWD.
         # The FileInterface methods are then operating within that 'files' dir.
-        self.fp_protocol_main_instance = FileProtocol()
+        self.max_frame_size = max_frame_size
+        self.client_timeout = client_timeout
+        self.min_rate = min_rate
+        self.use_frontend = frontend
+        self.idle_timeout = idle_timeout
+        self.header_timeout = header_timeout
+        self.frontend = None # SelectorFrontEnd
+        self.stats = ServerStats(commands=METRIC_COMMANDS, timers=('queue_wait',))
+        self.admission = AdmissionControl(max_pending, max_per_client, admission_policy, stats=self.stats)
+        self.stats.register_gauge('admission_pending', lambda: self.admission.pending)
+        self.stats.register_gauge('executor_threads', lambda: self.max_workers)
+        # Koneksi yang sudah di-accept tapi belum dapat worker thread
+        self.stats.register_gauge('executor_queue_depth', lambda: self.executor._work_queue.qsize() if self.executor else 0)
+        # Koneksi idle / header belum lengkap yang dipegang front end, tanpa worker thread
+        self.stats.register_gauge('frontend_connections', lambda: self.frontend.connections if self.frontend else 0)
+        self.metrics_port = metrics_port
+        self.metrics_listener = None
+        self.cache_bytes = cache_bytes
+        self.fp_protocol_main_instance = FileProtocol(use_sendfile=use_sendfile, stats=self.stats, cache_bytes=cache_bytes, dedup=dedup)
 
 
     # This method will be the target for executor.submit
-    def process_connection_task(self, connection, address):
-        # Each task (client connection) uses the shared fp_protocol_main_instance
-        client_processor = ProcessTheClient(connection, address, self.fp_protocol_main_instance)
-        client_processor.run()
+    def process_connection_task(self, connection, address, accepted_at):
+        waited = self.admission.started(accepted_at)
+        if waited > 1.0:
+            logging.warning(f"Connection from {address} waited {waited:.2f}s for a worker thread.")
+        try:
+            # Each task (client connection) uses the shared fp_protocol_main_instance
+            client_processor = ProcessTheClient(connection, address, self.fp_protocol_main_instance, self.max_frame_size, self.client_timeout, self.min_rate)
+            client_processor.run()
+        finally:
+            self.admission.finished(address[0])
+
+    def dispatch_ready(self, conn):
+        # Dipanggil thread front end saat frame request conn sudah lengkap
+        rejected = self.admission.admit(conn.address[0])
+        if rejected:
+            self.reject_connection(conn.connection, conn.address, rejected)
+            self.frontend.close(conn)
+            return
+        self.executor.submit(self.process_ready_task, conn, time.perf_counter())
+
+    def process_ready_task(self, conn, dispatched_at):
+        self.admission.started(dispatched_at)
+        keep = False
+        try:
+            client_processor = ProcessTheClient(conn.connection, conn.address, self.fp_protocol_main_instance, self.max_frame_size, self.client_timeout, self.min_rate)
+            keep = client_processor.serve(conn.reader, until_idle=True)
+        finally:
+            self.admission.finished(conn.address[0])
+            if keep:
+                self.frontend.resume(conn)
+            else:
+                self.frontend.close(conn)
+
+    def reject_connection(self, connection, address, reason):
+        # Dijawab langsung dari thread accept tanpa membaca request; client melihat status BUSY
+        logging.warning(f"MainThread: Rejecting connection from {address} ({reason}).")
+        try:
+            connection.settimeout(1.0)
+            self.stats.incr('bytes_sent', send_chunks(connection, json_codec.encode_response(self.admission.busy_response(reason))))
+            connection.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        finally:
+            connection.close()
     
     def run(self):
-        logging.warning(f"MTPool Server starting on {self.ipinfo}, max worker threads: {self.max_workers}")
+        logging.warning(
+            f"MTPool Server starting on {self.ipinfo}, max worker threads: {self.max_workers}, sendfile: {self.fp_protocol_main_instance.use_sendfile}, cache_bytes: {self.cache_bytes}, "
+            f"max_pending: {self.admission.max_pending or 'unlimited'} ({self.admission.policy}), max_per_client: {self.admission.max_per_client or 'unlimited'}, "
+            f"frontend: {self.use_frontend}, client_timeout: {self.client_timeout}, min_rate: {self.min_rate}, dedup: {self.fp_protocol_main_instance.file.blobs is not None}"
+        )
         self.my_socket.bind(self.ipinfo)
         self.my_socket.listen(128) # Increased backlog
         self.my_socket.settimeout(1.0) # For non-blocking accept to check shutdown_event
 
         try:
+            if self.metrics_port:
+                self.metrics_listener = start_metrics_listener(self.ipinfo[0], self.metrics_port, self.fp_protocol_main_instance.stats_snapshot)
             # Context manager for ThreadPoolExecutor ensures shutdown
             with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
                 self.executor = executor
                 logging.info(f"ThreadPoolExecutor started with up to {self.max_workers} worker threads.")
-                
+
+                if self.use_frontend:
+                    # Accept dan pembacaan header di satu thread selector; worker hanya menerima frame lengkap
+                    self.frontend = SelectorFrontEnd(
+                        self.my_socket, self.dispatch_ready, stats=self.stats, max_frame_size=self.max_frame_size,
+                        idle_timeout=self.idle_timeout, header_timeout=self.header_timeout, min_rate=self.min_rate,
+                        has_capacity=self.admission.has_capacity,
+                    )
+                    self.frontend.serve_forever(self.shutdown_event)
+
                 while not self.shutdown_event.is_set():
                     try:
+                        if not self.admission.wait_for_capacity(1.0):
+                            continue # Queue still full (delay policy), check shutdown_event
                         connection, client_address = self.my_socket.accept()
                         logging.info(f"MainThread: Accepted connection from {client_address}")
+                        rejected = self.admission.admit(client_address[0])
+                        if rejected:
+                            self.reject_connection(connection, client_address, rejected)
+                            continue
                         # Submit the client processing task to the executor
-                        self.executor.submit(self.process_connection_task, connection, client_address)
+                        self.executor.submit(self.process_connection_task, connection, client_address, time.perf_counter())
                     except socket.timeout:
                         continue # To check shutdown_event
                     except OSError as e:
@@ -133,6 +248,9 @@ class Server(threading.Thread):
                  self.executor.shutdown(wait=True) # Ensure threads complete ongoing tasks
 
             self.my_socket.close()
+            if self.metrics_listener is not None:
+                self.metrics_listener.shutdown()
+            logging.warning(f"MT Server: Transfer counters: {self.stats.snapshot()}")
             logging.warning("MT Server: Listening socket closed. Shutdown complete.")
 
 
@@ -145,6 +263,19 @@ def main():
     parser.add_argument('--ip', type=str, default='0.0.0.0', help='IP address to bind the server to')
     parser.add_argument('--port', type=int, default=6665, help='Port to bind the server to')
     parser.add_argument('--workers', type=int, default=None, help='Number of worker threads in the server pool (default: 5 * CPU cores)')
+    parser.add_argument('--sendfile', action='store_true', help='Send GETB file bodies with socket.sendfile (zero-copy from page cache)')
+    parser.add_argument('--max_frame_size', type=int, default=DEFAULT_MAX_FRAME_SIZE, help='Maximum size in bytes of one request frame (text commands incl. base64 UPLOAD payload)')
+    parser.add_argument('--cache_bytes', type=int, default=0, help='Byte budget of the in-memory LRU cache of GET/GETB file contents (0 disables it)')
+    parser.add_argument('--metrics_port', type=int, default=None, help='Serve Prometheus text metrics (same data as STATS) over HTTP on this port')
+    parser.add_argument('--max_pending', type=int, default=0, help='Max accepted connections waiting for a worker thread (0 = unlimited)')
+    parser.add_argument('--max_per_client', type=int, default=0, help='Max concurrent (queued + running) connections per client IP, with --frontend requests, extra ones get BUSY (0 = unlimited)')
+    parser.add_argument('--admission', type=str, default='reject', choices=list(POLICIES), help='When --max_pending is reached: reject (reply BUSY and close) or delay (stop accepting, leave clients in the listen backlog)')
+    parser.add_argument('--frontend', action='store_true', help='Hold connections in a selector thread and hand them to a worker thread only once a complete request frame is buffered (idle/slow clients do not occupy workers)')
+    parser.add_argument('--idle_timeout', type=float, default=DEFAULT_IDLE_TIMEOUT, help='With --frontend: close connections idle between requests after this many seconds')
+    parser.add_argument('--header_timeout', type=float, default=DEFAULT_HEADER_TIMEOUT, help='With --frontend: a started request frame must be complete within this many seconds')
+    parser.add_argument('--client_timeout', type=float, default=DEFAULT_CLIENT_TIMEOUT, help='Socket timeout in seconds for reads/writes inside a worker (without --frontend also the idle timeout)')
+    parser.add_argument('--min_rate', type=int, default=0, help='Minimum request upload rate in bytes/s once a request has started; slower clients are dropped (0 disables it)')
+    parser.add_argument('--dedup', action='store_true', help='Content-addressed storage: identical uploads are stored once (SHA-256 blobs hardlinked under each name), enables HAVE')
     parser.add_argument('--loglevel', type=str, default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='Logging level')
     args = parser.parse_args()
 
@@ -160,7 +291,10 @@ def main():
         os.makedirs('files')
         logging.info("Created 'files' directory for server storage.")
 
-    svr = Server(ipaddress=args.ip, port=args.port, max_workers=args.workers)
+    svr = Server(ipaddress=args.ip, port=args.port, max_workers=args.workers, use_sendfile=args.sendfile, max_frame_size=args.max_frame_size, cache_bytes=args.cache_bytes, metrics_port=args.metrics_port,
+                 max_pending=args.max_pending, max_per_client=args.max_per_client, admission_policy=args.admission,
+                 frontend=args.frontend, idle_timeout=args.idle_timeout, header_timeout=args.header_timeout, client_timeout=args.client_timeout, min_rate=args.min_rate,
+                 dedup=args.dedup)
     svr.start()
 
     try:
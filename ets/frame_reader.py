@@ -0,0 +1,249 @@
+"""
+* class FrameReader membaca request dari socket dalam bentuk bytes dan
+memotongnya per frame yang diakhiri delimiter "\r\n\r\n"
+
+* buffer berupa bytearray, data baru dari recv_into ditambahkan di belakang
+dan pencarian delimiter hanya dilakukan pada bytes yang baru masuk, sehingga
+request besar (misal UPLOAD 100MB base64) diproses linear, bukan kuadratik
+
+* ukuran frame dibatasi max_frame_size, frame yang lebih besar menghasilkan
+FrameTooLarge
+
+* min_rate (bytes/detik, 0 = mati): sejak byte pertama sebuah request
+(start_rate_window), client yang mengirim lebih lambat dari min_rate setelah
+MIN_RATE_GRACE_S detik menghasilkan SlowClient, supaya client lambat
+(slowloris) tidak menahan worker lebih lama dari perlu
+
+* fill dan frame_ready dipakai front end selector (connection_frontend):
+buffer diisi dari socket non-blocking sampai satu frame lengkap, baru
+koneksi diserahkan ke worker
+
+* class AsyncFrameReader adalah versi asyncio (di atas asyncio.StreamReader)
+dengan method yang sama namun berupa coroutine
+"""
+import asyncio
+import time
+
+DELIMITER = b"\r\n\r\n"
+RECV_SIZE = 64 * 1024
+DEFAULT_MAX_FRAME_SIZE = 256 * 1024 * 1024
+MIN_RATE_GRACE_S = 5.0
+
+class FrameTooLarge(Exception):
+    pass
+
+class SlowClient(Exception):
+    pass
+
+class FrameReader:
+    def __init__(self, connection, max_frame_size=DEFAULT_MAX_FRAME_SIZE, delimiter=DELIMITER, recv_size=RECV_SIZE, min_rate=0):
+        self.connection = connection
+        self.max_frame_size = max_frame_size
+        self.delimiter = delimiter
+        self.min_rate = min_rate
+        self._buffer = bytearray()
+        self._scan_from = 0
+        self._scratch = bytearray(recv_size)
+        self._scratch_view = memoryview(self._scratch)
+        self._received = 0
+        self._rate_started = None
+        self._rate_bytes = 0
+
+    def _recv_more(self):
+        n = self.connection.recv_into(self._scratch)
+        if n:
+            self._buffer += self._scratch_view[:n]
+            self._count(n)
+        return n
+
+    def _count(self, n):
+        self._received += n
+        if not self.min_rate:
+            return
+        now = time.monotonic()
+        if self._rate_started is None:
+            self._rate_started = now
+        self._rate_bytes += n
+        elapsed = now - self._rate_started
+        if elapsed > MIN_RATE_GRACE_S and self._rate_bytes < self.min_rate * elapsed:
+            raise SlowClient(f"Client sent {self._rate_bytes} bytes in {elapsed:.1f}s, below minimum rate {self.min_rate} B/s.")
+
+    def start_rate_window(self):
+        """Awal request baru: jendela min_rate dimulai lagi pada byte berikutnya (waktu idle tidak dihitung)."""
+        self._rate_started = None
+        self._rate_bytes = 0
+
+    def fill(self):
+        """Satu kali recv ke buffer (socket non-blocking dari front end); 0 berarti koneksi ditutup."""
+        return self._recv_more()
+
+    def frame_ready(self, min_bytes):
+        """True bila buffer berisi satu frame lengkap atau sudah mencapai min_bytes (request besar/streaming)."""
+        if len(self._buffer) >= min_bytes or self._buffer.find(self.delimiter, self._scan_from) >= 0:
+            return True
+        # Sama seperti read_frame: header yang masuk sedikit demi sedikit tidak di-scan ulang dari awal
+        self._scan_from = max(0, len(self._buffer) - len(self.delimiter) + 1)
+        return False
+
+    @property
+    def buffered(self):
+        return len(self._buffer)
+
+    def take_bytes_received(self):
+        """Jumlah bytes yang diterima dari socket sejak pemanggilan sebelumnya (untuk counter bytes_received)."""
+        n, self._received = self._received, 0
+        return n
+
+    def read_frame(self):
+        """
+        Mengembalikan satu frame (tanpa delimiter) sebagai bytes, atau None bila
+        koneksi ditutup. Bytes yang belum lengkap saat koneksi ditutup dibuang.
+        """
+        while True:
+            idx = self._buffer.find(self.delimiter, self._scan_from)
+            if idx >= 0:
+                frame = bytes(self._buffer[:idx])
+                del self._buffer[:idx + len(self.delimiter)]
+                self._scan_from = 0
+                return frame
+            # Delimiter bisa terpotong di antara dua recv, mundur len(delimiter)-1
+            self._scan_from = max(0, len(self._buffer) - len(self.delimiter) + 1)
+            if len(self._buffer) > self.max_frame_size:
+                raise FrameTooLarge(f"Request frame exceeds {self.max_frame_size} bytes without delimiter.")
+            if not self._recv_more():
+                return None
+
+    def peek(self, size):
+        """
+        Mengembalikan (tanpa mengonsumsi) sampai `size` bytes awal dari frame
+        berikutnya. Berhenti lebih awal bila delimiter sudah ada di buffer atau
+        koneksi ditutup; b"" berarti koneksi ditutup tanpa data.
+        """
+        while len(self._buffer) < size and self._buffer.find(self.delimiter) < 0:
+            if not self._recv_more():
+                break
+        return bytes(self._buffer[:size])
+
+    def iter_frame(self):
+        """
+        Generator yang mengeluarkan isi frame saat ini per potongan (kira-kira
+        sebesar recv_size) sampai delimiter, tanpa menampung seluruh frame.
+        max_frame_size tidak berlaku di sini karena memori dibatasi ukuran potongan.
+        Generator harus dihabiskan agar stream tetap sinkron.
+        """
+        keep = len(self.delimiter) - 1
+        while True:
+            idx = self._buffer.find(self.delimiter, self._scan_from)
+            if idx >= 0:
+                if idx:
+                    yield bytes(self._buffer[:idx])
+                del self._buffer[:idx + len(self.delimiter)]
+                self._scan_from = 0
+                return
+            # Sisakan len(delimiter)-1 bytes terakhir, bisa jadi awal delimiter
+            safe = len(self._buffer) - keep
+            if safe > 0:
+                chunk = bytes(self._buffer[:safe])
+                del self._buffer[:safe]
+                self._scan_from = 0
+                yield chunk
+            if not self._recv_more():
+                raise ConnectionResetError("Connection closed in the middle of a request frame.")
+
+    def read_exact(self, size, sink=None):
+        """
+        Membaca tepat `size` bytes body (bukan frame). Bila sink None body
+        dibuang; selain itu ditulis bertahap ke sink.write().
+        """
+        remaining = size
+        if self._buffer:
+            take = min(remaining, len(self._buffer))
+            if sink is not None:
+                sink.write(self._buffer[:take])
+            del self._buffer[:take]
+            self._scan_from = 0
+            remaining -= take
+        while remaining > 0:
+            n = self.connection.recv_into(self._scratch_view[:min(len(self._scratch), remaining)])
+            if not n:
+                raise ConnectionResetError(f"Connection closed with {remaining} body bytes outstanding.")
+            self._count(n)
+            if sink is not None:
+                sink.write(self._scratch_view[:n])
+            remaining -= n
+
+
+class AsyncFrameReader:
+    def __init__(self, stream, max_frame_size=DEFAULT_MAX_FRAME_SIZE, delimiter=DELIMITER, recv_size=RECV_SIZE, timeout=None):
+        self.stream = stream
+        self.max_frame_size = max_frame_size
+        self.delimiter = delimiter
+        self.recv_size = recv_size
+        self.timeout = timeout
+        self._buffer = bytearray()
+        self._scan_from = 0
+
+    async def _recv_more(self, size=None):
+        data = await asyncio.wait_for(self.stream.read(size or self.recv_size), self.timeout)
+        if data:
+            self._buffer += data
+        return len(data)
+
+    async def read_frame(self):
+        while True:
+            idx = self._buffer.find(self.delimiter, self._scan_from)
+            if idx >= 0:
+                frame = bytes(self._buffer[:idx])
+                del self._buffer[:idx + len(self.delimiter)]
+                self._scan_from = 0
+                return frame
+            self._scan_from = max(0, len(self._buffer) - len(self.delimiter) + 1)
+            if len(self._buffer) > self.max_frame_size:
+                raise FrameTooLarge(f"Request frame exceeds {self.max_frame_size} bytes without delimiter.")
+            if not await self._recv_more():
+                return None
+
+    async def peek(self, size):
+        while len(self._buffer) < size and self._buffer.find(self.delimiter) < 0:
+            if not await self._recv_more():
+                break
+        return bytes(self._buffer[:size])
+
+    async def iter_frame(self):
+        keep = len(self.delimiter) - 1
+        while True:
+            idx = self._buffer.find(self.delimiter, self._scan_from)
+            if idx >= 0:
+                if idx:
+                    yield bytes(self._buffer[:idx])
+                del self._buffer[:idx + len(self.delimiter)]
+                self._scan_from = 0
+                return
+            safe = len(self._buffer) - keep
+            if safe > 0:
+                chunk = bytes(self._buffer[:safe])
+                del self._buffer[:safe]
+                self._scan_from = 0
+                yield chunk
+            if not await self._recv_more():
+                raise ConnectionResetError("Connection closed in the middle of a request frame.")
+
+    async def read_chunks(self, size):
+        """
+        Async generator untuk body biner sepanjang `size` bytes, per potongan.
+        Harus dihabiskan agar stream tetap sinkron.
+        """
+        remaining = size
+        if self._buffer:
+            take = min(remaining, len(self._buffer))
+            chunk = bytes(self._buffer[:take])
+            del self._buffer[:take]
+            self._scan_from = 0
+            remaining -= take
+            yield chunk
+        while remaining > 0:
+            data = await asyncio.wait_for(self.stream.read(min(self.recv_size, remaining)), self.timeout)
+            if not data:
+                raise ConnectionResetError(f"Connection closed with {remaining} body bytes outstanding.")
+            remaining -= len(data)
+            yield data
@@ -1,13 +1,47 @@
 import argparse
 import csv
 import logging
+import multiprocessing
 import time
 import os
 import subprocess
 import signal
 
+import compression
 import file_client_stresstest
-from file_client_stresstest import run_test_batch, remote_list, FILENAME_MAP
+from process_sampler import ProcessTreeSampler, SAMPLE_INTERVAL
+from file_client_stresstest import run_test_batch, remote_list, remote_stats, parse_duration, FILENAME_MAP, DOWNLOAD_SINKS, ARRIVAL_MODES
+
+# Kolom CSV latensi (detik) -> key hasil run_test_batch; pool server diukur terhadap p99, bukan rata-rata
+LATENCY_CSV_COLUMNS = [
+    ("Latency p50 (s)", "latency_p50_s"),
+    ("Latency p90 (s)", "latency_p90_s"),
+    ("Latency p99 (s)", "latency_p99_s"),
+    ("Latency p99.9 (s)", "latency_p999_s"),
+    ("Latency max (s)", "latency_max_s"),
+    ("Queue p50 (s)", "queue_p50_s"),
+    ("Queue p99 (s)", "queue_p99_s"),
+    ("Connect p50 (s)", "connect_p50_s"),
+    ("Connect p99 (s)", "connect_p99_s"),
+    ("TTFB p50 (s)", "ttfb_p50_s"),
+    ("TTFB p99 (s)", "ttfb_p99_s"),
+    ("Transfer p50 (s)", "transfer_p50_s"),
+    ("Transfer p99 (s)", "transfer_p99_s"),
+]
+
+# Kolom CSV resource proses server (beserta turunannya) selama batch -> (key summary ProcessTreeSampler, pembagi)
+SERVER_RESOURCE_CSV_COLUMNS = [
+    ("Server CPU mean (%)", "cpu_pct_mean", 1),
+    ("Server CPU peak (%)", "cpu_pct_peak", 1),
+    ("Server RSS mean (MB)", "rss_bytes_mean", 1024 * 1024),
+    ("Server RSS peak (MB)", "rss_bytes_peak", 1024 * 1024),
+    ("Server Ctx Switches mean (/s)", "ctx_switches_per_sec_mean", 1),
+    ("Server Ctx Switches peak (/s)", "ctx_switches_per_sec_peak", 1),
+    ("Server FDs mean", "fds_mean", 1),
+    ("Server FDs peak", "fds_peak", 1),
+    ("Server Threads mean", "threads_mean", 1),
+    ("Server Threads peak", "threads_peak", 1),
+]
 
 FILE_SIZES_MB_REPORTING = {
     "10MB": 10,
@@ -39,14 +73,21 @@ def ensure_dummy_files():
             logging.info(f"Dummy file '{filename}' for {key} already exists.")
 
 
-def start_server(server_script_name, ip, port, workers, log_level="INFO"):
+def _server_preexec(cpus):
+    def preexec():
+        os.setsid()
+        if cpus:
+            os.sched_setaffinity(0, cpus)
+    return preexec
+
+def start_server(server_script_name, ip, port, workers, log_level="INFO", extra_args=None, cpus=None):
     cmd = [
         "python3", server_script_name,
         "--ip", ip,
         "--port", str(port),
         "--workers", str(workers),
         "--loglevel", log_level
-    ]
+    ] + list(extra_args or [])
     logging.info(f"GridSearch: Starting server: {' '.join(cmd)}")
 
     server_stdout_log = f"server_{server_script_name.split('.')[0]}_w{workers}_p{port}.stdout.log"
@@ -60,7 +101,7 @@ def start_server(server_script_name, ip, port, workers, log_level="INFO"):
             cmd,
             stdout=stdout_file,
             stderr=stderr_file, 
-            preexec_fn=os.setsid if os.name != "nt" else None 
+            preexec_fn=_server_preexec(cpus) if os.name != "nt" else None 
         )
         server_process.stdout_file = stdout_file
         server_process.stderr_file = stderr_file
@@ -103,6 +144,19 @@ def check_server_readiness(server_process, server_ip, server_port, timeout_sec=3
     return ready
 
 
+def fetch_server_counters(server_ip, server_port):
+    original_client_target_address = file_client_stresstest.server_address
+    file_client_stresstest.server_address = (server_ip, server_port)
+    try:
+        ok, response = remote_stats()
+    finally:
+        file_client_stresstest.server_address = original_client_target_address
+    if not ok:
+        logging.warning(f"GridSearch: Could not fetch server counters: {response.get('data')}")
+        return {}
+    return response.get('data', {})
+
+
 def stop_server(server_process, timeout_sec=15): # Increased timeout
     if server_process is None or server_process.poll() is not None:
         if hasattr(server_process, 'stdout_file') and server_process.stdout_file:
@@ -144,21 +198,319 @@ def stop_server(server_process, timeout_sec=15): # Increased timeout
             if not server_process.stderr_file.closed: server_process.stderr_file.close()
 
 
+# Kolom yang mengidentifikasi satu konfigurasi test; baris CSV dengan nilai yang sama dianggap sudah selesai saat resume
+CONFIG_COLUMNS = [
+    "Server Type", "Operasi", "Volume (MB)",
+    "Client Concurrency Mode", "Transfer Mode", "Persistent Connections", "Pipeline Depth", "Download Sink", "Parallel Ranges", "Parallel Parts",
+    "Dedup (HAVE)", "Compression", "Verify Checksums",
+    "Jumlah client worker pool", "Jumlah server worker pool", "Total Ops",
+    "Offered Rate (ops/s)", "Arrival Process", "Open-loop Duration (s)", "Ramp-up (s)", "Server Sendfile", "Server Cache Bytes",
+]
+
+RESULT_FIELD_NAMES = [
+    "Nomor", "Server Type", "Operasi", "Volume (MB)",
+    "Client Concurrency Mode", "Transfer Mode", "Persistent Connections", "Pipeline Depth", "Download Sink", "Parallel Ranges", "Parallel Parts",
+    "Dedup (HAVE)", "Compression", "Verify Checksums",
+    "Jumlah client worker pool", "Jumlah server worker pool", "Total Ops",
+    "Waktu total per client (avg s)", "Throughput per client (avg MBps)",
+    "Jumlah worker client yang sukses", "Jumlah worker client yang gagal",
+    "Jumlah worker server yang sukses", "Jumlah worker server yang gagal",
+    "Batch Wall Time (s)", "Ops per Second", "Offered Rate (ops/s)", "Arrival Process", "Open-loop Duration (s)", "Ramp-up (s)", "Late Dispatches", "Queued Dispatches",
+    "Server Sendfile", "Server Bytes Sent", "Server Bytes Sent via Sendfile",
+    "Server Cache Bytes", "Server Cache Hits", "Server Cache Misses",
+] + [column for column, _ in LATENCY_CSV_COLUMNS] + [column for column, _, _ in SERVER_RESOURCE_CSV_COLUMNS]
+
+SERVER_SCRIPT_MAP = {
+    "mtpool": "file_server_mtpool.py",
+    "mppool": "file_server_mppool.py",
+    "asyncio": "file_server_asyncio.py"
+}
+
+def config_key(row):
+    return tuple(str(row[column]) for column in CONFIG_COLUMNS)
+
+
+class ResultsCSV:
+    """
+    File CSV hasil yang ditulis per baris begitu satu test selesai (append +
+    flush), sehingga orchestrator yang berhenti di tengah jalan tidak
+    kehilangan hasil sebelumnya dan bisa dilanjutkan (resume). lock
+    (multiprocessing.Lock) dipakai bersama oleh semua slot server paralel.
+    """
+    def __init__(self, path, lock, field_names=RESULT_FIELD_NAMES):
+        self.path = path
+        self.lock = lock
+        self.field_names = field_names
+
+    def load(self):
+        """Mengembalikan (set config_key yang sudah selesai, Nomor terbesar)."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return set(), 0
+        with open(self.path, newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            if reader.fieldnames != self.field_names:
+                raise ValueError(f"CSV header of {self.path} does not match the current result columns")
+            rows = list(reader)
+        completed = {config_key(row) for row in rows}
+        last_number = max((int(row["Nomor"]) for row in rows if row["Nomor"].isdigit()), default=0)
+        return completed, last_number
+
+    def set_aside(self):
+        backup = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}.bak"
+        os.replace(self.path, backup)
+        return backup
+
+    def append(self, row):
+        with self.lock:
+            with open(self.path, 'a', newline='') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=self.field_names, extrasaction='ignore')
+                if csvfile.tell() == 0:
+                    writer.writeheader()
+                writer.writerow(row)
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+
+
+def client_test_configs(args, server_type_key, num_server_workers):
+    """Semua kombinasi client untuk satu konfigurasi server: (vol_key, dict kolom CONFIG_COLUMNS)."""
+    for op_type in args.operations_grid.split(','):
+        # LIST does not depend on the volume, run it once per client worker setting
+        volumes = args.volumes_grid.split(',')
+        for vol_key in (volumes if op_type != 'list' else volumes[:1]):
+            if vol_key not in FILENAME_MAP:
+                logging.warning(f"GridSearch: Skipping volume '{vol_key}' as it's not in FILENAME_MAP.")
+                continue
+            for num_client_w in [int(x) for x in args.client_workers_grid.split(',')]:
+                yield vol_key, {
+                    "Server Type": server_type_key,
+                    "Operasi": op_type,
+                    "Volume (MB)": FILE_SIZES_MB_REPORTING.get(vol_key, "N/A") if op_type != 'list' else 0,
+                    "Client Concurrency Mode": args.client_concurrency_mode,
+                    "Transfer Mode": args.transfer_mode,
+                    "Persistent Connections": args.persistent,
+                    "Pipeline Depth": args.pipeline,
+                    "Download Sink": args.download_sink,
+                    "Parallel Ranges": args.parallel_ranges,
+                    "Parallel Parts": args.parallel_parts,
+                    "Dedup (HAVE)": args.dedup,
+                    "Compression": args.compress,
+                    "Verify Checksums": not args.no_verify,
+                    "Jumlah client worker pool": num_client_w,
+                    "Jumlah server worker pool": num_server_workers,
+                    # Default satu op per client worker (dikali kedalaman pipeline)
+                    "Total Ops": args.total_ops_per_config or num_client_w * max(1, args.pipeline),
+                    "Offered Rate (ops/s)": args.rate if args.rate and args.rate > 0 else 0,
+                    "Arrival Process": args.arrival,
+                    "Open-loop Duration (s)": args.duration or 0,
+                    "Ramp-up (s)": args.ramp_up,
+                    "Server Sendfile": args.server_sendfile,
+                    "Server Cache Bytes": args.server_cache_bytes,
+                }
+
+
+def run_client_test(args, port, vol_key, config, number, server_pid=None):
+    op_type = config["Operasi"]
+    num_client_w = config["Jumlah client worker pool"]
+    logging.info(f"--- Grid Test Run ID: {number} ---")
+    logging.info(
+        f"Config: ServerType={config['Server Type']}, ServerWorkers={config['Jumlah server worker pool']}, Op={op_type}, Vol={vol_key}, "
+        f"ClientWorkers={num_client_w}, TotalOpsBatch={config['Total Ops']}, ClientMode={args.client_concurrency_mode}, TransferMode={args.transfer_mode}, Port={port}"
+    )
+
+    counters_before = fetch_server_counters(args.server_ip, port)
+    sampler = ProcessTreeSampler(server_pid, interval=args.sample_interval)
+    with sampler:
+        batch_summary = run_test_batch(
+            p_server_ip=args.server_ip,
+            p_server_port=port,
+            p_action=op_type,
+            p_file_key=vol_key,
+            p_num_client_workers=num_client_w,
+            p_total_ops=config["Total Ops"],
+            p_client_pool_mode=args.client_concurrency_mode,
+            p_transfer_mode=args.transfer_mode,
+            p_persistent=args.persistent,
+            p_pipeline_depth=args.pipeline,
+            p_download_sink=args.download_sink,
+            p_parallel_ranges=args.parallel_ranges,
+            p_parallel_parts=args.parallel_parts,
+            p_dedup=args.dedup,
+            p_compress=args.compress,
+            p_verify=not args.no_verify,
+            p_rate=args.rate,
+            p_duration_s=args.duration,
+            p_arrival=args.arrival,
+            p_ramp_up_s=args.ramp_up
+        )
+    resource_summary = sampler.summary()
+
+    counters_after = fetch_server_counters(args.server_ip, port)
+    server_bytes_sent = counters_after.get('bytes_sent', 0) - counters_before.get('bytes_sent', 0)
+    server_bytes_sendfile = counters_after.get('bytes_sent_sendfile', 0) - counters_before.get('bytes_sent_sendfile', 0)
+    server_cache_hits = counters_after.get('cache_hits', 0) - counters_before.get('cache_hits', 0)
+    server_cache_misses = counters_after.get('cache_misses', 0) - counters_before.get('cache_misses', 0)
+
+    throughput_MBps = batch_summary['avg_op_throughput_Bps'] / (1024 * 1024) if batch_summary['avg_op_throughput_Bps'] is not None else 0.0
+    avg_op_duration = batch_summary['avg_op_duration_s'] if batch_summary['avg_op_duration_s'] is not None else 0.0
+
+    row = {
+        "Nomor": number,
+        **config,
+        "Waktu total per client (avg s)": f"{avg_op_duration:.4f}",
+        "Throughput per client (avg MBps)": f"{throughput_MBps:.4f}",
+        "Jumlah worker client yang sukses": batch_summary['ops_successful'],
+        "Jumlah worker client yang gagal": batch_summary['ops_failed'],
+        "Jumlah worker server yang sukses": batch_summary['ops_successful'],
+        "Jumlah worker server yang gagal": batch_summary['ops_failed'],
+        "Batch Wall Time (s)": f"{batch_summary['batch_wall_time_s']:.2f}",
+        "Ops per Second": f"{batch_summary['ops_per_sec']:.1f}",
+        "Late Dispatches": batch_summary['ops_late_dispatch'],
+        "Queued Dispatches": batch_summary['ops_queued_dispatch'],
+        "Server Bytes Sent": server_bytes_sent,
+        "Server Bytes Sent via Sendfile": server_bytes_sendfile,
+        "Server Cache Hits": server_cache_hits,
+        "Server Cache Misses": server_cache_misses,
+        **{column: f"{batch_summary[key]:.4f}" for column, key in LATENCY_CSV_COLUMNS},
+        **{column: f"{resource_summary[key] / divisor:.1f}" for column, key, divisor in SERVER_RESOURCE_CSV_COLUMNS},
+    }
+    logging.info(
+        f"Result ID {number}: Success={batch_summary['ops_successful']}/{config['Total Ops']}, AvgClientTime={avg_op_duration:.4f}s, AvgClientThr={throughput_MBps:.4f}MBps, "
+        f"ServerCPU mean/peak={resource_summary['cpu_pct_mean']:.0f}/{resource_summary['cpu_pct_peak']:.0f}%, "
+        f"ServerRSS peak={resource_summary['rss_bytes_peak'] / (1024 * 1024):.1f}MB ({resource_summary['samples']} samples)"
+    )
+    return row
+
+
+def run_server_config(args, server_type_key, num_server_workers, port, results, completed, counter, server_cpus=None):
+    """
+    Menjalankan semua kombinasi client yang belum ada di `completed` terhadap satu
+    server (type, workers) di `port`, setiap hasil langsung di-append ke results.
+    counter: multiprocessing.Value Nomor terakhir, dipakai bersama antar slot.
+    """
+    pending = [(vol_key, config) for vol_key, config in client_test_configs(args, server_type_key, num_server_workers)
+               if config_key(config) not in completed]
+    if not pending:
+        logging.info(f"GridSearch: All tests for Server Config Type={server_type_key}, ServerWorkers={num_server_workers} already in {args.output_csv}. Skipping.")
+        return
+
+    server_script = SERVER_SCRIPT_MAP[server_type_key]
+    logging.info(f"----- Preparing for Server Config: Type={server_type_key}, ServerWorkers={num_server_workers}, Port={port}, PendingTests={len(pending)} -----")
+    server_process = start_server(
+        server_script, args.server_ip, port, num_server_workers, args.loglevel,
+        extra_args=(["--sendfile"] if args.server_sendfile else []) + (["--dedup"] if args.dedup else []) + ["--cache_bytes", str(args.server_cache_bytes)],
+        cpus=server_cpus
+    )
+    if not server_process:
+        logging.error(f"GridSearch: Failed to start server {server_script} with {num_server_workers} workers. Skipping this server config.")
+        return
+
+    try:
+        time.sleep(2)
+        if not check_server_readiness(server_process, args.server_ip, port, args.server_startup_wait_max):
+            logging.error(f"GridSearch: Server {server_script} (workers={num_server_workers}) failed to become ready. Stopping it and skipping.")
+            return
+
+        logging.info(f"GridSearch: Server {server_script} (workers={num_server_workers}) is UP on {args.server_ip}:{port}. Proceeding with client tests.")
+        for i, (vol_key, config) in enumerate(pending):
+            if config["Operasi"] == 'upload' and not os.path.exists(FILENAME_MAP[vol_key]):
+                logging.error(
+                    f"GridSearch: PRE-FLIGHT CHECK FAILED for UPLOAD of {vol_key}: "
+                    f"Source file '{FILENAME_MAP[vol_key]}' not found in CWD ({os.getcwd()}). Skipping this test."
+                )
+                continue
+            with counter.get_lock():
+                counter.value += 1
+                number = counter.value
+            results.append(run_client_test(args, port, vol_key, config, number, server_process.pid))
+            if i < len(pending) - 1:
+                logging.info(f"GridSearch: Pausing for {args.pause_between_tests} seconds before next client test combination...")
+                time.sleep(args.pause_between_tests)
+        logging.info(f"----- Finished tests for Server Config: Type={server_type_key}, Workers={num_server_workers} -----")
+    finally:
+        stop_server(server_process)
+        logging.info(f"GridSearch: Waiting {args.pause_between_server_restarts} seconds for server to fully release resources...")
+        time.sleep(args.pause_between_server_restarts)
+
+
+def split_cpus(num_slots):
+    """
+    Membagi CPU yang boleh dipakai proses ini menjadi num_slots kelompok, tiap
+    kelompok dibagi dua: (CPU server, CPU client). Kelompok 1 CPU dipakai bersama.
+    """
+    cpus = sorted(os.sched_getaffinity(0))
+    per_slot = max(1, len(cpus) // num_slots)
+    if len(cpus) < num_slots:
+        logging.warning(f"GridSearch: Only {len(cpus)} CPUs for {num_slots} parallel server slots; slots will share CPUs.")
+    groups = []
+    for slot in range(num_slots):
+        group = cpus[(slot * per_slot) % len(cpus):][:per_slot]
+        half = max(1, len(group) // 2)
+        groups.append((set(group[:half]), set(group[half:] or group)))
+    return groups
+
+
+def pin_slot(slot, cpu_group):
+    """Mem-pin proses ini (dan client run_test_batch yang mewarisinya) ke CPU client slot; mengembalikan CPU server."""
+    if cpu_group is None:
+        return None
+    server_cpus, client_cpus = cpu_group
+    os.sched_setaffinity(0, client_cpus)
+    logging.info(f"GridSearch: Slot {slot} pinned: server CPUs {sorted(server_cpus)}, client CPUs {sorted(client_cpus)}")
+    return server_cpus
+
+
+def server_slot_main(slot, args, port, cpu_group, config_queue, results, completed, counter):
+    """Proses slot paralel: mengambil (server type, workers) dari config_queue sampai bertemu None, di port miliknya sendiri."""
+    logging.basicConfig(
+        level=getattr(logging, args.loglevel.upper()),
+        format=f'%(asctime)s - %(levelname)s - GridOrchestrator[slot {slot}] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        force=True
+    )
+    server_cpus = pin_slot(slot, cpu_group)
+    try:
+        for server_type_key, num_server_workers in iter(config_queue.get, None):
+            run_server_config(args, server_type_key, num_server_workers, port, results, completed, counter, server_cpus)
+    except KeyboardInterrupt:
+        logging.warning(f"GridSearch: Slot {slot} interrupted.")
+
+
 def main():
     parser = argparse.ArgumentParser(description="File Transfer Grid Search Stress Test Orchestrator")
     parser.add_argument('--server_ip', type=str, default='127.0.0.1', help='Server IP address for servers to bind and clients to target.')
-    parser.add_argument('--server_port', type=int, default=6665, help='Base server port (will be incremented if multiple parallel orchestrators run).')
+    parser.add_argument('--server_port', type=int, default=6665, help='Base server port (parallel slot N uses server_port + N).')
 
-    parser.add_argument('--server_type_grid', type=str, default='mtpool,mppool', help='Comma-separated server types: mtpool, mppool')
-    parser.add_argument('--operations_grid', type=str, default='download,upload', help='Comma-separated list: upload,download')
+    parser.add_argument('--server_type_grid', type=str, default='mtpool,mppool', help='Comma-separated server types: mtpool, mppool, asyncio')
+    parser.add_argument('--operations_grid', type=str, default='download,upload', help='Comma-separated list: upload,download,list')
     parser.add_argument('--volumes_grid', type=str, default='10MB,50MB,100MB', help='Comma-separated keys from FILENAME_MAP: 10MB,50MB,100MB')
     parser.add_argument('--client_workers_grid', type=str, default='1,5,50', help='Comma-separated list of client worker pool sizes')
     parser.add_argument('--server_workers_grid', type=str, default='1,5,50', help='Comma-separated list of server worker pool sizes')
-    
-    parser.add_argument('--total_ops_per_config', type=int, default=1, help='Total operations (e.g., 10 uploads) for each specific client test configuration')
+
+    parser.add_argument('--total_ops_per_config', type=int, default=None, help='Total operations (e.g., 10 uploads) for each specific client test configuration (default: one per client worker, times --pipeline)')
     parser.add_argument('--client_concurrency_mode', type=str, default='thread, process', choices=['thread', 'process'], help='Client concurrency mode for all tests in this run (thread or process)')
-    
-    parser.add_argument('--output_csv', type=str, default='stress_test_results_grid.csv', help='CSV file to store all results')
+
+    parser.add_argument('--transfer_mode', type=str, default='text', choices=['text', 'binary'], help='text: GET/UPLOAD base64 JSON, binary: GETB/UPLOADB raw framed bytes')
+
+    parser.add_argument('--persistent', action='store_true', help='Client workers reuse one connection each instead of connecting per command')
+    parser.add_argument('--pipeline', type=int, default=1, help='Outstanding pipelined requests per connection (text list/download only)')
+    parser.add_argument('--download_sink', type=str, default='memory', choices=list(DOWNLOAD_SINKS), help='Client handling of downloaded content: memory, discard (streamed) or disk (streamed)')
+    parser.add_argument('--parallel_ranges', '--parallel-ranges', type=int, default=1, help='Split each download into N concurrently fetched byte ranges')
+    parser.add_argument('--parallel_parts', '--parallel-parts', type=int, default=1, help='Split each upload into N concurrently sent parts (multipart UPLOAD)')
+    parser.add_argument('--server_sendfile', action='store_true', help='Start servers with --sendfile (zero-copy GETB bodies)')
+    parser.add_argument('--dedup', action='store_true', help='Start servers with --dedup and let clients send HAVE <sha256> before each upload')
+    parser.add_argument('--compress', type=str, default='none', choices=['none', 'auto'] + sorted(compression.CODECS), help='Client --compress setting for whole-file downloads')
+    parser.add_argument('--no_verify', action='store_true', help='Clients skip the data_sha256 check of transferred content')
+    parser.add_argument('--server_cache_bytes', type=int, default=0, help='Start servers with --cache_bytes N (in-memory LRU cache of GET/GETB contents, 0 = off)')
+
+    parser.add_argument('--rate', type=float, default=None, help='Open-loop mode: each client config offers R ops/s (client workers are then only the minimum pool size)')
+    parser.add_argument('--duration', type=parse_duration, default=None, help='Open-loop run length per config, e.g. 60s (default: same op count as closed-loop)')
+    parser.add_argument('--arrival', type=str, default='constant', choices=list(ARRIVAL_MODES), help='Open-loop arrival process')
+    parser.add_argument('--ramp_up', '--ramp-up', type=parse_duration, default=0.0, help='Open-loop linear ramp-up per config (part of --duration)')
+    parser.add_argument('--sample_interval', type=float, default=SAMPLE_INTERVAL, help='Seconds between /proc samples of the server process tree (CPU, RSS, ctx switches, fds, threads) during each batch')
+    parser.add_argument('--output_csv', type=str, default='stress_test_results_grid.csv', help='CSV file results are appended to as each test completes')
+    parser.add_argument('--fresh', action='store_true', help='Move an existing --output_csv aside instead of resuming from it (skipping configs already recorded)')
+    parser.add_argument('--parallel_servers', type=int, default=1, help='Run up to N server configs concurrently, each on its own port (server_port + slot)')
+    parser.add_argument('--pin_cpus', action='store_true', help='Pin each parallel slot to its own CPU subset (half for the server, half for its client)')
     parser.add_argument('--loglevel', type=str, default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'])
     parser.add_argument('--server_startup_wait_max', type=int, default=30, help="Max seconds to wait for server readiness.")
     parser.add_argument('--pause_between_tests', type=int, default=3, help="Seconds to pause between client test combinations.")
@@ -166,6 +518,8 @@ def main():
 
 
     args = parser.parse_args()
+    if args.duration is not None and not (args.rate and args.rate > 0):
+        parser.error('--duration only applies to open-loop mode, give --rate as well')
 
     logging.basicConfig(
         level=getattr(logging, args.loglevel.upper()),
@@ -175,154 +529,66 @@ def main():
 
     ensure_dummy_files()
 
-    server_script_map = {
-        "mtpool": "file_server_mtpool.py",
-        "mppool": "file_server_mppool.py"
-    }
+    server_configs = []
+    for server_type_key in args.server_type_grid.split(','):
+        if server_type_key not in SERVER_SCRIPT_MAP:
+            logging.error(f"GridSearch: Unknown server type '{server_type_key}'. Skipping.")
+            continue
+        server_configs.extend((server_type_key, int(w)) for w in args.server_workers_grid.split(','))
 
-    server_types_to_test = args.server_type_grid.split(',')
-    operations_to_test = args.operations_grid.split(',')
-    volumes_to_test = args.volumes_grid.split(',')
-    client_workers_list = [int(x) for x in args.client_workers_grid.split(',')]
-    server_workers_config_list = [int(x) for x in args.server_workers_grid.split(',')]
-
-    all_run_results = []
-    test_run_counter = 0
-    current_server_process = None
-    
-    logging.info(f"Starting grid search. Client Concurrency Mode for this run: {args.client_concurrency_mode}. Total ops per config: {args.total_ops_per_config}")
-    
+    results = ResultsCSV(args.output_csv, multiprocessing.Lock())
+    if args.fresh and os.path.exists(args.output_csv):
+        logging.info(f"GridSearch: --fresh given, moved previous results to {results.set_aside()}")
     try:
-        for server_type_key in server_types_to_test:
-            server_script = server_script_map.get(server_type_key)
-            if not server_script:
-                logging.error(f"GridSearch: Unknown server type '{server_type_key}'. Skipping.")
-                continue
-
-            for num_server_workers in server_workers_config_list:
-                logging.info(f"----- Preparing for Server Config: Type={server_type_key}, ServerWorkers={num_server_workers} -----")
-                
-                if current_server_process and current_server_process.poll() is None:
-                    logging.warning("GridSearch: Found an existing server process. Attempting to stop it before starting a new one.")
-                    stop_server(current_server_process, args.server_startup_wait_max // 2)
-                    time.sleep(2)
+        completed, last_number = results.load()
+    except ValueError as e:
+        logging.warning(f"GridSearch: {e}; moved it to {results.set_aside()} and starting a new results file.")
+        completed, last_number = set(), 0
+    if completed:
+        logging.info(f"GridSearch: Resuming, {len(completed)} completed test configs found in {args.output_csv} (last Nomor {last_number}).")
+    counter = multiprocessing.Value('i', last_number)
+
+    num_slots = max(1, min(args.parallel_servers, len(server_configs)))
+    cpu_groups = split_cpus(num_slots) if args.pin_cpus else [None] * num_slots
+    logging.info(
+        f"Starting grid search. Client Concurrency Mode for this run: {args.client_concurrency_mode}. Total ops per config: {args.total_ops_per_config or 'one per client worker'}. "
+        f"Server configs: {len(server_configs)}, parallel slots: {num_slots}"
+    )
 
-                current_server_process = start_server(
-                    server_script, args.server_ip, args.server_port, num_server_workers, args.loglevel
+    slots = []
+    try:
+        if num_slots == 1:
+            server_cpus = pin_slot(0, cpu_groups[0])
+            for server_type_key, num_server_workers in server_configs:
+                run_server_config(args, server_type_key, num_server_workers, args.server_port, results, completed, counter, server_cpus)
+        else:
+            # Tiap slot adalah proses sendiri: run_test_batch menyimpan target server di global modul client
+            config_queue = multiprocessing.Queue()
+            for server_config in server_configs + [None] * num_slots:
+                config_queue.put(server_config)
+            slots = [
+                multiprocessing.Process(
+                    target=server_slot_main,
+                    args=(slot, args, args.server_port + slot, cpu_groups[slot], config_queue, results, completed, counter),
+                    name=f"GridSlot-{slot}"
                 )
-                if not current_server_process:
-                    logging.error(f"GridSearch: Failed to start server {server_script} with {num_server_workers} workers. Skipping this server config.")
-                    continue
-                
-                time.sleep(2)
-                if not check_server_readiness(current_server_process, args.server_ip, args.server_port, args.server_startup_wait_max):
-                    logging.error(f"GridSearch: Server {server_script} (workers={num_server_workers}) failed to become ready. Stopping it and skipping.")
-                    stop_server(current_server_process)
-                    current_server_process = None
-                    logging.info(f"GridSearch: Pausing for {args.pause_between_server_restarts}s after failed server start...")
-                    time.sleep(args.pause_between_server_restarts)
-                    continue
-                
-                logging.info(f"GridSearch: Server {server_script} (workers={num_server_workers}) is UP on {args.server_ip}:{args.server_port}. Proceeding with client tests.")
-
-                for op_type in operations_to_test:
-                    for vol_key in volumes_to_test:
-                        if vol_key not in FILENAME_MAP:
-                            logging.warning(f"GridSearch: Skipping volume '{vol_key}' as it's not in FILENAME_MAP.")
-                            continue
-
-                        if op_type == 'upload':
-                            expected_local_file = FILENAME_MAP[vol_key]
-                            if not os.path.exists(expected_local_file):
-                                logging.error(
-                                    f"GridSearch: PRE-FLIGHT CHECK FAILED for UPLOAD of {vol_key}: "
-                                    f"Source file '{expected_local_file}' not found in CWD ({os.getcwd()}). "
-                                    f"Skipping client worker iterations for this specific config (Op: {op_type}, Vol: {vol_key})."
-                                )
-                                continue
-                        
-                        for num_client_w in client_workers_list:
-                            test_run_counter += 1
-                            logging.info(f"--- Grid Test Run ID: {test_run_counter} ---")
-                            logging.info(
-                                f"Config: ServerType={server_type_key}, ServerWorkers={num_server_workers}, Op={op_type}, Vol={vol_key}, "
-                                f"ClientWorkers={num_client_w}, TotalOpsBatch={args.total_ops_per_config}, ClientMode={args.client_concurrency_mode}"
-                            )
-                            
-                            batch_summary = run_test_batch(
-                                p_server_ip=args.server_ip,
-                                p_server_port=args.server_port,
-                                p_action=op_type,
-                                p_file_key=vol_key,
-                                p_num_client_workers=num_client_w,
-                                p_total_ops=num_client_w,
-                                p_client_pool_mode=args.client_concurrency_mode
-                            )
-
-                            throughput_MBps = batch_summary['avg_op_throughput_Bps'] / (1024 * 1024) if batch_summary['avg_op_throughput_Bps'] is not None else 0.0
-                            avg_op_duration = batch_summary['avg_op_duration_s'] if batch_summary['avg_op_duration_s'] is not None else 0.0
-
-                            row = {
-                                "Nomor": test_run_counter,
-                                "Server Type": server_type_key, 
-                                "Operasi": op_type,
-                                "Volume (MB)": FILE_SIZES_MB_REPORTING.get(vol_key, "N/A"),
-                                "Client Concurrency Mode": args.client_concurrency_mode,
-                                "Jumlah client worker pool": num_client_w,
-                                "Jumlah server worker pool": num_server_workers,
-                                "Waktu total per client (avg s)": f"{avg_op_duration:.4f}",
-                                "Throughput per client (avg MBps)": f"{throughput_MBps:.4f}",
-                                "Jumlah worker client yang sukses": batch_summary['ops_successful'],
-                                "Jumlah worker client yang gagal": batch_summary['ops_failed'],
-                                "Jumlah worker server yang sukses": batch_summary['ops_successful'], 
-                                "Jumlah worker server yang gagal": batch_summary['ops_failed'],
-                                "Batch Wall Time (s)": f"{batch_summary['batch_wall_time_s']:.2f}",
-                            }
-                            all_run_results.append(row)
-                            
-                            logging.info(f"Result ID {test_run_counter}: Success={batch_summary['ops_successful']}/{args.total_ops_per_config}, AvgClientTime={avg_op_duration:.4f}s, AvgClientThr={throughput_MBps:.4f}MBps")
-                            logging.info(f"GridSearch: Pausing for {args.pause_between_tests} seconds before next client test combination...")
-                            time.sleep(args.pause_between_tests)
-                
-                logging.info(f"----- Finished tests for Server Config: Type={server_type_key}, Workers={num_server_workers} -----")
-                stop_server(current_server_process)
-                current_server_process = None
-                logging.info(f"GridSearch: Waiting {args.pause_between_server_restarts} seconds for server to fully release resources...")
-                time.sleep(args.pause_between_server_restarts)
-
+                for slot in range(num_slots)
+            ]
+            for process in slots:
+                process.start()
+            for process in slots:
+                process.join()
     except KeyboardInterrupt:
-        logging.warning("GridSearch: Orchestrator interrupted by user. Shutting down any running server...")
+        logging.warning("GridSearch: Orchestrator interrupted by user. Waiting for slots to stop their servers...")
+        for process in slots:
+            process.join()
     except Exception as e:
         logging.error(f"GridSearch: Orchestrator encountered an unhandled exception: {e}", exc_info=True)
-    finally:
-        if current_server_process and current_server_process.poll() is None:
-            logging.info("GridSearch: Orchestrator exiting. Ensuring server is stopped.")
-            stop_server(current_server_process)
-
-    if all_run_results:
-        field_names = [
-            "Nomor", "Server Type", "Operasi", "Volume (MB)", 
-            "Client Concurrency Mode", "Jumlah client worker pool", "Jumlah server worker pool",
-            "Waktu total per client (avg s)", "Throughput per client (avg MBps)",
-            "Jumlah worker client yang sukses", "Jumlah worker client yang gagal",
-            "Jumlah worker server yang sukses", "Jumlah worker server yang gagal",
-            "Batch Wall Time (s)"
-        ]
-        if not all(fn in all_run_results[0] for fn in field_names):
-            logging.error("CSV header mismatch! Generated headers do not match all data keys in results.")
-            logging.error(f"Expected headers (from field_names list): {field_names}")
-            logging.error(f"Actual keys in first data row: {list(all_run_results[0].keys())}")
 
-        try:
-            with open(args.output_csv, 'w', newline='') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=field_names, extrasaction='ignore') # Ignore extra fields if any
-                writer.writeheader()
-                writer.writerows(all_run_results)
-            logging.info(f"Grid search stress test results successfully written to {args.output_csv}")
-        except Exception as e:
-            logging.error(f"GridSearch: Failed to write results to CSV {args.output_csv}: {e}")
+    if counter.value > last_number:
+        logging.info(f"Grid search stress test results ({counter.value - last_number} new) written to {args.output_csv}")
     else:
-        logging.info("GridSearch: No test results were generated to write to CSV.")
+        logging.info("GridSearch: No new test results were generated.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,55 @@
+import os
+import json
+
+"""
+* codec JSON untuk protokol file: memakai orjson bila terpasang (lebih
+cepat, langsung menghasilkan bytes), selain itu json standar. Environment
+ETS_JSON_CODEC=json memaksa json standar (misal untuk perbandingan)
+
+* encode_response memecah response menjadi potongan bytes (header JSON,
+payload base64 data_file, penutup + delimiter) sehingga payload besar tidak
+disalin ke dalam satu string JSON; potongan dikirim dengan sendmsg/writev
+"""
+try:
+    if os.environ.get('ETS_JSON_CODEC', 'auto') == 'json':
+        raise ImportError('stdlib json forced by ETS_JSON_CODEC')
+    import orjson
+except ImportError:
+    orjson = None
+
+CODEC_NAME = 'orjson' if orjson is not None else 'json'
+DELIMITER = b"\r\n\r\n"
+PAYLOAD_KEY = 'data_file'
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def encode_response(hasil):
+    """
+    Mengembalikan list potongan bytes-like untuk satu response lengkap
+    (termasuk delimiter). data_file (str/bytes/memoryview base64) diletakkan
+    terakhir apa adanya, tanpa melalui encoder JSON.
+    """
+    payload = hasil.get(PAYLOAD_KEY)
+    if payload is None:
+        return [dumps(hasil) + DELIMITER]
+    if isinstance(payload, str):
+        payload = payload.encode('ascii')
+    header = dumps({k: v for k, v in hasil.items() if k != PAYLOAD_KEY})
+    separator = b', ' if header != b'{}' else b''
+    prefix = header[:-1] + separator + b'"' + PAYLOAD_KEY.encode() + b'": "'
+    return [prefix, payload, b'"}' + DELIMITER]
+
+
+if __name__=='__main__':
+    print(CODEC_NAME)
+    chunks = encode_response(dict(status='OK', data_namafile='a.txt', data_file=b'aGVsbG8='))
+    print(chunks)
+    print(loads(b''.join(chunks)[:-len(DELIMITER)]))
@@ -0,0 +1,81 @@
+from collections import Counter
+
+"""
+* class LatencyHistogram mencatat durasi (detik) ke bucket log-linear ala
+HDR histogram: nilai disimpan dalam mikrodetik, tiap rentang pangkat dua
+dibagi 2^(SUB_BUCKET_BITS-1) sub-bucket sehingga galat relatif < 1% berapapun
+besar nilainya, dan memori hanya sebanding jumlah bucket yang terisi
+
+* percentile(p) mengembalikan batas atas bucket yang memuat persentil ke-p
+(dibatasi nilai maksimum yang tercatat), sama seperti HDR histogram
+"""
+SUB_BUCKET_BITS = 8
+REPORT_PERCENTILES = (50, 90, 99, 99.9)
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = Counter()
+        self.total = 0
+        self.max_us = 0
+        self.sum_us = 0
+
+    def _bucket(self, value_us):
+        shift = max(0, value_us.bit_length() - SUB_BUCKET_BITS)
+        return shift, value_us >> shift
+
+    def record(self, seconds):
+        value_us = max(0, int(round(seconds * 1_000_000)))
+        self.counts[self._bucket(value_us)] += 1
+        self.total += 1
+        self.sum_us += value_us
+        self.max_us = max(self.max_us, value_us)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, p):
+        if not self.total:
+            return 0.0
+        rank = max(1, -(-self.total * p // 100))
+        seen = 0
+        for shift, sub in sorted(self.counts, key=lambda b: b[1] << b[0]):
+            seen += self.counts[(shift, sub)]
+            if seen >= rank:
+                upper_us = ((sub + 1) << shift) - 1
+                return min(upper_us, self.max_us) / 1_000_000
+        return self.max_us / 1_000_000
+
+    def summary(self, prefix=''):
+        # {prefix}p50_s, p90_s, p99_s, p99.9 -> p999_s, max_s, mean_s
+        data = {f"{prefix}p{str(p).replace('.', '')}_s": self.percentile(p) for p in REPORT_PERCENTILES}
+        data[f"{prefix}max_s"] = self.max_us / 1_000_000
+        data[f"{prefix}mean_s"] = (self.sum_us / self.total / 1_000_000) if self.total else 0.0
+        return data
+
+    def format_buckets(self, width=40):
+        """Histogram teks kasar per rentang pangkat dua (ms), untuk log CLI."""
+        rows = Counter()
+        for (shift, sub), count in self.counts.items():
+            rows[(sub << shift).bit_length()] += count
+        if not rows:
+            return []
+        peak = max(rows.values())
+        lines = []
+        for bits in range(min(rows), max(rows) + 1):
+            low_ms = ((1 << bits) >> 1) / 1000
+            high_ms = ((1 << bits) - 1) / 1000
+            bar = '#' * max(1 if rows[bits] else 0, rows[bits] * width // peak)
+            lines.append(f"{low_ms:>12.3f} - {high_ms:>12.3f} ms | {rows[bits]:>6} {bar}")
+        return lines
+
+
+if __name__=='__main__':
+    import random
+    h = LatencyHistogram()
+    for _ in range(10000):
+        h.record(random.expovariate(1 / 0.02))
+    print(h.summary())
+    print('\n'.join(h.format_buckets()))
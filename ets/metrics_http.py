@@ -0,0 +1,99 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from server_stats import GAUGES
+
+"""
+* listener HTTP opsional (--metrics_port) yang menyajikan snapshot
+ServerStats (sama dengan isi command STATS) dalam format teks Prometheus di
+GET /metrics, berjalan di thread daemon proses server (proses induk untuk
+mppool, yang menjumlahkan counter semua worker)
+
+* counter kumulatif diberi akhiran _total, gauge (GAUGES, gauge executor,
+cache) tanpa akhiran; latensi per command menjadi histogram
+ets_request_duration_seconds, timer (misal queue_wait) menjadi
+histogram ets_<timer>_seconds
+"""
+PREFIX = 'ets_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SNAPSHOT_GAUGES = ('workers', 'active_workers', 'admission_pending', 'frontend_connections', 'cache_entries', 'cache_used_bytes', 'cache_max_bytes')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+def render_prometheus(data):
+    lines = []
+
+    def metric(name, kind, samples):
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{PREFIX}{name}{labels} {value}")
+
+    for name, value in data.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if name in GAUGES or name in SNAPSHOT_GAUGES or name.startswith('executor_'):
+            metric(name, 'gauge', [('', value)])
+        else:
+            metric(f"{name}_total", 'counter', [('', value)])
+
+    if 'connections_per_worker' in data:
+        metric('worker_connections_total', 'counter',
+               [(_labels(worker=i), n) for i, n in enumerate(data['connections_per_worker'])])
+    metric('connection_errors_total', 'counter',
+           [(_labels(type=kind), n) for kind, n in data.get('connection_errors', {}).items()])
+    metric('requests_total', 'counter',
+           [(_labels(command=command), n) for command, n in data.get('requests', {}).items()])
+    metric('request_errors_total', 'counter',
+           [(_labels(command=command), n) for command, n in data.get('errors', {}).items()])
+
+    lines.append(f"# TYPE {PREFIX}request_duration_seconds histogram")
+    for command, latency in data.get('latency', {}).items():
+        for le, cumulative in latency['buckets']:
+            lines.append(f"{PREFIX}request_duration_seconds_bucket{_labels(command=command, le=le)} {cumulative}")
+        lines.append(f"{PREFIX}request_duration_seconds_sum{_labels(command=command)} {latency['sum_s']}")
+        lines.append(f"{PREFIX}request_duration_seconds_count{_labels(command=command)} {latency['count']}")
+
+    for timer, histogram in data.get('timers', {}).items():
+        lines.append(f"# TYPE {PREFIX}{timer}_seconds histogram")
+        for le, cumulative in histogram['buckets']:
+            lines.append(f"{PREFIX}{timer}_seconds_bucket{_labels(le=le)} {cumulative}")
+        lines.append(f"{PREFIX}{timer}_seconds_sum {histogram['sum_s']}")
+        lines.append(f"{PREFIX}{timer}_seconds_count {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def start_metrics_listener(ip, port, snapshot_func):
+    """
+    Menjalankan ThreadingHTTPServer di thread daemon; snapshot_func() mengembalikan
+    dict snapshot (misal FileProtocol.stats_snapshot). Hentikan dengan .shutdown().
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus(snapshot_func()).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug(f"Metrics: {self.address_string()} {format % args}")
+
+    httpd = ThreadingHTTPServer((ip, port), MetricsHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name='MetricsListener', daemon=True).start()
+    logging.warning(f"Metrics listener serving Prometheus text on http://{ip}:{port}/metrics")
+    return httpd
+
+
+if __name__=='__main__':
+    from server_stats import ServerStats
+    stats = ServerStats(commands=('get',))
+    stats.incr('bytes_sent', 10)
+    stats.observe('get', 0.002)
+    print(render_prometheus(stats.snapshot()))
@@ -0,0 +1,173 @@
+import multiprocessing
+import threading
+from bisect import bisect_left
+
+"""
+* class ServerStats menyimpan counter server (bytes terkirim, dsb) di
+shared memory multiprocessing, sehingga bisa dipakai bersama oleh
+thread pool (mtpool) maupun worker process (mppool)
+
+* object ServerStats harus dibuat di proses induk lalu diwariskan ke
+worker process (misal lewat argumen multiprocessing.Process)
+
+* counter dipecah per shard: tiap worker process mppool menulis ke barisnya
+sendiri (use_shard), dijaga lock thread biasa milik proses itu saja, dan
+snapshot menjumlahkan semua baris. Tidak ada lock antar proses di jalur
+request sehingga aman dibiarkan aktif saat beban penuh
+
+* per command (commands): jumlah request, jumlah response ERROR, total dan
+histogram latensi (bucket LATENCY_BUCKETS, detik). Command lain dicatat
+sebagai 'other'
+
+* timers: histogram durasi lain yang bukan request (misal queue_wait,
+lama koneksi menunggu worker), dicatat dengan observe_timer
+"""
+
+DEFAULT_COUNTERS = (
+    'bytes_sent',
+    'bytes_sent_sendfile',
+    'bytes_received',
+    'files_sent',
+    'connections_accepted',
+    'connections_rejected_busy',
+    'connections_rejected_client_limit',
+    'active_connections',
+    'cache_hits',
+    'cache_misses',
+    'cache_evictions',
+    'compressed_responses',
+    'compression_saved_bytes',
+)
+
+# Counter yang naik-turun (gauge), bukan total kumulatif
+GAUGES = ('active_connections',)
+
+CONNECTION_ERROR_TYPES = ('timeout', 'idle_timeout', 'header_timeout', 'slow_client', 'frame_too_large', 'unicode', 'aborted', 'reset', 'broken_pipe', 'other')
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_LATENCY_BUCKETS_US = tuple(int(b * 1_000_000) for b in LATENCY_BUCKETS)
+# requests, errors, latency_us_sum, lalu satu slot per bucket + bucket +Inf
+_COMMAND_WIDTH = 3 + len(LATENCY_BUCKETS) + 1
+
+class ServerStats:
+    def __init__(self, counters=DEFAULT_COUNTERS, num_workers=0, commands=(), timers=()):
+        self.names = tuple(counters)
+        self.commands = tuple(commands) + ('other',)
+        self.timers = tuple(timers)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        for kind in CONNECTION_ERROR_TYPES:
+            self._index[f"connection_errors_{kind}"] = len(self._index)
+        self._command_base = {}
+        for command in self.commands:
+            self._command_base[command] = len(self._index) + len(self._command_base) * _COMMAND_WIDTH
+        self._timer_base = {}
+        for timer in self.timers:
+            self._timer_base[timer] = len(self._index) + (len(self.commands) + len(self._timer_base)) * _COMMAND_WIDTH
+        self._width = len(self._index) + (len(self.commands) + len(self.timers)) * _COMMAND_WIDTH
+        # Baris 0: proses induk / satu-satunya proses (mtpool, asyncio); baris 1+i: worker process i
+        self._shards = num_workers + 1
+        self._values = multiprocessing.RawArray('q', self._shards * self._width)
+        # Jumlah koneksi yang ditangani tiap worker process (pre-fork mppool)
+        self.num_workers = num_workers
+        self._worker_connections = multiprocessing.Array('q', num_workers) if num_workers else None
+        self._offset = 0
+        self._init_local()
+
+    def _init_local(self):
+        # Lock dan gauge callback hanya berlaku di proses ini, tidak ikut diwariskan
+        self._lock = threading.Lock()
+        self._gauges = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock'], state['_gauges']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_local()
+
+    def use_shard(self, worker_id):
+        """Dipanggil sekali di awal worker process mppool: counter proses ini masuk ke barisnya sendiri."""
+        self._offset = (worker_id + 1) * self._width
+
+    def register_gauge(self, name, func):
+        """func() dipanggil saat snapshot di proses ini, misal panjang antrian executor."""
+        self._gauges[name] = func
+
+    def incr(self, name, amount=1):
+        i = self._offset + self._index[name]
+        with self._lock:
+            self._values[i] += amount
+
+    def incr_worker(self, worker_id, amount=1):
+        with self._worker_connections.get_lock():
+            self._worker_connections[worker_id] += amount
+
+    def observe(self, command, seconds, ok=True):
+        """Mencatat satu request `command` yang selesai dalam `seconds` detik."""
+        self._record(self._command_base.get(command, self._command_base['other']), seconds, ok)
+
+    def observe_timer(self, timer, seconds):
+        self._record(self._timer_base[timer], seconds)
+
+    def _record(self, base, seconds, ok=True):
+        base += self._offset
+        us = max(0, int(seconds * 1_000_000))
+        bucket = bisect_left(_LATENCY_BUCKETS_US, us)
+        with self._lock:
+            self._values[base] += 1
+            if not ok:
+                self._values[base + 1] += 1
+            self._values[base + 2] += us
+            self._values[base + 3 + bucket] += 1
+
+    def _totals(self):
+        # Dibaca tanpa lock: nilai int64 tiap slot selalu utuh, snapshot cukup mendekati
+        values = self._values[:]
+        totals = values[:self._width]
+        for shard in range(1, self._shards):
+            row = values[shard * self._width:(shard + 1) * self._width]
+            totals = [a + b for a, b in zip(totals, row)]
+        return totals
+
+    def _histogram(self, totals, base):
+        cumulative, buckets = 0, []
+        for le, n in zip(LATENCY_BUCKETS + ('+Inf',), totals[base + 3:base + _COMMAND_WIDTH]):
+            cumulative += n
+            buckets.append([le, cumulative])
+        return dict(count=totals[base], sum_s=totals[base + 2] / 1_000_000, buckets=buckets)
+
+    def snapshot(self):
+        totals = self._totals()
+        data = {name: totals[self._index[name]] for name in self.names}
+        data['connection_errors'] = {kind: totals[self._index[f"connection_errors_{kind}"]] for kind in CONNECTION_ERROR_TYPES}
+        data['requests'], data['errors'], data['latency'] = {}, {}, {}
+        for command, base in self._command_base.items():
+            count = totals[base]
+            if not count:
+                continue
+            data['requests'][command] = count
+            data['errors'][command] = totals[base + 1]
+            data['latency'][command] = self._histogram(totals, base)
+        if self.timers:
+            data['timers'] = {timer: self._histogram(totals, base) for timer, base in self._timer_base.items()}
+        for name, func in self._gauges.items():
+            data[name] = func()
+        if self._worker_connections is not None:
+            with self._worker_connections.get_lock():
+                data['workers'] = self.num_workers
+                data['connections_per_worker'] = self._worker_connections[:]
+        return data
+
+
+if __name__=='__main__':
+    stats = ServerStats(num_workers=2, commands=('get', 'list'))
+    stats.incr('bytes_sent', 1024)
+    stats.incr_worker(1)
+    stats.incr('files_sent')
+    stats.use_shard(1)
+    stats.incr('bytes_sent', 1024)
+    stats.observe('get', 0.003)
+    stats.observe('upload', 0.2, ok=False)
+    print(stats.snapshot())
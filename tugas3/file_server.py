@@ -4,9 +4,14 @@ import threading
 import logging
 import time
 import sys
+import os
 
 
 from file_protocol import  FileProtocol
+# FrameReader dipakai bersama dengan server ets; ditambahkan di akhir sys.path agar
+# file_protocol/file_interface milik tugas3 tetap yang terpakai
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ets'))
+from frame_reader import FrameReader, FrameTooLarge
 fp = FileProtocol()
 
 
@@ -17,24 +22,23 @@ class ProcessTheClient(threading.Thread):
         threading.Thread.__init__(self)
 
     def run(self):
-        buffer = ""
+        reader = FrameReader(self.connection)
         try:
             while True:
-                data = self.connection.recv(4096)
-                if not data:
+                frame = reader.read_frame()
+                if frame is None:
                     break
                 try:
-                    buffer += data.decode()
+                    command_to_process = frame.decode()
                 except Exception as e:
                     logging.error(e)
                     break
                 
-                if "\r\n\r\n" in buffer:
-                    command_to_process = buffer.split("\r\n\r\n", 1)[0]
-                    hasil = fp.proses_string(command_to_process)
-                    buffer = ""
-                    response_to_send=hasil+"\r\n\r\n"
-                    self.connection.sendall(response_to_send.encode())
+                hasil = fp.proses_string(command_to_process)
+                response_to_send=hasil+"\r\n\r\n"
+                self.connection.sendall(response_to_send.encode())
+        except FrameTooLarge as e:
+            logging.error(f"Request from {self.address} too large: {e}")
         except Exception as e:
             logging.error(f"Unexpected error processing client {self.address}: {e}", exc_info=True)
         finally:
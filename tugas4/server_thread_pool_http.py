@@ -4,11 +4,58 @@ import time
 import sys
 import logging
 import multiprocessing
+import threading
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
 from http import HttpServer
 
 httpserver = HttpServer()
 
+#admission control: koneksi yang sudah di-accept tapi belum dipegang thread dibatasi,
+#kelebihannya langsung dijawab 503 + Retry-After supaya client tidak antri tanpa batas
+POOL_SIZE = 20
+MAX_PENDING = 20
+MAX_PER_CLIENT = 10
+RETRY_AFTER = 1
+
+admission_lock = threading.Lock()
+pending = 0
+per_client = Counter()
+
+def admit(client_ip):
+    #mengembalikan None bila diterima, selain itu alasan penolakan
+    global pending
+    with admission_lock:
+        if per_client[client_ip] >= MAX_PER_CLIENT:
+            return 'client limit'
+        if pending >= MAX_PENDING:
+            return 'busy'
+        pending += 1
+        per_client[client_ip] += 1
+        return None
+
+def reject(connection, address, reason):
+    logging.warning("menolak {} ({}, pending {})".format(address, reason, pending))
+    try:
+        connection.settimeout(1)
+        connection.sendall(httpserver.response(503, 'Service Unavailable', 'Server busy, coba lagi nanti', {'Retry-After': RETRY_AFTER}))
+    except OSError:
+        pass
+    connection.close()
+
+def HandleAdmitted(connection, address, accepted_at):
+    global pending
+    with admission_lock:
+        pending -= 1
+    logging.info("queue wait {} : {:.4f}s".format(address, time.perf_counter() - accepted_at))
+    try:
+        ProcessTheClient(connection, address)
+    finally:
+        with admission_lock:
+            per_client[address[0]] -= 1
+            if per_client[address[0]] <= 0:
+                del per_client[address[0]]
+
 #untuk menggunakan threadpool executor, karena tidak mendukung subclassing pada process,
 #maka class ProcessTheClient dirubah dulu menjadi function, tanpda memodifikasi behaviour didalamnya
 
@@ -42,13 +89,17 @@ def Server():
     my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
     my_socket.bind(('0.0.0.0', 8885))
-    my_socket.listen(1)
+    my_socket.listen(MAX_PENDING)
 
-    with ThreadPoolExecutor(20) as executor:
+    with ThreadPoolExecutor(POOL_SIZE) as executor:
         while True:
                 connection, client_address = my_socket.accept()
                 logging.warning("connection from {}".format(client_address))
-                p = executor.submit(ProcessTheClient, connection, client_address)
+                rejected = admit(client_address[0])
+                if rejected:
+                    reject(connection, client_address, rejected)
+                    continue
+                p = executor.submit(HandleAdmitted, connection, client_address, time.perf_counter())
                 the_clients.append(p)
                 
                 #menampilkan jumlah process yang sedang aktif